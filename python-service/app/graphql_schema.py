@@ -360,11 +360,11 @@ class Query:
 
     @strawberry.field
     async def search_libraries(
-        self, query: str, limit: Optional[int] = 10
+        self, query: str, limit: Optional[int] = 10, category: Optional[str] = None
     ) -> List[LibraryProfileType]:
-        """Busca bibliotecas por keywords"""
+        """Busca bibliotecas por keywords (ranking BM25, aceita prefixo "ima*")"""
         loader = get_profile_loader()
-        profiles = loader.search_profiles(query, limit)
+        profiles = loader.search_profiles(query, limit, category=category)
 
         result = []
         for profile in profiles:
@@ -2,12 +2,20 @@
 SyncAds Playwright Service - MINIMAL (apenas automação)
 Versão simplificada para funcionar no Hugging Face
 """
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from playwright.async_api import async_playwright
 from typing import Optional
 
+from app.routers.lazy import import_cost_report
+from app.services.admin_auth import require_admin
+from app.services.loop_monitor import loop_monitor
+from app.services.tracing import TraceMiddleware, tracer
+
 app = FastAPI(
     title="SyncAds Playwright Service",
     description="Serviço de automação web com Playwright",
@@ -23,6 +31,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Span por request + propagação do header traceparent
+app.add_middleware(TraceMiddleware)
+
 # =====================================================
 # MODELS
 # =====================================================
@@ -77,6 +88,49 @@ async def health():
         "browser_active": is_alive
     }
 
+@app.get("/debug/imports", dependencies=[Depends(require_admin)])
+async def debug_imports(router: str = "images", top: int = 25):
+    """
+    Custo de import (cold, em subprocesso) de um router lazy (admin)
+    """
+    try:
+        return await asyncio.to_thread(import_cost_report, router, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/debug/loop", dependencies=[Depends(require_admin)])
+async def debug_loop(stacks: bool = True):
+    """
+    Lag do event loop e travamentos recentes (com stack do bloqueio) (admin)
+    """
+    if loop_monitor is None:
+        return {"running": False, "message": "LOOP_MONITOR_ENABLED=0"}
+    return loop_monitor.get_stats(include_stacks=stacks)
+
+@app.get(
+    "/debug/loop/metrics",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def debug_loop_metrics():
+    """Métricas do event loop em formato Prometheus (admin)"""
+    return loop_monitor.prometheus_metrics() if loop_monitor else ""
+
+@app.get("/debug/traces", dependencies=[Depends(require_admin)])
+async def debug_traces(limit: int = 50):
+    """Traces recentes (buffer em memória) (admin: spans trazem user_id, URLs)"""
+    return {"enabled": tracer.enabled, "traces": tracer.ring.recent_traces(limit)}
+
+@app.get("/debug/traces/{trace_id}", dependencies=[Depends(require_admin)])
+async def debug_trace(trace_id: str):
+    """Waterfall de latência de um trace (spans com offset e profundidade) (admin)"""
+    waterfall = tracer.get_waterfall(trace_id)
+    if not waterfall["spans"]:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return waterfall
+
 @app.post("/automation")
 async def automation(request: AutomationRequest):
     """
@@ -155,10 +209,18 @@ async def automation(request: AutomationRequest):
             "message": f"❌ Erro: {str(e)}"
         }
 
+@app.on_event("startup")
+async def startup():
+    """Monitor do event loop"""
+    if loop_monitor:
+        loop_monitor.start()
+
 @app.on_event("shutdown")
 async def shutdown():
     """Cleanup"""
     global browser
+    if loop_monitor:
+        await loop_monitor.stop()
     if browser:
         await browser.close()
         print("🛑 Browser fechado")
@@ -214,25 +214,36 @@ class OmnibrainEngine:
         self.active_tasks: Dict[str, ExecutionResult] = {}
         self.execution_history: List[ExecutionResult] = []
 
+        # asyncio.Task -> task_id em execução (profiling por tarefa)
+        self.task_owners: Dict[asyncio.Task, str] = {}
+
         logger.info("OmnibrainEngine initialized")
 
     # ============================================
     # PUBLIC API
     # ============================================
 
-    async def execute(self, task_input: TaskInput) -> ExecutionResult:
+    async def execute(
+        self, task_input: TaskInput, task_id: Optional[str] = None
+    ) -> ExecutionResult:
         """
         Executa uma tarefa completa
 
         Args:
             task_input: Input da tarefa
+            task_id: task_id já entregue ao cliente (apenas chamadas
+                internas; metadata do usuário não define o task_id)
 
         Returns:
             ExecutionResult com o resultado
         """
-        task_id = self._generate_task_id(task_input)
+        task_id = task_id or self._generate_task_id(task_input)
         start_time = datetime.now()
 
+        owner = asyncio.current_task()
+        if owner is not None:
+            self.task_owners[owner] = task_id
+
         logger.info(f"[{task_id}] Starting task execution")
         logger.debug(f"[{task_id}] Command: {task_input.command}")
 
@@ -316,6 +327,10 @@ class OmnibrainEngine:
                 execution_time=(datetime.now() - start_time).total_seconds(),
             )
 
+        finally:
+            if owner is not None:
+                self.task_owners.pop(owner, None)
+
     async def execute_batch(self, tasks: List[TaskInput]) -> List[ExecutionResult]:
         """
         Executa múltiplas tarefas em paralelo
@@ -325,6 +340,12 @@ class OmnibrainEngine:
         )
         return results
 
+    def get_running_task_id(self, task: Optional[asyncio.Task]) -> Optional[str]:
+        """task_id que a asyncio.Task está executando (None se nenhuma)"""
+        if task is None:
+            return None
+        return self.task_owners.get(task)
+
     def get_task_status(self, task_id: str) -> Optional[ExecutionResult]:
         """Retorna o status de uma tarefa ativa"""
         return self.active_tasks.get(task_id)
@@ -9,7 +9,7 @@ Responsável por:
 - Parsear conteúdo markdown estruturado
 - Extrair metadados e templates
 - Fornecer API de busca
-- Cache de profiles
+- Cache de profiles (via loader.LibraryProfileLoader + snapshot)
 
 Autor: SyncAds AI Team
 Versão: 1.0.0
@@ -24,6 +24,7 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 from ..types import LibraryProfile
+from .loader import LibraryProfileLoader as SnapshotProfileLoader
 
 logger = logging.getLogger("omnibrain.library_profiles")
 
@@ -36,6 +37,9 @@ logger = logging.getLogger("omnibrain.library_profiles")
 class LibraryProfileParser:
     """Parser para arquivos .md de library profiles"""
 
+    # Incrementar ao mudar o resultado do parse (invalida snapshots)
+    VERSION = "1"
+
     @staticmethod
     def parse(content: str, filename: str) -> LibraryProfile:
         """
@@ -350,123 +354,44 @@ class LibraryProfileParser:
 # ============================================
 
 
-class LibraryProfileLoader:
-    """Carregador de library profiles"""
-
-    def __init__(self, profiles_dir: Optional[Path] = None):
-        self.profiles_dir = profiles_dir or Path(__file__).parent
-        self.profiles_cache: Dict[str, LibraryProfile] = {}
-        self.loaded = False
-        logger.info(f"LibraryProfileLoader initialized: {self.profiles_dir}")
-
-    def load_all(self) -> Dict[str, LibraryProfile]:
-        """Carrega todos os profiles da pasta"""
-        if self.loaded and self.profiles_cache:
-            return self.profiles_cache
-
-        logger.info(f"Loading profiles from {self.profiles_dir}")
-
-        md_files = list(self.profiles_dir.glob("library_*.md"))
-        logger.info(f"Found {len(md_files)} profile files")
+class LibraryProfileLoader(SnapshotProfileLoader):
+    """
+    Carregador de library profiles do pacote
 
-        for md_file in md_files:
-            try:
-                profile = self.load_profile(md_file.stem)
-                if profile:
-                    self.profiles_cache[profile.name] = profile
-                    logger.debug(f"Loaded profile: {profile.name}")
-            except Exception as e:
-                logger.error(f"Error loading {md_file.name}: {e}")
+    Snapshot binário + hot-reload de loader.py, mantendo a API pública
+    do loader antigo do pacote: busca por nome exata e estatísticas com
+    as mesmas chaves.
+    """
 
-        self.loaded = True
-        logger.info(f"Loaded {len(self.profiles_cache)} profiles")
-
-        return self.profiles_cache
+    def __init__(self, profiles_dir: Optional[Path] = None, **kwargs):
+        kwargs.setdefault("parse_fn", _parse_sections)
+        kwargs.setdefault("parser_id", "sections")
+        kwargs.setdefault("parser_version", LibraryProfileParser.VERSION)
+        super().__init__(str(profiles_dir) if profiles_dir else None, **kwargs)
 
     def load_profile(self, library_name: str) -> Optional[LibraryProfile]:
         """Carrega profile específico"""
+        if not self.loaded:
+            self.load_all()
+
         # Normalizar nome
         clean_name = library_name.replace("library_", "")
+        if clean_name in self.profiles:
+            return self.profiles[clean_name]
 
-        # Verificar cache
-        if clean_name in self.profiles_cache:
-            return self.profiles_cache[clean_name]
-
-        # Buscar arquivo
-        md_file = self.profiles_dir / f"library_{clean_name}.md"
-
-        if not md_file.exists():
-            # Tentar sem prefixo
-            md_file = self.profiles_dir / f"{clean_name}.md"
-
-        if not md_file.exists():
+        # Buscar pelo arquivo de origem
+        profile_name = self._file_profiles.get(f"library_{clean_name}.md")
+        if not profile_name:
             logger.warning(f"Profile not found: {library_name}")
             return None
-
-        try:
-            content = md_file.read_text(encoding="utf-8")
-            profile = LibraryProfileParser.parse(content, md_file.name)
-            self.profiles_cache[profile.name] = profile
-            return profile
-        except Exception as e:
-            logger.error(f"Error parsing profile {md_file.name}: {e}")
-            return None
+        return self.profiles[profile_name]
 
     def get_profile(self, library_name: str) -> Optional[LibraryProfile]:
         """Recupera profile (carrega se necessário)"""
         if not self.loaded:
             self.load_all()
 
-        return self.profiles_cache.get(library_name)
-
-    def search_by_category(self, category: str) -> List[LibraryProfile]:
-        """Busca profiles por categoria"""
-        if not self.loaded:
-            self.load_all()
-
-        return [
-            p
-            for p in self.profiles_cache.values()
-            if category.lower() in p.category.lower()
-        ]
-
-    def search_by_keyword(self, keyword: str) -> List[LibraryProfile]:
-        """Busca profiles por keyword"""
-        if not self.loaded:
-            self.load_all()
-
-        keyword_lower = keyword.lower()
-        return [
-            p
-            for p in self.profiles_cache.values()
-            if any(keyword_lower in kw.lower() for kw in p.keywords)
-        ]
-
-    def get_all_profiles(self) -> List[LibraryProfile]:
-        """Retorna todos os profiles carregados"""
-        if not self.loaded:
-            self.load_all()
-
-        return list(self.profiles_cache.values())
-
-    def get_template(self, library_name: str, template_name: str) -> Optional[str]:
-        """Recupera template de código"""
-        profile = self.get_profile(library_name)
-        if not profile:
-            return None
-
-        return profile.code_templates.get(template_name.lower())
-
-    def clear_cache(self):
-        """Limpa cache de profiles"""
-        self.profiles_cache.clear()
-        self.loaded = False
-        logger.info("Profile cache cleared")
-
-    def reload(self):
-        """Recarrega todos os profiles"""
-        self.clear_cache()
-        return self.load_all()
+        return self.profiles.get(library_name)
 
     def get_statistics(self) -> Dict[str, Any]:
         """Retorna estatísticas dos profiles carregados"""
@@ -474,17 +399,15 @@ class LibraryProfileLoader:
             self.load_all()
 
         return {
-            "total_profiles": len(self.profiles_cache),
+            "total_profiles": len(self.profiles),
             "categories": len(
-                set(p.category for p in self.profiles_cache.values() if p.category)
-            ),
-            "total_keywords": sum(
-                len(p.keywords) for p in self.profiles_cache.values()
+                set(p.category for p in self.profiles.values() if p.category)
             ),
+            "total_keywords": sum(len(p.keywords) for p in self.profiles.values()),
             "total_templates": sum(
-                len(p.code_templates) for p in self.profiles_cache.values()
+                len(p.code_templates) for p in self.profiles.values()
             ),
-            "libraries": sorted(self.profiles_cache.keys()),
+            "libraries": sorted(self.profiles.keys()),
         }
 
 
@@ -504,6 +427,11 @@ def get_loader() -> LibraryProfileLoader:
     return _loader_instance
 
 
+def _parse_sections(content: str, file_path: str) -> LibraryProfile:
+    """Adapta LibraryProfileParser à assinatura do loader"""
+    return LibraryProfileParser.parse(content, Path(file_path).name)
+
+
 # ============================================
 # CONVENIENCE FUNCTIONS
 # ============================================
@@ -9,7 +9,9 @@ Responsável por:
 - Parse de markdown estruturado
 - Validação de profiles
 - Cache de profiles carregados
-- Atualização dinâmica de profiles
+- Snapshot binário versionado (startup rápido)
+- Atualização dinâmica de profiles (hot-reload por arquivo)
+- Índice invertido para busca ranqueada (BM25)
 
 Autor: SyncAds AI Team
 Versão: 1.0.0
@@ -21,10 +23,22 @@ import json
 import logging
 import os
 import re
+import time
+from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 from ..types import LibraryProfile
+from .search_index import ProfileSearchIndex
+from .snapshot import (
+    SnapshotEntry,
+    ProfileSnapshot,
+    default_snapshot_path,
+    file_digest,
+    read_snapshot,
+    schema_fingerprint,
+    write_snapshot,
+)
 
 logger = logging.getLogger("omnibrain.library_profiles.loader")
 
@@ -37,6 +51,9 @@ logger = logging.getLogger("omnibrain.library_profiles.loader")
 class MarkdownParser:
     """Parser para extrair dados estruturados de markdown"""
 
+    # Incrementar ao mudar o resultado do parse (invalida snapshots)
+    VERSION = "1"
+
     @staticmethod
     def parse_profile_md(content: str) -> Dict:
         """
@@ -275,6 +292,10 @@ class MarkdownParser:
 # ============================================
 
 
+# Assinatura dos parsers aceitos pelo loader: (conteúdo, nome do arquivo) -> profile
+ProfileParseFn = Callable[[str, str], Optional[LibraryProfile]]
+
+
 class LibraryProfileLoader:
     """
     Carregador de Library Profiles
@@ -284,15 +305,33 @@ class LibraryProfileLoader:
     - Fazer parse do conteúdo
     - Validar estrutura
     - Criar objetos LibraryProfile
-    - Cachear profiles
+    - Cachear profiles (memória + snapshot binário em disco)
+
+    O snapshot guarda cada profile parseado junto com mtime, tamanho e
+    sha256 do arquivo de origem. Na carga, apenas arquivos novos ou
+    alterados passam pelo parser; o restante é reconstruído do snapshot.
     """
 
-    def __init__(self, profiles_dir: Optional[str] = None):
+    def __init__(
+        self,
+        profiles_dir: Optional[str] = None,
+        parse_fn: Optional[ProfileParseFn] = None,
+        parser_id: str = "markdown",
+        parser_version: Optional[str] = None,
+        snapshot_path: Optional[str] = None,
+        use_snapshot: bool = True,
+    ):
         """
         Inicializa loader
 
         Args:
             profiles_dir: Diretório com arquivos .md (default: pasta atual)
+            parse_fn: Parser alternativo (default: MarkdownParser)
+            parser_id: Identifica o parser no snapshot (invalida ao trocar)
+            parser_version: Versão do parser (invalida ao mudar; default:
+                MarkdownParser.VERSION)
+            snapshot_path: Caminho do snapshot (default: junto aos .md)
+            use_snapshot: Desativa leitura/escrita do snapshot se False
         """
         if profiles_dir is None:
             # Usar diretório do próprio módulo
@@ -302,47 +341,234 @@ class LibraryProfileLoader:
 
         self.profiles_dir = profiles_dir
         self.profiles: Dict[str, LibraryProfile] = {}
+        self.index = ProfileSearchIndex()
         self.parser = MarkdownParser()
+        self.parse_fn: ProfileParseFn = parse_fn or self._parse_markdown
+        self.parser_id = parser_id
+        self.parser_version = parser_version or MarkdownParser.VERSION
+        self.schema = schema_fingerprint(LibraryProfile)
+        self.use_snapshot = use_snapshot
+        self.snapshot_path = (
+            Path(snapshot_path)
+            if snapshot_path
+            else default_snapshot_path(profiles_dir, parser_id)
+        )
+        self.loaded = False
+        self.last_load_stats: Dict[str, float] = {}
+
+        # Estado por arquivo: entrada do snapshot e nome do profile instalado
+        self._entries: Dict[str, SnapshotEntry] = {}
+        self._file_profiles: Dict[str, Optional[str]] = {}
 
         logger.info(f"LibraryProfileLoader initialized at: {self.profiles_dir}")
 
+    @property
+    def profiles_cache(self) -> Dict[str, LibraryProfile]:
+        """Alias mantido para código que usa o antigo loader do pacote"""
+        return self.profiles
+
     def load_all_profiles(
         self, force_reload: bool = False
     ) -> Dict[str, LibraryProfile]:
         """
         Carrega todos os profiles disponíveis
 
+        Na primeira chamada usa o snapshot do disco; em seguida (ou com
+        force_reload) apenas verifica alterações via refresh().
+
         Args:
-            force_reload: Força recarregar mesmo se já em cache
+            force_reload: Verifica o disco mesmo se já em cache
 
         Returns:
             Dict de LibraryProfile indexado por nome
         """
-        if self.profiles and not force_reload:
+        if self.loaded and not force_reload:
             logger.debug("Returning cached profiles")
             return self.profiles
 
-        logger.info("Loading library profiles from disk...")
+        if not self.loaded and self.use_snapshot and not self._entries:
+            snapshot = read_snapshot(
+                self.snapshot_path, self.parser_id, self.parser_version, self.schema
+            )
+            if snapshot:
+                self._entries = snapshot.entries
+
+        self.refresh()
+        self.loaded = True
+        return self.profiles
+
+    def refresh(self) -> List[str]:
+        """
+        Hot-reload: sincroniza profiles com os arquivos .md
 
-        profile_files = list(self.profiles_dir.glob("library_*.md"))
-        loaded_count = 0
+        Reparse apenas de arquivos novos ou cujo conteúdo mudou (mtime e
+        tamanho iguais => reaproveita; senão compara sha256). Profiles de
+        arquivos removidos são descartados.
 
-        for file_path in profile_files:
+        Returns:
+            Lista de nomes de profiles adicionados, alterados ou removidos
+        """
+        start = time.perf_counter()
+        files = {path.name: path for path in self.profiles_dir.glob("library_*.md")}
+        changed: List[str] = []
+        parsed = reused = 0
+        dirty = False
+
+        # Arquivos removidos
+        for file_name in list(self._entries):
+            if file_name not in files:
+                del self._entries[file_name]
+                dirty = True
+                old_name = self._uninstall(file_name)
+                if old_name:
+                    changed.append(old_name)
+
+        for file_name, file_path in sorted(files.items()):
             try:
-                profile = self.load_profile(file_path)
-                if profile:
-                    self.profiles[profile.name] = profile
-                    loaded_count += 1
+                stat = file_path.stat()
+                entry = self._entries.get(file_name)
+
+                if (
+                    entry
+                    and entry.mtime_ns == stat.st_mtime_ns
+                    and entry.size == stat.st_size
+                ):
+                    if file_name in self._file_profiles:
+                        continue
+                    if self._install_cached(file_name, entry):
+                        reused += 1
+                        continue
+                    entry = None  # entrada inutilizável: reparse abaixo
+
+                content = file_path.read_bytes()
+                digest = file_digest(content)
+
+                if entry and entry.sha256 == digest:
+                    # Apenas "touch": conteúdo idêntico
+                    entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+                    dirty = True
+                    if file_name in self._file_profiles:
+                        continue
+                    if self._install_cached(file_name, entry):
+                        reused += 1
+                        continue
+
+                profile = self.parse_fn(content.decode("utf-8"), str(file_path))
+                if profile is None:
+                    logger.warning(f"Profile {file_name} could not be parsed")
+
+                entry = SnapshotEntry(
+                    mtime_ns=stat.st_mtime_ns,
+                    size=stat.st_size,
+                    sha256=digest,
+                    profile=asdict(profile) if profile else None,
+                )
+                self._entries[file_name] = entry
+                dirty = True
+                parsed += 1
+
+                old_name = self._uninstall(file_name)
+                new_name = self._install(file_name, entry)
+                changed.append(new_name or old_name or file_name)
+
             except Exception as e:
-                logger.error(f"Failed to load profile {file_path.name}: {e}")
+                logger.error(f"Failed to load profile {file_name}: {e}")
                 continue
 
-        logger.info(f"Loaded {loaded_count}/{len(profile_files)} library profiles")
-        return self.profiles
+        # Duplicado ignorado assume o nome se o arquivo original saiu
+        for file_name, entry in sorted(self._entries.items()):
+            if (
+                self._file_profiles.get(file_name, "") is None
+                and entry.profile
+                and entry.profile.get("name") not in self.profiles
+            ):
+                # Se a entrada não servir, sai do snapshot e o próximo
+                # refresh reparseia o arquivo
+                dirty |= not self._install_cached(file_name, entry)
+
+        if dirty and self.use_snapshot:
+            write_snapshot(
+                self.snapshot_path,
+                ProfileSnapshot(
+                    parser_id=self.parser_id,
+                    parser_version=self.parser_version,
+                    schema=self.schema,
+                    entries=self._entries,
+                ),
+            )
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.last_load_stats = {
+            "files": len(files),
+            "parsed": parsed,
+            "from_snapshot": reused,
+            "elapsed_ms": round(elapsed_ms, 3),
+        }
+        logger.info(
+            f"Loaded {len(self.profiles)}/{len(files)} library profiles "
+            f"({parsed} parsed, {reused} from snapshot, {elapsed_ms:.1f}ms)"
+        )
+        return changed
+
+    def _install(self, file_name: str, entry: SnapshotEntry) -> Optional[str]:
+        """Materializa LibraryProfile a partir de uma entrada do snapshot"""
+        if not entry.profile:
+            self._file_profiles[file_name] = None
+            return None
+
+        name = entry.profile["name"]
+        owner = self._owner(name)
+        if owner is not None and owner != file_name:
+            # Dois arquivos com o mesmo nome: mantém o primeiro instalado
+            logger.error(
+                f"Profile '{name}' in {file_name} duplicates {owner}; ignored"
+            )
+            self._file_profiles[file_name] = None
+            return None
+
+        profile = LibraryProfile(**entry.profile)
+        self.profiles[profile.name] = profile
+        self.index.add(profile)
+        self._file_profiles[file_name] = profile.name
+        return profile.name
+
+    def _install_cached(self, file_name: str, entry: SnapshotEntry) -> bool:
+        """
+        Instala entrada vinda do snapshot
+
+        Se ela não gerar um LibraryProfile válido (campos que o schema atual
+        não aceita), descarta a entrada para o arquivo ser reparseado.
+
+        Returns:
+            False se a entrada foi descartada
+        """
+        try:
+            self._install(file_name, entry)
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding snapshot entry for {file_name}: {e}")
+            self._entries.pop(file_name, None)
+            self._file_profiles.pop(file_name, None)
+            return False
+
+    def _uninstall(self, file_name: str) -> Optional[str]:
+        """Remove da memória e do índice o profile vindo de um arquivo"""
+        old_name = self._file_profiles.pop(file_name, None)
+        if old_name:
+            self.profiles.pop(old_name, None)
+            self.index.remove(old_name)
+        return old_name
+
+    def _owner(self, profile_name: str) -> Optional[str]:
+        """Arquivo cujo profile está instalado com esse nome"""
+        for file_name, name in self._file_profiles.items():
+            if name == profile_name:
+                return file_name
+        return None
 
     def load_profile(self, file_path: Path) -> Optional[LibraryProfile]:
         """
-        Carrega um profile individual
+        Carrega um profile individual (sempre do disco, sem snapshot)
 
         Args:
             file_path: Caminho do arquivo .md
@@ -355,50 +581,54 @@ class LibraryProfileLoader:
             with open(file_path, "r", encoding="utf-8") as f:
                 content = f.read()
 
-            # Parse markdown
-            data = self.parser.parse_profile_md(content)
-
-            # Validar dados essenciais
-            if not data.get("name"):
-                logger.warning(f"Profile {file_path.name} missing name")
-                return None
-
-            # Criar LibraryProfile
-            profile = LibraryProfile(
-                name=data["name"],
-                category=data.get("category", "General"),
-                version_min=data.get("version_min", "0.0.0"),
-                version_recommended=data.get("version_recommended", "latest"),
-                description=data.get("description", ""),
-                documentation_url=data.get("documentation_url", ""),
-                license=data.get("license", "Unknown"),
-                use_cases=data.get("use_cases", []),
-                performance_score=data.get("performance_score", 0.8),
-                memory_score=data.get("memory_score", 0.8),
-                quality_score=data.get("quality_score", 0.8),
-                ease_score=data.get("ease_score", 0.8),
-                keywords=data.get("keywords", []),
-                use_when=data.get("use_when", []),
-                dont_use_when=data.get("dont_use_when", []),
-                alternatives=data.get("alternatives", []),
-                code_templates=data.get("code_templates", {}),
-                dependencies=data.get("dependencies", []),
-                system_requirements=data.get("system_requirements", []),
-                python_versions=data.get("python_versions", []),
-                platforms=data.get("platforms", []),
-                metadata={
-                    "source_file": str(file_path),
-                    "loaded_at": str(Path(file_path).stat().st_mtime),
-                },
-            )
-
-            logger.debug(f"Loaded profile: {profile.name}")
+            profile = self.parse_fn(content, str(file_path))
+            if profile:
+                logger.debug(f"Loaded profile: {profile.name}")
             return profile
 
         except Exception as e:
             logger.error(f"Error loading profile {file_path}: {e}")
             return None
 
+    def _parse_markdown(self, content: str, file_path: str) -> Optional[LibraryProfile]:
+        """Parser padrão: MarkdownParser + validação + LibraryProfile"""
+        # Parse markdown
+        data = self.parser.parse_profile_md(content)
+
+        # Validar dados essenciais
+        if not data.get("name"):
+            logger.warning(f"Profile {Path(file_path).name} missing name")
+            return None
+
+        # Criar LibraryProfile
+        return LibraryProfile(
+            name=data["name"],
+            category=data.get("category", "General"),
+            version_min=data.get("version_min", "0.0.0"),
+            version_recommended=data.get("version_recommended", "latest"),
+            description=data.get("description", ""),
+            documentation_url=data.get("documentation_url", ""),
+            license=data.get("license", "Unknown"),
+            use_cases=data.get("use_cases", []),
+            performance_score=data.get("performance_score", 0.8),
+            memory_score=data.get("memory_score", 0.8),
+            quality_score=data.get("quality_score", 0.8),
+            ease_score=data.get("ease_score", 0.8),
+            keywords=data.get("keywords", []),
+            use_when=data.get("use_when", []),
+            dont_use_when=data.get("dont_use_when", []),
+            alternatives=data.get("alternatives", []),
+            code_templates=data.get("code_templates", {}),
+            dependencies=data.get("dependencies", []),
+            system_requirements=data.get("system_requirements", []),
+            python_versions=data.get("python_versions", []),
+            platforms=data.get("platforms", []),
+            metadata={
+                "source_file": str(file_path),
+                "loaded_at": str(Path(file_path).stat().st_mtime),
+            },
+        )
+
     def get_profile(self, library_name: str) -> Optional[LibraryProfile]:
         """
         Recupera profile por nome
@@ -410,7 +640,7 @@ class LibraryProfileLoader:
             LibraryProfile ou None
         """
         # Carregar profiles se ainda não carregados
-        if not self.profiles:
+        if not self.loaded:
             self.load_all_profiles()
 
         # Buscar exato
@@ -435,7 +665,7 @@ class LibraryProfileLoader:
         Returns:
             Lista de LibraryProfiles
         """
-        if not self.profiles:
+        if not self.loaded:
             self.load_all_profiles()
 
         category_lower = category.lower()
@@ -445,58 +675,37 @@ class LibraryProfileLoader:
             if category_lower in profile.category.lower()
         ]
 
-    def search_profiles(self, query: str, limit: int = 10) -> List[LibraryProfile]:
+    def search_profiles(
+        self,
+        query: str,
+        limit: Optional[int] = 10,
+        category: Optional[str] = None,
+        prefix: bool = True,
+    ) -> List[LibraryProfile]:
         """
         Busca profiles por keywords ou nome
 
+        Usa o índice invertido (BM25F sobre nome, keywords, categoria e
+        descrição) construído na carga dos profiles.
+
         Args:
-            query: Termo de busca
+            query: Termo de busca ("ima*" força prefixo no token)
             limit: Máximo de resultados
+            category: Filtra por categoria
+            prefix: Trata os tokens da query como prefixo
 
         Returns:
             Lista de LibraryProfiles ordenados por relevância
         """
-        if not self.profiles:
+        if not self.loaded:
             self.load_all_profiles()
 
-        query_lower = query.lower()
-        scored_profiles = []
-
-        for profile in self.profiles.values():
-            score = 0.0
-
-            # Nome exato
-            if query_lower == profile.name.lower():
-                score += 10.0
-
-            # Nome contém query
-            if query_lower in profile.name.lower():
-                score += 5.0
-
-            # Keywords
-            for keyword in profile.keywords:
-                if query_lower in keyword.lower():
-                    score += 2.0
-
-            # Categoria
-            if query_lower in profile.category.lower():
-                score += 1.0
-
-            # Descrição
-            if query_lower in profile.description.lower():
-                score += 0.5
-
-            if score > 0:
-                scored_profiles.append((score, profile))
-
-        # Ordenar por score
-        scored_profiles.sort(key=lambda x: x[0], reverse=True)
-
-        return [profile for score, profile in scored_profiles[:limit]]
+        ranked = self.index.search(query, limit=limit, category=category, prefix=prefix)
+        return [self.profiles[name] for name, _score in ranked]
 
     def get_statistics(self) -> Dict:
         """Retorna estatísticas dos profiles carregados"""
-        if not self.profiles:
+        if not self.loaded:
             self.load_all_profiles()
 
         categories = {}
@@ -537,15 +746,67 @@ class LibraryProfileLoader:
             logger.error(f"Profile file not found: {file_path}")
             return None
 
-        # Recarregar
-        profile = self.load_profile(file_path)
+        # Recarregar (reparse apenas se o arquivo mudou)
+        self.refresh()
+        profile_name = self._file_profiles.get(file_path.name)
+        profile = self.profiles.get(profile_name) if profile_name else None
 
         if profile:
-            self.profiles[profile.name] = profile
             logger.info(f"Reloaded profile: {library_name}")
 
         return profile
 
+    # ------------------------------------------
+    # API compatível com o antigo loader do pacote
+    # (library_profiles.get_loader)
+    # ------------------------------------------
+
+    def load_all(self) -> Dict[str, LibraryProfile]:
+        """Carrega todos os profiles da pasta"""
+        return self.load_all_profiles()
+
+    def get_all_profiles(self) -> List[LibraryProfile]:
+        """Retorna todos os profiles carregados"""
+        if not self.loaded:
+            self.load_all_profiles()
+
+        return list(self.profiles.values())
+
+    def search_by_category(self, category: str) -> List[LibraryProfile]:
+        """Busca profiles por categoria"""
+        return self.get_profiles_by_category(category)
+
+    def search_by_keyword(self, keyword: str) -> List[LibraryProfile]:
+        """Busca profiles por keyword (prefixo, apenas no campo keywords)"""
+        if not self.loaded:
+            self.load_all_profiles()
+
+        ranked = self.index.search(
+            keyword, limit=None, prefix=True, fields=("keywords",)
+        )
+        return [self.profiles[name] for name, _score in ranked]
+
+    def get_template(self, library_name: str, template_name: str) -> Optional[str]:
+        """Recupera template de código"""
+        profile = self.get_profile(library_name)
+        if not profile:
+            return None
+
+        return profile.code_templates.get(template_name.lower())
+
+    def clear_cache(self):
+        """Limpa cache em memória (o snapshot em disco é mantido)"""
+        self.profiles.clear()
+        self.index.clear()
+        self._entries.clear()
+        self._file_profiles.clear()
+        self.loaded = False
+        logger.info("Profile cache cleared")
+
+    def reload(self) -> Dict[str, LibraryProfile]:
+        """Recarrega todos os profiles (hot-reload incremental)"""
+        return self.load_all_profiles(force_reload=True)
+
     def validate_profile(self, profile: LibraryProfile) -> tuple[bool, List[str]]:
         """
         Valida se profile tem dados necessários
@@ -617,10 +878,12 @@ def get_profile(library_name: str) -> Optional[LibraryProfile]:
     return loader.get_profile(library_name)
 
 
-def search_profiles(query: str, limit: int = 10) -> List[LibraryProfile]:
+def search_profiles(
+    query: str, limit: int = 10, category: Optional[str] = None
+) -> List[LibraryProfile]:
     """Atalho para buscar profiles"""
     loader = get_profile_loader()
-    return loader.search_profiles(query, limit)
+    return loader.search_profiles(query, limit, category=category)
 
 
 # ============================================
@@ -630,6 +893,7 @@ def search_profiles(query: str, limit: int = 10) -> List[LibraryProfile]:
 
 __all__ = [
     "LibraryProfileLoader",
+    "ProfileParseFn",
     "MarkdownParser",
     "get_profile_loader",
     "load_all_profiles",
@@ -0,0 +1,300 @@
+"""
+============================================
+SYNCADS OMNIBRAIN - LIBRARY PROFILE SEARCH INDEX
+============================================
+Índice invertido com ranking BM25F para Library Profiles
+
+Responsável por:
+- Tokenizar nome, keywords, categoria e descrição
+- Manter postings por termo (add/remove incremental)
+- Ranking BM25 com pesos por campo
+- Consultas por prefixo ("ima*" ou prefix=True)
+- Filtro por categoria sem varrer todos os profiles
+
+Autor: SyncAds AI Team
+Versão: 1.0.0
+Data: 2025-01-15
+============================================
+"""
+
+import bisect
+import logging
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from ..types import LibraryProfile
+
+logger = logging.getLogger("omnibrain.library_profiles.search_index")
+
+
+# Pesos por campo (mesma ordem de relevância da antiga busca por substring)
+FIELD_WEIGHTS: Dict[str, float] = {
+    "name": 5.0,
+    "keywords": 2.0,
+    "category": 1.0,
+    "description": 0.5,
+}
+
+# Bônus quando a query é exatamente o nome da biblioteca
+EXACT_NAME_BOOST = 10.0
+
+# Limite de termos expandidos por token de prefixo
+MAX_PREFIX_EXPANSIONS = 64
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase + remoção de acentos ("imagem" == "imágem")"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Divide texto em tokens alfanuméricos normalizados"""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+# ============================================
+# SEARCH INDEX
+# ============================================
+
+
+class ProfileSearchIndex:
+    """
+    Índice invertido de Library Profiles
+
+    Postings: termo -> {nome do profile -> {campo -> tf}}. O índice é
+    atualizado incrementalmente pelo loader (add/remove), então o custo
+    de uma busca depende apenas dos termos consultados.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Set[str]] = {}
+        self.field_total_length: Dict[str, int] = defaultdict(int)
+        self.categories: Dict[str, Set[str]] = defaultdict(set)
+        self.doc_category: Dict[str, str] = {}
+        self.exact_names: Dict[str, str] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    # ------------------------------------------
+    # Indexação
+    # ------------------------------------------
+
+    def add(self, profile: LibraryProfile):
+        """Indexa (ou reindexa) um profile"""
+        name = profile.name
+        if name in self.doc_lengths:
+            self.remove(name)
+
+        fields = {
+            "name": tokenize(name),
+            "keywords": [t for kw in profile.keywords for t in tokenize(kw)],
+            "category": tokenize(profile.category),
+            "description": tokenize(profile.description),
+        }
+
+        lengths: Dict[str, int] = {}
+        terms: Set[str] = set()
+        for field_name, tokens in fields.items():
+            lengths[field_name] = len(tokens)
+            self.field_total_length[field_name] += len(tokens)
+            for token in tokens:
+                field_tf = self.postings[token].setdefault(name, {})
+                field_tf[field_name] = field_tf.get(field_name, 0) + 1
+                terms.add(token)
+
+        self.doc_lengths[name] = lengths
+        self.doc_terms[name] = terms
+        category_key = normalize(profile.category).strip()
+        self.categories[category_key].add(name)
+        self.doc_category[name] = category_key
+        self.exact_names[normalize(name)] = name
+        self._vocabulary_dirty = True
+
+    def remove(self, name: str):
+        """Remove profile do índice"""
+        lengths = self.doc_lengths.pop(name, None)
+        if lengths is None:
+            return
+
+        for field_name, length in lengths.items():
+            self.field_total_length[field_name] -= length
+
+        for term in self.doc_terms.pop(name, set()):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(name, None)
+                if not docs:
+                    del self.postings[term]
+
+        category_key = self.doc_category.pop(name, "")
+        self.categories[category_key].discard(name)
+        if not self.categories[category_key]:
+            del self.categories[category_key]
+
+        self.exact_names.pop(normalize(name), None)
+        self._vocabulary_dirty = True
+
+    def clear(self):
+        """Esvazia o índice"""
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self.doc_terms.clear()
+        self.field_total_length.clear()
+        self.categories.clear()
+        self.doc_category.clear()
+        self.exact_names.clear()
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+
+    # ------------------------------------------
+    # Busca
+    # ------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = 10,
+        category: Optional[str] = None,
+        prefix: bool = False,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Busca ranqueada (BM25F)
+
+        Args:
+            query: Termos da busca (sufixo "*" ativa prefixo no token)
+            limit: Máximo de resultados (None = todos)
+            category: Filtra por categoria (substring, sem acento)
+            prefix: Trata todos os tokens como prefixo
+            fields: Restringe os campos pontuados (default: todos)
+
+        Returns:
+            Lista de (nome do profile, score) ordenada por score
+        """
+        allowed = self._category_filter(category)
+        if allowed is not None and not allowed:
+            return []
+
+        weights = {
+            f: w for f, w in FIELD_WEIGHTS.items() if fields is None or f in fields
+        }
+        scores: Dict[str, float] = defaultdict(float)
+
+        for raw_token in query.split():
+            token_prefix = prefix or raw_token.endswith("*")
+            for token in tokenize(raw_token):
+                token_scores = self._score_token(token, token_prefix, weights, allowed)
+                for doc, score in token_scores.items():
+                    scores[doc] += score
+
+        exact = self.exact_names.get(normalize(query.strip().rstrip("*")))
+        if exact and (fields is None or "name" in fields):
+            if allowed is None or exact in allowed:
+                scores[exact] += EXACT_NAME_BOOST
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+    def _category_filter(self, category: Optional[str]) -> Optional[Set[str]]:
+        """Conjunto de profiles permitidos pelo filtro de categoria"""
+        if not category:
+            return None
+
+        wanted = normalize(category).strip()
+        allowed: Set[str] = set()
+        for category_key, names in self.categories.items():
+            if wanted in category_key:
+                allowed |= names
+        return allowed
+
+    def _expand(self, token: str, prefix: bool) -> Iterable[str]:
+        """Termos do vocabulário que casam com o token"""
+        if not prefix:
+            return (token,) if token in self.postings else ()
+
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+
+        start = bisect.bisect_left(self._vocabulary, token)
+        matches = []
+        for term in self._vocabulary[start : start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            matches.append(term)
+        return matches
+
+    def _score_token(
+        self,
+        token: str,
+        prefix: bool,
+        weights: Dict[str, float],
+        allowed: Optional[Set[str]],
+    ) -> Dict[str, float]:
+        """
+        Score BM25F de um token da query
+
+        Com prefixo, cada documento recebe o melhor score entre os termos
+        expandidos (evita inflar profiles com muitas palavras parecidas).
+        """
+        total_docs = len(self.doc_lengths)
+        if total_docs == 0:
+            return {}
+
+        avg_length = {
+            f: (self.field_total_length.get(f, 0) / total_docs) or 1.0 for f in weights
+        }
+        best: Dict[str, float] = {}
+
+        for term in self._expand(token, prefix):
+            docs = self.postings[term]
+            df = len(docs)
+            idf = math.log(1.0 + (total_docs - df + 0.5) / (df + 0.5))
+
+            for doc, field_tf in docs.items():
+                if allowed is not None and doc not in allowed:
+                    continue
+
+                weighted_tf = 0.0
+                lengths = self.doc_lengths[doc]
+                for field_name, tf in field_tf.items():
+                    weight = weights.get(field_name)
+                    if not weight:
+                        continue
+                    norm = 1.0 - self.b + self.b * lengths[field_name] / avg_length[field_name]
+                    weighted_tf += weight * tf / norm
+
+                if weighted_tf <= 0:
+                    continue
+
+                score = idf * weighted_tf / (self.k1 + weighted_tf)
+                if score > best.get(doc, 0.0):
+                    best[doc] = score
+
+        return best
+
+
+# ============================================
+# EXPORTS
+# ============================================
+
+
+__all__ = [
+    "FIELD_WEIGHTS",
+    "ProfileSearchIndex",
+    "normalize",
+    "tokenize",
+]
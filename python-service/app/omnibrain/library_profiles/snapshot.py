@@ -0,0 +1,221 @@
+"""
+============================================
+SYNCADS OMNIBRAIN - LIBRARY PROFILE SNAPSHOT
+============================================
+Snapshot binário versionado dos profiles parseados
+
+Responsável por:
+- Persistir profiles já parseados em um único arquivo binário
+- Invalidar entradas por mtime/tamanho e hash (sha256) do .md
+- Permitir que o loader reparse apenas arquivos alterados
+- Ignorar snapshots de formato, parser (id e versão) ou schema de
+  LibraryProfile diferentes
+
+Formato do arquivo:
+    MAGIC (4 bytes) + VERSION (uint16 big-endian) + pickle(payload)
+
+O payload guarda apenas tipos nativos (dicts/listas/strings), nunca
+instâncias de LibraryProfile, para que o snapshot funcione tanto com
+imports `app.omnibrain...` quanto `omnibrain...`.
+
+Autor: SyncAds AI Team
+Versão: 1.0.0
+Data: 2025-01-15
+============================================
+"""
+
+import dataclasses
+import hashlib
+import logging
+import os
+import pickle
+import struct
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("omnibrain.library_profiles.snapshot")
+
+
+SNAPSHOT_MAGIC = b"OBLP"
+SNAPSHOT_FORMAT_VERSION = 2
+_HEADER = struct.Struct(">4sH")
+
+
+# ============================================
+# DATA CLASSES
+# ============================================
+
+
+@dataclass
+class SnapshotEntry:
+    """Entrada de um arquivo .md no snapshot"""
+
+    mtime_ns: int
+    size: int
+    sha256: str
+    profile: Optional[Dict[str, Any]]  # asdict(LibraryProfile) ou None se inválido
+
+
+@dataclass
+class ProfileSnapshot:
+    """Conteúdo de um snapshot carregado"""
+
+    parser_id: str
+    parser_version: str = ""
+    schema: str = ""
+    entries: Dict[str, SnapshotEntry] = field(default_factory=dict)
+
+
+# ============================================
+# HELPERS
+# ============================================
+
+
+def file_digest(content: bytes) -> str:
+    """Hash sha256 do conteúdo de um profile"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def schema_fingerprint(cls: type) -> str:
+    """
+    Fingerprint dos campos de uma dataclass (nome e tipo)
+
+    Muda quando LibraryProfile ganha, perde ou altera campos, invalidando
+    profiles parseados com o schema antigo.
+    """
+    spec = ";".join(f"{f.name}:{f.type}" for f in dataclasses.fields(cls))
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+
+def default_snapshot_path(profiles_dir: Path, parser_id: str) -> Path:
+    """
+    Caminho padrão do snapshot
+
+    Usa OMNIBRAIN_PROFILE_SNAPSHOT_DIR se definido (útil quando o
+    diretório da aplicação é somente leitura no container).
+    """
+    base_dir = os.getenv("OMNIBRAIN_PROFILE_SNAPSHOT_DIR")
+    directory = Path(base_dir) if base_dir else Path(profiles_dir)
+    return directory / f".profiles-{parser_id}.snapshot"
+
+
+# ============================================
+# READ / WRITE
+# ============================================
+
+
+def read_snapshot(
+    path: Path, parser_id: str, parser_version: str = "", schema: str = ""
+) -> Optional[ProfileSnapshot]:
+    """
+    Lê snapshot do disco
+
+    Returns:
+        ProfileSnapshot ou None se inexistente, corrompido, de outra versão
+        de formato/parser ou de outro schema de profile
+    """
+    try:
+        raw = Path(path).read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Could not read profile snapshot {path}: {e}")
+        return None
+
+    if len(raw) < _HEADER.size:
+        return None
+
+    magic, version = _HEADER.unpack_from(raw)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_FORMAT_VERSION:
+        logger.info(f"Ignoring profile snapshot with incompatible format: {path}")
+        return None
+
+    try:
+        payload = pickle.loads(raw[_HEADER.size :])
+    except Exception as e:
+        logger.warning(f"Corrupted profile snapshot {path}: {e}")
+        return None
+
+    if (
+        payload.get("parser_id") != parser_id
+        or payload.get("parser_version") != parser_version
+    ):
+        logger.info(f"Ignoring profile snapshot built by another parser: {path}")
+        return None
+
+    if payload.get("schema") != schema:
+        logger.info(f"Ignoring profile snapshot built for another schema: {path}")
+        return None
+
+    entries = {
+        name: SnapshotEntry(**entry) for name, entry in payload["entries"].items()
+    }
+    return ProfileSnapshot(
+        parser_id=parser_id,
+        parser_version=parser_version,
+        schema=schema,
+        entries=entries,
+    )
+
+
+def write_snapshot(path: Path, snapshot: ProfileSnapshot) -> bool:
+    """
+    Grava snapshot de forma atômica (arquivo temporário + rename)
+
+    Returns:
+        True se gravado, False se o diretório não for gravável
+    """
+    path = Path(path)
+    payload = {
+        "parser_id": snapshot.parser_id,
+        "parser_version": snapshot.parser_version,
+        "schema": snapshot.schema,
+        "entries": {
+            name: {
+                "mtime_ns": entry.mtime_ns,
+                "size": entry.size,
+                "sha256": entry.sha256,
+                "profile": entry.profile,
+            }
+            for name, entry in snapshot.entries.items()
+        },
+    }
+    data = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION) + pickle.dumps(
+        payload, protocol=pickle.HIGHEST_PROTOCOL
+    )
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+    except OSError as e:
+        logger.warning(f"Could not write profile snapshot {path}: {e}")
+        return False
+
+    logger.debug(f"Profile snapshot written: {path} ({len(data)} bytes)")
+    return True
+
+
+# ============================================
+# EXPORTS
+# ============================================
+
+
+__all__ = [
+    "SNAPSHOT_FORMAT_VERSION",
+    "SnapshotEntry",
+    "ProfileSnapshot",
+    "file_digest",
+    "schema_fingerprint",
+    "default_snapshot_path",
+    "read_snapshot",
+    "write_snapshot",
+]
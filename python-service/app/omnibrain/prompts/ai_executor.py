@@ -29,6 +29,7 @@ from datetime import datetime, timedelta
 from enum import Enum
 from typing import Any, Dict, List, Optional, Union
 
+from ...services.tracing import tracer
 from . import get_prompt, get_system_message, render_prompt
 
 logger = logging.getLogger("omnibrain.prompts.ai_executor")
@@ -281,30 +282,33 @@ class AIPromptExecutor:
         self.stats["total_requests"] += 1
         variables = variables or {}
 
-        # Verificar cache
-        if use_cache and self.cache:
-            cached = self.cache.get(prompt_name, variables)
-            if cached:
-                self.stats["cache_hits"] += 1
-                return cached
-
-        # Renderizar prompt
-        user_message = render_prompt(prompt_name, **variables)
-        system_message = get_system_message(prompt_name)
-
-        if not system_message:
-            system_message = "You are a helpful AI assistant."
-
-        # Executar com retry e fallback
-        response = await self._execute_with_retry(
-            system_message, user_message, model, temperature, max_tokens
-        )
+        with tracer.span("llm.prompt", attributes={"prompt": prompt_name}) as span:
+            # Verificar cache
+            if use_cache and self.cache:
+                cached = self.cache.get(prompt_name, variables)
+                if cached:
+                    self.stats["cache_hits"] += 1
+                    if span:
+                        span.set_attribute("cache_hit", True)
+                    return cached
+
+            # Renderizar prompt
+            user_message = render_prompt(prompt_name, **variables)
+            system_message = get_system_message(prompt_name)
+
+            if not system_message:
+                system_message = "You are a helpful AI assistant."
+
+            # Executar com retry e fallback
+            response = await self._execute_with_retry(
+                system_message, user_message, model, temperature, max_tokens
+            )
 
-        # Cachear resposta
-        if use_cache and self.cache:
-            self.cache.set(prompt_name, variables, response)
+            # Cachear resposta
+            if use_cache and self.cache:
+                self.cache.set(prompt_name, variables, response)
 
-        return response
+            return response
 
     async def _execute_with_retry(
         self,
@@ -329,14 +333,19 @@ class AIPromptExecutor:
         for provider in providers_to_try:
             for attempt in range(1, self.max_retries + 1):
                 try:
-                    response = await self._execute_with_provider(
-                        provider,
-                        system_message,
-                        user_message,
-                        model,
-                        temperature,
-                        max_tokens,
-                    )
+                    with tracer.span(
+                        f"llm.{provider.value}",
+                        kind="client",
+                        attributes={"attempt": attempt, "model": model},
+                    ):
+                        response = await self._execute_with_provider(
+                            provider,
+                            system_message,
+                            user_message,
+                            model,
+                            temperature,
+                            max_tokens,
+                        )
 
                     logger.info(
                         f"Prompt executed successfully with {provider.value} (attempt {attempt})"
@@ -3,52 +3,50 @@
 SYNCADS PYTHON MICROSERVICE - ROUTERS INIT
 ============================================
 Exporta todos os routers disponíveis
+
+Os routers são importados sob demanda (PEP 562): acessar
+`app.routers.images_router` importa `app.routers.images` apenas nesse
+momento. Assim Pillow/rembg, WeasyPrint/reportlab, BeautifulSoup e
+Playwright não entram no cold start do serviço.
+Ver app/routers/lazy.py para o custo de import de cada router.
 ============================================
 """
 
-from .images import router as images_router
-from .pdf import router as pdf_router
-from .scraping import router as scraping_router
-
-# Import routers adicionais (serão criados)
-try:
-    from .shopify import router as shopify_router
-except ImportError:
-    shopify_router = None
-
-try:
-    from .ml import router as ml_router
-except ImportError:
-    ml_router = None
-
-try:
-    from .nlp import router as nlp_router
-except ImportError:
-    nlp_router = None
-
-try:
-    from .data_analysis import router as data_analysis_router
-except ImportError:
-    data_analysis_router = None
-
-try:
-    from .python_executor import router as python_executor_router
-except ImportError:
-    python_executor_router = None
-
-try:
-    from .automation import router as automation_router
-except ImportError:
-    automation_router = None
-
-__all__ = [
-    "scraping_router",
-    "images_router",
-    "pdf_router",
-    "shopify_router",
-    "ml_router",
-    "nlp_router",
-    "data_analysis_router",
-    "python_executor_router",
-    "automation_router",
-]
+import importlib
+from typing import Any, Dict
+
+# nome exportado -> módulo do router (relativo a este pacote)
+ROUTER_MODULES: Dict[str, str] = {
+    "scraping_router": ".scraping",
+    "images_router": ".images",
+    "pdf_router": ".pdf",
+    "shopify_router": ".shopify",
+    "ml_router": ".ml",
+    "nlp_router": ".nlp",
+    "data_analysis_router": ".data_analysis",
+    "python_executor_router": ".python_executor",
+    "automation_router": ".automation",
+}
+
+# Routers que sempre existiram neste pacote: erro de import deve propagar
+_REQUIRED_ROUTERS = {"scraping_router", "images_router", "pdf_router"}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in ROUTER_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    try:
+        module = importlib.import_module(ROUTER_MODULES[name], __name__)
+        router = module.router
+    except ImportError:
+        if name in _REQUIRED_ROUTERS:
+            raise
+        # Routers adicionais (serão criados)
+        router = None
+
+    globals()[name] = router
+    return router
+
+
+__all__ = list(ROUTER_MODULES)
@@ -13,6 +13,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Literal, Optional
 import subprocess
 import sys
+import time
 
 from fastapi import APIRouter, BackgroundTasks, HTTPException
 from loguru import logger
@@ -21,6 +22,7 @@ from pydantic import BaseModel, Field
 # Import enhanced browser service
 # Singleton instance that holds all sessions
 from app.services.browser_service import browser_service
+from app.services.browser_pool import PoolExhausted
 
 # Playwright imports (Check availability)
 try:
@@ -47,6 +49,10 @@ router = APIRouter(prefix="/browser-automation", tags=["Browser Automation"])
 # ==========================================
 
 
+# Request interception profiles (app/services/network_profiles.py)
+NetworkProfileName = Literal["full", "no-media", "text-only"]
+
+
 class BrowserAction(BaseModel):
     """Single browser action"""
 
@@ -81,6 +87,21 @@ class AutomationRequest(BaseModel):
     timeout: int = Field(60, description="Overall timeout in seconds")
     user_id: Optional[str] = Field(None, description="User ID for extension control")
     session_id: Optional[str] = Field(None, description="Optional session ID for persistent automation")
+    mode: Literal["human", "throughput"] = Field(
+        "human",
+        description=(
+            "human: one call per action with human-like delays; throughput: "
+            "consecutive click/fill/extract/scroll actions run in one evaluate "
+            "call, without delays, with per-action timing"
+        ),
+    )
+    network_profile: Optional[NetworkProfileName] = Field(
+        None,
+        description=(
+            "Request interception for this request: full, no-media (no images, "
+            "media, fonts, trackers) or text-only; default: the session's profile"
+        ),
+    )
 
 
 class AutomationResponse(BaseModel):
@@ -96,6 +117,126 @@ class AutomationResponse(BaseModel):
     session_id: Optional[str] = None
 
 
+# ==========================================
+# ACTION EXECUTION
+# ==========================================
+
+# Actions that compile into a single in-page script (throughput mode)
+BATCHABLE_ACTIONS = {"click", "fill", "extract", "scroll"}
+# A click may navigate: steps after it must run on the page it leads to
+BATCH_ENDING_ACTIONS = {"click"}
+
+
+async def _run_action(
+    session_id: str, action: BrowserAction, human: bool = True
+) -> Dict[str, Any]:
+    """Execute one action through BrowserService (one or more round trips)"""
+    result: Dict[str, Any] = {}
+
+    if action.type == "navigate":
+        result = await browser_service.navigate(session_id, action.url, human=human)
+
+    elif action.type == "click":
+        result = await browser_service.click_element(session_id, action.selector)
+
+    elif action.type == "fill":
+        # Adapt fill to browser_service expectations
+        # browser_service.fill_form expects {selector: value}
+        result = await browser_service.fill_form(session_id, {action.selector: action.value})
+
+    elif action.type == "screenshot":
+        result = await browser_service.screenshot(session_id, full_page=True)
+        if result.get('success'):
+            # Convert bytes to base64 for response
+            b64 = base64.b64encode(result['screenshot']).decode('utf-8')
+            result['screenshot'] = b64
+
+    elif action.type == "extract":
+        result = await browser_service.extract_data(session_id, {"data": action.selector})
+
+    # TODO: Implement others in BrowserService (wait, scroll, execute_js)
+    # For now, if missing, we skip or add ad-hoc
+    elif action.type == "wait":
+        page = browser_service.pages.get(session_id)
+        if page:
+            await page.wait_for_timeout(action.timeout or 1000)
+            result = {"success": True, "waited": action.timeout}
+
+    elif action.type == "scroll":
+        page = browser_service.pages.get(session_id)
+        if page:
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            result = {"success": True, "scrolled": True}
+
+    elif action.type == "execute_js":
+        page = browser_service.pages.get(session_id)
+        if page:
+            js_res = await page.evaluate(action.value)
+            result = {"success": True, "result": js_res}
+
+    return result
+
+
+def _batch_step(action: BrowserAction) -> Dict[str, Any]:
+    if action.type == "extract":
+        return {"type": "extract", "selectors": {"data": action.selector}}
+    return {"type": action.type, "selector": action.selector, "value": action.value}
+
+
+async def _run_actions_batched(
+    session_id: str, actions: List[BrowserAction]
+) -> List[Dict[str, Any]]:
+    """
+    Throughput mode: consecutive batchable actions run as one evaluate call
+
+    navigate / wait / screenshot / execute_js end the current batch and run
+    on their own, without human delays. A click is the last step of its
+    batch (run_batch then waits for the page it may have opened). Results
+    keep the order of
+    `actions`; each has `ms` (action time) and `batch` (evaluate call
+    index, None for actions run on their own).
+    """
+    results: List[Dict[str, Any]] = []
+    pending: List[BrowserAction] = []
+    batches = 0
+
+    async def flush():
+        nonlocal batches
+        if not pending:
+            return
+        start = time.perf_counter()
+        outcome = await browser_service.run_batch(
+            session_id, [_batch_step(a) for a in pending]
+        )
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        step_results = outcome.get("results") or [
+            {"type": a.type, "success": False, "error": outcome.get("error")}
+            for a in pending
+        ]
+        for step in step_results:
+            step["batch"] = batches
+            step["batch_ms"] = elapsed_ms
+        results.extend(step_results)
+        batches += 1
+        pending.clear()
+
+    for action in actions:
+        if action.type in BATCHABLE_ACTIONS:
+            pending.append(action)
+            if action.type in BATCH_ENDING_ACTIONS:
+                await flush()
+            continue
+        await flush()
+        start = time.perf_counter()
+        result = await _run_action(session_id, action, human=False)
+        result["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        result["batch"] = None
+        results.append(result)
+    await flush()
+
+    return results
+
+
 # ==========================================
 # ENDPOINTS
 # ==========================================
@@ -109,6 +250,7 @@ async def health_check():
         "playwright_available": PLAYWRIGHT_AVAILABLE,
         "browser_use_available": BROWSER_USE_AVAILABLE if 'BROWSER_USE_AVAILABLE' in locals() else False, # BROWSER_USE_AVAILABLE was undefined in original except context
         "active_sessions": len(browser_service.contexts),
+        "browser_pool": browser_service.get_pool_statistics(),
         "timestamp": datetime.utcnow().isoformat(),
     }
 
@@ -129,13 +271,15 @@ async def execute_automation(request: AutomationRequest):
     import uuid
     session_id = request.session_id
     if not session_id:
-        if request.user_id:
-            # Create a consistent session ID for the user if preferred, 
-            # OR generate one. Let's create a fresh one if not specified to avoid conflicts unless explicitly requested.
-            # But the goal IS persistence...
-            # Let's say: If session_id is NOT provided, we assume a discrete task but we use the service.
-            # If the user wants persistence, they SHOULD provide session_id or we return one.
-            session_id = f"sess_{uuid.uuid4()}"
+        # Create a consistent session ID for the user if preferred, 
+        # OR generate one. Let's create a fresh one if not specified to avoid conflicts unless explicitly requested.
+        # But the goal IS persistence...
+        # Let's say: If session_id is NOT provided, we assume a discrete task but we use the service.
+        # If the user wants persistence, they SHOULD provide session_id or we return one.
+        # (Sessions are routed by id, so there is always one, with or without user_id)
+        session_id = f"sess_{uuid.uuid4()}"
+    # Generated ids are one-off: their cookies are not saved to disk
+    persist = bool(request.session_id)
             
     logger.info(f"🤖 Automation Request: {request.action} | Session: {session_id}")
 
@@ -143,89 +287,60 @@ async def execute_automation(request: AutomationRequest):
         # 2. Ensure Session Exists
         if session_id not in browser_service.contexts:
             logger.info(f"Creating new session: {session_id}")
-            await browser_service.create_session(session_id)
+            await browser_service.create_session(session_id, persist=persist)
             
         results = []
         screenshot = None
 
-        # 3. Execute Structured Actions (Direct Browser Control)
-        if request.actions:
-            logger.info(f"Executing {len(request.actions)} structured actions")
-
-            for action in request.actions:
-                result = {}
-                
-                if action.type == "navigate":
-                    result = await browser_service.navigate(session_id, action.url)
-                    
-                elif action.type == "click":
-                    result = await browser_service.click_element(session_id, action.selector)
-                    
-                elif action.type == "fill":
-                    # Adapt fill to browser_service expectations
-                    # browser_service.fill_form expects {selector: value}
-                    result = await browser_service.fill_form(session_id, {action.selector: action.value})
-                    
-                elif action.type == "screenshot":
-                    result = await browser_service.screenshot(session_id, full_page=True)
-                    if result.get('success'):
-                         # Convert bytes to base64 for response
-                         import base64
-                         b64 = base64.b64encode(result['screenshot']).decode('utf-8')
-                         result['screenshot'] = b64
-                         screenshot = b64
-                
-                elif action.type == "extract":
-                    result = await browser_service.extract_data(session_id, {"data": action.selector})
-
-                # TODO: Implement others in BrowserService (wait, scroll, execute_js)
-                # For now, if missing, we skip or add ad-hoc
-                elif action.type == "wait":
-                     page = browser_service.pages.get(session_id)
-                     if page:
-                         await page.wait_for_timeout(action.timeout or 1000)
-                         result = {"success": True, "waited": action.timeout}
-                
-                elif action.type == "scroll":
-                    page = browser_service.pages.get(session_id)
-                    if page:
-                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        result = {"success": True, "scrolled": True}
-                        
-                elif action.type == "execute_js":
-                    page = browser_service.pages.get(session_id)
-                    if page:
-                        js_res = await page.evaluate(action.value)
-                        result = {"success": True, "result": js_res}
-
-                results.append(result)
-
-
-        # 4. Execute Natural Language (AI Agent)
-        elif request.use_ai and BROWSER_AGENT_AVAILABLE:
-            logger.info(f"Executing AI action with LangChain: {request.action}")
+        # Pinned while the actions run (pool pressure from other requests
+        # cannot evict it mid-list); per-request network profile, restored
+        # afterwards
+        async with browser_service.pinned(session_id), browser_service.network_profile(
+            session_id, request.network_profile
+        ):
+            # 3. Execute Structured Actions (Direct Browser Control)
+            if request.actions:
+                logger.info(
+                    f"Executing {len(request.actions)} structured actions "
+                    f"({request.mode})"
+                )
+
+                if request.mode == "throughput":
+                    results = await _run_actions_batched(session_id, request.actions)
+                else:
+                    for action in request.actions:
+                        results.append(await _run_action(session_id, action))
+
+                # Last successful screenshot goes to the top-level field
+                for action, result in zip(request.actions, results):
+                    if action.type == "screenshot" and result.get("success"):
+                        screenshot = result["screenshot"]
+
+            # 4. Execute Natural Language (AI Agent)
+            elif request.use_ai and BROWSER_AGENT_AVAILABLE:
+                logger.info(f"Executing AI action with LangChain: {request.action}")
             
-            # Initialize agent
-            agent = BrowserAgent()
+                # Initialize agent
+                agent = BrowserAgent()
             
-            # Execute task passing the session_id so it uses the SAME session
-            ai_result = await agent.execute_task(request.action, user_id=request.user_id, session_id=session_id)
+                # Execute task passing the session_id so it uses the SAME session
+                ai_result = await agent.execute_task(request.action, user_id=request.user_id, session_id=session_id)
             
-            results.append(ai_result)
+                results.append(ai_result)
             
-            if not ai_result["success"]:
-                 raise Exception(ai_result.get("error", "Unknown AI error"))
+                if not ai_result["success"]:
+                     raise Exception(ai_result.get("error", "Unknown AI error"))
 
-        # 5. Fallback: Simple Navigation
-        elif request.url:
-            logger.info(f"Simple navigation to: {request.url}")
-            res = await browser_service.navigate(session_id, request.url)
-            results.append(res)
+            # 5. Fallback: Simple Navigation
+            elif request.url:
+                logger.info(f"Simple navigation to: {request.url}")
+                res = await browser_service.navigate(session_id, request.url)
+                results.append(res)
 
-        else:
-            raise HTTPException(
-                status_code=400, detail="Either 'actions' or 'url' must be provided"
-            )
+            else:
+                raise HTTPException(
+                    status_code=400, detail="Either 'actions' or 'url' must be provided"
+                )
 
         # Calculate execution time
         execution_time = (datetime.utcnow() - start_time).total_seconds()
@@ -259,23 +374,15 @@ async def execute_automation(request: AutomationRequest):
 
 
 @router.post("/screenshot")
-async def take_screenshot(url: str, full_page: bool = True):
+async def take_screenshot(
+    url: str, full_page: bool = True, network_profile: NetworkProfileName = "full"
+):
     """Take a screenshot of a URL (One-off session)"""
-    # For one-off, we can create a temp session and close it
-    import uuid
-    temp_id = f"temp_{uuid.uuid4()}"
-    
     try:
-        await browser_service.navigate(temp_id, url)
-        result = await browser_service.screenshot(temp_id, full_page)
-        
-        # Cleanup
-        await browser_service.pages[temp_id].close()
-        del browser_service.pages[temp_id]
-        # Clean context? 
-        if temp_id in browser_service.contexts:
-            await browser_service.contexts[temp_id].close()
-            del browser_service.contexts[temp_id]
+        # Sessão temporária: fechada ao sair do bloco, inclusive em erro
+        async with browser_service.temp_session("temp", network_profile) as temp_id:
+            nav = await browser_service.navigate(temp_id, url, human=False)
+            result = await browser_service.screenshot(temp_id, full_page)
 
         if result.get('success'):
             import base64
@@ -284,58 +391,68 @@ async def take_screenshot(url: str, full_page: bool = True):
                 "success": True,
                 "url": url,
                 "screenshot": b64,
+                "network": nav.get("network"),
                 "timestamp": datetime.utcnow().isoformat(),
             }
         else:
             raise Exception(result.get('error'))
 
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        # Try cleanup
-        if temp_id in browser_service.contexts:
-             pass # cleanup logic above handles it roughly, in production use finally block
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/scrape")
-async def scrape_page(url: str, selector: Optional[str] = None):
-    """Scrape content from a URL (One-off)"""
-    import uuid
-    temp_id = f"scrape_{uuid.uuid4()}"
-    
+async def scrape_page(
+    url: str,
+    selector: Optional[str] = None,
+    network_profile: NetworkProfileName = "no-media",
+):
+    """Scrape content from a URL (One-off; no images/media/fonts by default)"""
     try:
-        await browser_service.navigate(temp_id, url)
-        
-        # Get page content
-        page = browser_service.pages[temp_id]
-        title = await page.title()
-        content = await page.content()
-        
-        extracted = None
-        if selector:
-             extracted_res = await browser_service.extract_data(temp_id, {"data": selector})
-             if extracted_res.get('success'):
-                 extracted = [extracted_res['data']['data']]
-
-        # Cleanup
-        await page.close()
-        del browser_service.pages[temp_id]
-        if temp_id in browser_service.contexts:
-            await browser_service.contexts[temp_id].close()
-            del browser_service.contexts[temp_id]
-            
+        async with browser_service.temp_session("scrape", network_profile) as temp_id:
+            nav = await browser_service.navigate(temp_id, url, human=False)
+
+            # Get page content
+            page = browser_service.pages[temp_id]
+            title = await page.title()
+            content = await page.content()
+
+            extracted = None
+            if selector:
+                 extracted_res = await browser_service.extract_data(temp_id, {"data": selector})
+                 if extracted_res.get('success'):
+                     extracted = [extracted_res['data']['data']]
+
         return {
             "success": True,
             "url": url,
             "title": title,
             "content_length": len(content),
             "extracted": extracted,
+            "network": nav.get("network"),
             "timestamp": datetime.utcnow().isoformat(),
         }
 
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/pool/stats")
+async def browser_pool_stats():
+    """Ocupação do pool de contextos do navegador"""
+    return browser_service.get_pool_statistics()
+
+
+@router.get("/network/stats")
+async def browser_network_stats():
+    """Perfis de interceptação, totais por página e cache de assets estáticos"""
+    return browser_service.get_network_statistics()
+
+
 # ==========================================
 # BACKGROUND TASKS
 # ==========================================
@@ -467,10 +584,14 @@ async def legacy_create_session(session_id: str, user_agent: Optional[str] = Non
 # ==========================================
 
 @router.post("/session/create")
-async def create_enhanced_session(session_id: str, user_agent: Optional[str] = None):
+async def create_enhanced_session(
+    session_id: str,
+    user_agent: Optional[str] = None,
+    network_profile: Optional[NetworkProfileName] = None,
+):
     """Create enhanced browser session"""
     try:
-        await browser_service.create_session(session_id, user_agent)
+        await browser_service.create_session(session_id, user_agent, network_profile)
         return {
             "success": True,
             "session_id": session_id,
@@ -553,16 +674,10 @@ async def enhanced_extract(session_id: str, selectors: Dict[str, str]):
 
 
 @router.delete("/session/{session_id}")
-async def close_enhanced_session(session_id: str):
-    """Close enhanced browser session"""
+async def close_enhanced_session(session_id: str, forget: bool = False):
+    """Close enhanced browser session (forget=true also drops saved cookies/logins)"""
     try:
-        if session_id in browser_service.pages:
-            await browser_service.pages[session_id].close()
-            del browser_service.pages[session_id]
-            
-        if session_id in browser_service.contexts:
-            await browser_service.contexts[session_id].close()
-            del browser_service.contexts[session_id]
+        await browser_service.close_session(session_id, forget=forget)
             
         return {
             "success": True,
@@ -573,6 +688,12 @@ async def close_enhanced_session(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.on_event("shutdown")
+async def close_browser_service():
+    # Fecha sessões do pool, contextos pré-aquecidos e o Chromium
+    await browser_service.cleanup()
+
+
 # ==========================================
 # PYTHON EXECUTION (For AI)
 # ==========================================
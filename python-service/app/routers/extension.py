@@ -3,14 +3,34 @@
 # Router para comunicação com extensão Chrome
 # ============================================
 
-import os
+import asyncio
+import json
+from collections import OrderedDict
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from pydantic import BaseModel, Field
-
-from supabase import Client, create_client
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from app.services.command_results import command_results
+from app.services.extension_channel import DeviceConnection, command_channel
+from app.services.supabase_rest import (
+    SupabaseError,
+    SupabaseREST,
+    eq,
+    get_supabase_rest,
+    in_,
+)
+from app.services.tracing import current_traceparent, parse_traceparent, tracer
+from app.services.write_buffer import BufferFull, create_write_buffer_from_env
 
 router = APIRouter(prefix="/api/extension", tags=["extension"])
 
@@ -18,15 +38,14 @@ router = APIRouter(prefix="/api/extension", tags=["extension"])
 # ============================================
 # SUPABASE CLIENT
 # ============================================
-def get_supabase() -> Client:
-    """Obter cliente Supabase"""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+def get_supabase() -> SupabaseREST:
+    """Cliente Supabase compartilhado (async, pool de conexões keep-alive)"""
+    supabase = get_supabase_rest()
 
-    if not url or not key:
+    if supabase is None:
         raise HTTPException(status_code=500, detail="Supabase não configurado")
 
-    return create_client(url, key)
+    return supabase
 
 
 # ============================================
@@ -40,13 +59,19 @@ class DeviceRegister(BaseModel):
     timestamp: Optional[int] = None
 
 
+# id de extension_commands (uuid): um id inválido faria o lote inteiro falhar
+_UUID_PATTERN = r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+
+
 class CommandResult(BaseModel):
     deviceId: str
-    commandId: str
+    commandId: str = Field(..., pattern=_UUID_PATTERN)
     success: bool
     result: Optional[Any] = None
     error: Optional[str] = None
     timestamp: Optional[int] = None
+    # traceparent do comando, se a extensão o devolver (senão vem da linha)
+    traceparent: Optional[str] = None
 
 
 class ExtensionLog(BaseModel):
@@ -66,6 +91,214 @@ class CommandCreate(BaseModel):
     priority: Optional[int] = 5
 
 
+class CommandAck(BaseModel):
+    deviceId: str
+    commandIds: List[str]
+
+
+# ============================================
+# COMMAND HELPERS
+# ============================================
+async def _fetch_pending_commands(
+    supabase: SupabaseREST, device_id: str, limit: int
+) -> List[Dict]:
+    """Comandos pendentes do dispositivo (prioridade, depois ordem de criação)"""
+    commands = await supabase.select(
+        "extension_commands",
+        filters={"device_id": eq(device_id), "status": eq("pending")},
+        order="priority.desc,created_at.asc",
+        limit=limit,
+    )
+    _remember_traceparents(commands)
+    return commands
+
+
+async def _mark_processing(
+    supabase: SupabaseREST,
+    command_ids: List[str],
+    only_pending: bool = False,
+    device_id: Optional[str] = None,
+):
+    """Marca comandos como entregues ao dispositivo (status processing)"""
+    filters = {"id": in_(command_ids)}
+    if only_pending:
+        # Ack atrasado não pode sobrescrever um resultado já gravado
+        filters["status"] = eq("pending")
+    if device_id is not None:
+        filters["device_id"] = eq(device_id)
+
+    with tracer.span(
+        "supabase.claim_commands",
+        kind="client",
+        attributes={"count": len(command_ids)},
+    ):
+        await supabase.update(
+            "extension_commands",
+            {"status": "processing", "started_at": datetime.utcnow().isoformat()},
+            filters,
+        )
+
+
+# ============================================
+# WRITE BUFFERS (logs e resultados em lote)
+# ============================================
+async def _flush_logs(rows: List[Dict]):
+    with tracer.span(
+        "supabase.insert_logs", kind="client", attributes={"count": len(rows)}
+    ):
+        await get_supabase().insert("extension_logs", rows, returning=False)
+
+
+async def _flush_results(rows: List[Dict]):
+    # Mesmo comando repetido no lote: vale o último resultado
+    latest = list({row["id"]: row for row in rows}.values())
+    supabase = get_supabase()
+
+    with tracer.span(
+        "supabase.apply_results", kind="client", attributes={"count": len(latest)}
+    ):
+        try:
+            await supabase.rpc("apply_extension_command_results", {"p_results": latest})
+        except SupabaseError as e:
+            if e.status_code != 404:
+                raise
+            # Função da migration ainda não aplicada: um UPDATE por comando
+            await asyncio.gather(
+                *(
+                    supabase.update(
+                        "extension_commands",
+                        {k: v for k, v in row.items() if k != "id"},
+                        {"id": eq(row["id"])},
+                    )
+                    for row in latest
+                )
+            )
+
+
+async def _fail_unstored_results(rows: List[Dict], error: Optional[Exception]):
+    """
+    Resultados que o buffer não conseguiu gravar: o comando vira failed
+    (com o motivo) em vez de ficar em executing para sempre
+    """
+    supabase = get_supabase()
+    reason = f"Resultado não pôde ser gravado: {error}"[:500]
+    outcomes = await asyncio.gather(
+        *(
+            supabase.update(
+                "extension_commands",
+                {
+                    "status": "failed",
+                    "result": None,
+                    "error": reason,
+                    "completed_at": row.get("completed_at")
+                    or datetime.utcnow().isoformat(),
+                },
+                {"id": eq(row["id"])},
+            )
+            for row in rows
+        ),
+        return_exceptions=True,
+    )
+    for row, outcome in zip(rows, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"❌ Comando {row['id']} sem resultado gravado: {outcome}")
+
+
+def _is_bad_row(error: Exception) -> bool:
+    """Erro causado pelos dados (não adianta repetir): lote é dividido"""
+    # PostgREST: 400 = valor inválido / NOT NULL, 409 = FK / unique, 422
+    return isinstance(error, SupabaseError) and error.status_code in (400, 409, 422)
+
+
+log_buffer = create_write_buffer_from_env(
+    "extension_logs", _flush_logs, "EXTENSION_LOGS_", is_bad_row=_is_bad_row
+)
+result_buffer = create_write_buffer_from_env(
+    "extension_results",
+    _flush_results,
+    "EXTENSION_RESULTS_",
+    is_bad_row=_is_bad_row,
+    on_drop=_fail_unstored_results,
+)
+
+
+# traceparent dos comandos criados / entregues por este processo, para o
+# /result achar o trace sem consultar o banco (limitado; réplica que não
+# viu o comando grava o span sem pai)
+_command_traces: "OrderedDict[str, str]" = OrderedDict()
+_COMMAND_TRACES_MAX = 10000
+
+
+def _remember_traceparents(rows: List[Dict]):
+    for row in rows:
+        if row.get("id") and row.get("traceparent"):
+            _command_traces[str(row["id"])] = row["traceparent"]
+            _command_traces.move_to_end(str(row["id"]))
+    while len(_command_traces) > _COMMAND_TRACES_MAX:
+        _command_traces.popitem(last=False)
+
+
+def _command_traceparent(result: "CommandResult") -> Optional[str]:
+    """traceparent do comando: o devolvido pela extensão ou o da linha"""
+    traceparent = _command_traces.get(result.commandId)
+    return result.traceparent or traceparent
+
+
+async def _store_result(result: "CommandResult"):
+    """Enfileira o resultado de execução de um comando (gravado em lote)"""
+    row = {
+        "id": result.commandId,
+        "status": "completed" if result.success else "failed",
+        "result": result.result,
+        "error": result.error,
+        "completed_at": datetime.utcnow().isoformat(),
+    }
+
+    # Span filho do trace que criou o comando (a extensão não devolve o
+    # traceparent: vem da linha de extension_commands, guardada em memória
+    # quando o comando foi criado ou entregue)
+    with tracer.span(
+        "extension.command_result",
+        parent=parse_traceparent(_command_traceparent(result)),
+        attributes={"command_id": result.commandId, "success": result.success},
+    ):
+        await result_buffer.put(row)
+
+
+async def _complete_command(result: "CommandResult"):
+    """Registra o resultado e acorda quem espera pelo comando"""
+    await _store_result(result)
+    await command_results.report(
+        result.commandId, result.success, result=result.result, error=result.error
+    )
+
+
+async def _on_push_ack(device_id: str, command_ids: List[str]):
+    # Também acks atrasados (após o timeout do canal): só comandos ainda
+    # pendentes deste dispositivo
+    await _mark_processing(
+        get_supabase(), command_ids, only_pending=True, device_id=device_id
+    )
+
+
+command_channel.on_ack = _on_push_ack
+
+
+async def _push_backlog(device_id: str, limit: int = 50) -> int:
+    """Ao conectar, empurra os comandos que ficaram pendentes"""
+    commands = await _fetch_pending_commands(get_supabase(), device_id, limit)
+    return sum(command_channel.push(device_id, command) for command in commands)
+
+
+def _channel_hello(conn: DeviceConnection) -> Dict[str, Any]:
+    return {
+        "type": "hello",
+        "deviceId": conn.device_id,
+        "ackTimeout": command_channel.ack_timeout,
+        "heartbeat": command_channel.heartbeat,
+    }
+
+
 # ============================================
 # ENDPOINTS
 # ============================================
@@ -89,14 +322,6 @@ async def register_device(device: DeviceRegister):
     try:
         supabase = get_supabase()
 
-        # Verificar se dispositivo já existe
-        existing = (
-            supabase.table("extension_devices")
-            .select("*")
-            .eq("device_id", device.deviceId)
-            .execute()
-        )
-
         device_data = {
             "device_id": device.deviceId,
             "user_id": device.userId,
@@ -106,17 +331,18 @@ async def register_device(device: DeviceRegister):
             "last_seen": datetime.utcnow().isoformat(),
         }
 
-        if existing.data and len(existing.data) > 0:
-            # Atualizar existente
-            result = (
-                supabase.table("extension_devices")
-                .update(device_data)
-                .eq("device_id", device.deviceId)
-                .execute()
+        with tracer.span(
+            "supabase.upsert_device",
+            kind="client",
+            attributes={"device_id": device.deviceId},
+        ):
+            # Cria ou atualiza em uma ida ao banco (device_id é UNIQUE)
+            await supabase.upsert(
+                "extension_devices",
+                device_data,
+                on_conflict="device_id",
+                returning=False,
             )
-        else:
-            # Criar novo
-            result = supabase.table("extension_devices").insert(device_data).execute()
 
         return {
             "success": True,
@@ -133,30 +359,18 @@ async def register_device(device: DeviceRegister):
 async def get_commands(device_id: str, limit: int = 10):
     """
     Buscar comandos pendentes para um dispositivo
+
+    Fallback por polling do canal push (/ws/{device_id}, /stream/{device_id})
     """
     try:
         supabase = get_supabase()
 
         # Buscar comandos pendentes
-        result = (
-            supabase.table("extension_commands")
-            .select("*")
-            .eq("device_id", device_id)
-            .eq("status", "pending")
-            .order("priority", desc=True)
-            .order("created_at", desc=False)
-            .limit(limit)
-            .execute()
-        )
-
-        commands = result.data or []
+        commands = await _fetch_pending_commands(supabase, device_id, limit)
 
         # Atualizar status para "processing"
         if commands:
-            command_ids = [cmd["id"] for cmd in commands]
-            supabase.table("extension_commands").update(
-                {"status": "processing", "started_at": datetime.utcnow().isoformat()}
-            ).in_("id", command_ids).execute()
+            await _mark_processing(supabase, [cmd["id"] for cmd in commands])
 
         return {"success": True, "commands": commands, "count": len(commands)}
 
@@ -171,22 +385,14 @@ async def submit_result(result: CommandResult):
     Enviar resultado de execução de comando
     """
     try:
-        supabase = get_supabase()
-
-        # Atualizar comando com resultado
-        update_data = {
-            "status": "completed" if result.success else "failed",
-            "result": result.result,
-            "error": result.error,
-            "completed_at": datetime.utcnow().isoformat(),
-        }
-
-        supabase.table("extension_commands").update(update_data).eq(
-            "id", result.commandId
-        ).execute()
+        await _complete_command(result)
 
         return {"success": True, "message": "Resultado registrado com sucesso"}
 
+    except BufferFull as e:
+        # Banco atrasado: a extensão deve reenviar o resultado
+        raise HTTPException(status_code=503, detail=str(e))
+
     except Exception as e:
         print(f"❌ Erro ao registrar resultado: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -198,8 +404,6 @@ async def submit_log(log: ExtensionLog):
     Enviar log da extensão
     """
     try:
-        supabase = get_supabase()
-
         log_data = {
             "device_id": log.deviceId,
             "user_id": log.userId,
@@ -209,7 +413,7 @@ async def submit_log(log: ExtensionLog):
             "timestamp": datetime.utcnow().isoformat(),
         }
 
-        supabase.table("extension_logs").insert(log_data).execute()
+        await log_buffer.put(log_data)
 
         return {"success": True, "message": "Log registrado"}
 
@@ -237,11 +441,21 @@ async def create_command(command: CommandCreate):
             "created_at": datetime.utcnow().isoformat(),
         }
 
-        result = supabase.table("extension_commands").insert(command_data).execute()
+        with tracer.span(
+            "supabase.insert_command", kind="client", attributes={"type": command.type}
+        ):
+            # /result liga o resultado a este trace pelo traceparent da linha
+            command_data["traceparent"] = current_traceparent()
+            rows = await supabase.insert("extension_commands", command_data)
+        _remember_traceparents(rows or [])
+
+        # Dispositivo conectado ao canal: entrega imediata; senão fica para o polling
+        pushed = bool(rows) and command_channel.push(command.deviceId, rows[0])
 
         return {
             "success": True,
-            "commandId": result.data[0]["id"] if result.data else None,
+            "commandId": rows[0]["id"] if rows else None,
+            "delivery": "push" if pushed else "poll",
             "message": "Comando criado com sucesso",
         }
 
@@ -258,16 +472,12 @@ async def get_user_devices(user_id: str):
     try:
         supabase = get_supabase()
 
-        result = (
-            supabase.table("extension_devices")
-            .select("*")
-            .eq("user_id", user_id)
-            .order("last_seen", desc=True)
-            .execute()
+        devices = await supabase.select(
+            "extension_devices",
+            filters={"user_id": eq(user_id)},
+            order="last_seen.desc",
         )
 
-        devices = result.data or []
-
         return {"success": True, "devices": devices, "count": len(devices)}
 
     except Exception as e:
@@ -283,9 +493,7 @@ async def delete_device(device_id: str):
     try:
         supabase = get_supabase()
 
-        supabase.table("extension_devices").delete().eq(
-            "device_id", device_id
-        ).execute()
+        await supabase.delete("extension_devices", {"device_id": eq(device_id)})
 
         return {"success": True, "message": "Dispositivo removido"}
 
@@ -298,34 +506,205 @@ async def delete_device(device_id: str):
 async def get_device_stats(device_id: str):
     """
     Obter estatísticas de um dispositivo
+
+    Contadores mantidos por trigger em extension_device_stats: uma linha lida,
+    independente de quantos comandos o dispositivo já executou
     """
     try:
         supabase = get_supabase()
 
-        # Contar comandos por status
-        commands = (
-            supabase.table("extension_commands")
-            .select("status")
-            .eq("device_id", device_id)
-            .execute()
-        )
-
+        try:
+            rows = await supabase.select(
+                "extension_device_stats", filters={"device_id": eq(device_id)}
+            )
+        except SupabaseError as e:
+            if e.status_code != 404:
+                raise
+            # Migration ainda não aplicada: contagem completa (lenta)
+            return {"success": True, "stats": await _count_device_stats(device_id)}
+
+        row = rows[0] if rows else {}
+        duration_count = row.get("duration_count") or 0
         stats = {
-            "total": len(commands.data) if commands.data else 0,
-            "pending": 0,
-            "processing": 0,
-            "completed": 0,
-            "failed": 0,
+            "total": row.get("total", 0),
+            "pending": row.get("pending", 0),
+            "processing": row.get("processing", 0),
+            "completed": row.get("completed", 0),
+            "failed": row.get("failed", 0),
+            "avg_duration_ms": (
+                round(row["duration_ms_sum"] / duration_count)
+                if duration_count
+                else None
+            ),
+            "last_activity": row.get("last_activity"),
         }
 
-        if commands.data:
-            for cmd in commands.data:
-                status = cmd.get("status", "pending")
-                if status in stats:
-                    stats[status] += 1
-
         return {"success": True, "stats": stats}
 
     except Exception as e:
         print(f"❌ Erro ao obter estatísticas: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _count_device_stats(device_id: str) -> Dict[str, Any]:
+    commands = await get_supabase().select(
+        "extension_commands",
+        filters={"device_id": eq(device_id)},
+        columns="status",
+    )
+
+    stats = {
+        "total": len(commands),
+        "pending": 0,
+        "processing": 0,
+        "completed": 0,
+        "failed": 0,
+    }
+
+    for cmd in commands:
+        status = cmd.get("status", "pending")
+        if status in stats:
+            stats[status] += 1
+
+    return stats
+
+
+# ============================================
+# PUSH CHANNEL (WebSocket / SSE)
+# ============================================
+
+
+@router.websocket("/ws/{device_id}")
+async def command_socket(websocket: WebSocket, device_id: str):
+    """
+    Canal push de comandos por WebSocket
+
+    Servidor -> extensão: {"type": "hello" | "command" | "ping", ...}
+    Extensão -> servidor:
+      {"type": "ack", "commandIds": [...]}   comando recebido (vira processing)
+      {"type": "result", ...CommandResult}   resultado pelo próprio canal
+      {"type": "pong"}
+    """
+    await websocket.accept()
+    conn = command_channel.connect(device_id, "websocket")
+    conn.offer(_channel_hello(conn))
+    sender = asyncio.create_task(_websocket_sender(websocket, conn))
+
+    try:
+        await _push_backlog(device_id)
+
+        while True:
+            message = await websocket.receive_json()
+            kind = message.get("type")
+
+            if kind == "ack":
+                await command_channel.ack(device_id, message.get("commandIds") or [])
+            elif kind == "result":
+                payload = {k: v for k, v in message.items() if k != "type"}
+                try:
+                    result = CommandResult(**{**payload, "deviceId": device_id})
+                except ValidationError as e:
+                    print(f"⚠️ Resultado inválido ignorado ({device_id}): {e}")
+                    continue
+                await command_channel.ack(device_id, [result.commandId])
+                await _complete_command(result)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"❌ Erro no canal WebSocket ({device_id}): {e}")
+    finally:
+        sender.cancel()
+        command_channel.disconnect(conn)
+
+
+async def _websocket_sender(websocket: WebSocket, conn: DeviceConnection):
+    """Único escritor do socket: outbox da conexão + heartbeat"""
+    try:
+        while True:
+            message = await conn.next_message(command_channel.heartbeat)
+            if message is None:
+                message = {"type": "ping"}
+            if message["type"] == "close":
+                await websocket.close()
+                return
+            await websocket.send_text(json.dumps(message, default=str))
+    except Exception:
+        pass  # socket fechado: o receive loop faz o cleanup
+
+
+@router.get("/stream/{device_id}")
+async def command_stream(device_id: str, request: Request):
+    """
+    Canal push de comandos por Server-Sent Events
+
+    Eventos `hello` e `command`; comentários `: ping` como heartbeat.
+    Acks via POST /ack; resultados via POST /result.
+    """
+    conn = command_channel.connect(device_id, "sse")
+    conn.offer(_channel_hello(conn))
+    try:
+        await _push_backlog(device_id)
+    except Exception as e:
+        command_channel.disconnect(conn)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                message = await conn.next_message(command_channel.heartbeat)
+                if message is None:
+                    yield ": ping\n\n"
+                    continue
+                if message["type"] == "close":
+                    return
+                data = json.dumps(message, default=str)
+                yield f"event: {message['type']}\ndata: {data}\n\n"
+        finally:
+            command_channel.disconnect(conn)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/ack")
+async def ack_commands(ack: CommandAck):
+    """
+    Confirmar recebimento de comandos entregues pelo canal push (SSE)
+    """
+    try:
+        acked = await command_channel.ack(ack.deviceId, ack.commandIds)
+        return {"success": True, "acked": acked}
+
+    except Exception as e:
+        print(f"❌ Erro ao confirmar comandos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/channel/stats")
+async def get_channel_stats():
+    """Canal push, registro de resultados e buffers de escrita deste worker"""
+    return {
+        "success": True,
+        "channel": command_channel.get_statistics(),
+        "results": command_results.get_statistics(),
+        "writes": {
+            "logs": log_buffer.get_statistics(),
+            "results": result_buffer.get_statistics(),
+        },
+    }
+
+
+@router.on_event("shutdown")
+async def close_extension_services():
+    await command_channel.close()
+    await command_results.close()
+    # Grava o que ficou nos buffers antes de fechar o pool
+    await log_buffer.close()
+    await result_buffer.close()
+    supabase = get_supabase_rest()
+    if supabase is not None:
+        await supabase.close()
@@ -18,7 +18,6 @@ from fastapi import APIRouter, File, HTTPException, UploadFile
 from loguru import logger
 from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageOps
 from pydantic import BaseModel, Field
-from rembg import remove
 
 router = APIRouter()
 
@@ -265,7 +264,9 @@ async def remove_background(request: ImageRemoveBgRequest):
         # Decodificar
         img_bytes = base64.b64decode(request.image_base64)
 
-        # Remover background
+        # Remover background (rembg + modelo ONNX só carregam aqui)
+        from rembg import remove
+
         output_bytes = remove(img_bytes)
 
         # Converter para PIL Image
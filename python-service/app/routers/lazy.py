@@ -0,0 +1,162 @@
+"""
+============================================
+SYNCADS PYTHON MICROSERVICE - LAZY ROUTERS
+============================================
+Relatório de custo de import dos routers pesados
+
+Os routers images/pdf/scraping são importados sob demanda pelo pacote
+app.routers (PEP 562), nunca no cold start do serviço.
+
+- import_cost_report(module): custo de import de um router de
+  LAZY_ROUTERS usando `python -X importtime` em subprocesso (cold import
+  real); um relatório por vez.
+
+CLI:
+    python -m app.routers.lazy app.routers.images --top 20
+============================================
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+# ==========================================
+# LAZY ROUTER SPECS
+# ==========================================
+
+
+@dataclass
+class LazyRouterSpec:
+    """Router pesado (importado sob demanda)"""
+
+    module: str
+    prefix: str
+    tags: List[str] = field(default_factory=list)
+
+
+# Prefixos usados pelo frontend (src/lib/api/pythonService.ts)
+LAZY_ROUTERS: Dict[str, LazyRouterSpec] = {
+    "images": LazyRouterSpec("app.routers.images", "/api/images", ["Images"]),
+    "pdf": LazyRouterSpec("app.routers.pdf", "/api/pdf", ["PDF"]),
+    "scraping": LazyRouterSpec("app.routers.scraping", "/api/scraping", ["Scraping"]),
+}
+
+
+# ==========================================
+# IMPORT COST REPORT
+# ==========================================
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Converte saída de `-X importtime` em lista de módulos
+
+    Linha: "import time:   self [us] | cumulative | imported package"
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            _, data = line.split(":", 1)
+            self_us, cumulative_us, name = data.split("|", 2)
+            entries.append(
+                {
+                    "module": name.strip(),
+                    "depth": (len(name) - len(name.lstrip())) // 2,
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                }
+            )
+        except ValueError:
+            continue
+    return entries
+
+
+# Um subprocesso de importtime por vez
+_report_busy = threading.Lock()
+
+
+def resolve_router_module(name: str) -> str:
+    """Módulo de um router de LAZY_ROUTERS (por nome ou módulo)"""
+    if name in LAZY_ROUTERS:
+        return LAZY_ROUTERS[name].module
+    if name in {spec.module for spec in LAZY_ROUTERS.values()}:
+        return name
+    raise ValueError(
+        f"Router desconhecido: {name!r} (use {', '.join(LAZY_ROUTERS)})"
+    )
+
+
+def import_cost_report(module: str, top: int = 25, timeout: float = 120.0) -> Dict[str, Any]:
+    """
+    Mede o custo de import (cold) de um router em subprocesso
+
+    Apenas routers de LAZY_ROUTERS: importar um módulo arbitrário executa
+    o código dele. ValueError para outros nomes, RuntimeError se outro
+    relatório estiver rodando.
+
+    Returns:
+        Dict com tempo total e os módulos mais caros (cumulative)
+    """
+    module = resolve_router_module(module)
+    if not _report_busy.acquire(blocking=False):
+        raise RuntimeError("Relatório de import já em andamento")
+
+    try:
+        cwd = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            cwd=cwd,
+        )
+        wall = time.perf_counter() - start
+    finally:
+        _report_busy.release()
+
+    entries = parse_importtime(proc.stderr)
+    root = next((e for e in reversed(entries) if e["module"] == module), None)
+    ranked = sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)
+
+    return {
+        "module": module,
+        "success": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "wall_seconds": round(wall, 3),
+        "import_ms": root["cumulative_ms"] if root else None,
+        "modules_imported": len(entries),
+        "top_cumulative": ranked[:top],
+        "top_self": sorted(entries, key=lambda e: e["self_ms"], reverse=True)[:top],
+    }
+
+
+def _main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Custo de import por módulo")
+    parser.add_argument("modules", nargs="*", default=[s.module for s in LAZY_ROUTERS.values()])
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        report = import_cost_report(module, top=args.top)
+        status = "ok" if report["success"] else f"FALHOU: {report['error']}"
+        print(f"\n=== {module} ({report['import_ms']} ms, {report['modules_imported']} módulos, {status})")
+        for entry in report["top_cumulative"]:
+            print(f"  {entry['cumulative_ms']:10.1f} ms  {entry['self_ms']:9.1f} ms  {entry['module']}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main())
@@ -12,6 +12,7 @@ Endpoints:
 - GET /omnibrain/statistics - Estatísticas
 - POST /omnibrain/validate - Valida código
 - WS /omnibrain/stream - Streaming de execução
+- POST /omnibrain/admin/profile - Profiling amostral do worker (admin)
 
 Autor: SyncAds AI Team
 Versão: 1.0.0
@@ -20,18 +21,26 @@ Versão: 1.0.0
 
 import asyncio
 import logging
+import threading
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from fastapi import (
     APIRouter,
     BackgroundTasks,
+    Depends,
     HTTPException,
+    Query,
     WebSocket,
     WebSocketDisconnect,
 )
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel, Field
 
+from ..services.admin_auth import require_admin
+from ..services.sampling_profiler import ThreadFilter, sampling_profiler
+from ..services.tracing import current_traceparent, parse_traceparent, tracer
+
 from ..omnibrain.classifiers.task_classifier import TaskClassifier
 
 # Omnibrain imports
@@ -298,7 +307,13 @@ async def execute_task(request: ExecuteTaskRequest):
         )
 
         # Execute
-        result = await engine.execute(task_input)
+        with tracer.span(
+            "omnibrain.execute", attributes={"user_id": request.user_id}
+        ) as span:
+            result = await engine.execute(task_input)
+            if span:
+                span.set_attribute("task_id", result.task_id)
+                span.set_attribute("status", result.status.value)
 
         # Convert to response
         response = ExecuteTaskResponse(
@@ -341,8 +356,10 @@ async def execute_task_async(
             f"{request.command}{datetime.now().isoformat()}".encode()
         ).hexdigest()[:12]
 
-        # Add to background tasks
-        background_tasks.add_task(_execute_task_background, task_id, request)
+        # Add to background tasks (mantém o trace do request de origem)
+        background_tasks.add_task(
+            _execute_task_background, task_id, request, current_traceparent()
+        )
 
         logger.info(f"Task {task_id} queued for background execution")
 
@@ -357,7 +374,9 @@ async def execute_task_async(
         raise HTTPException(status_code=500, detail=f"Failed to queue: {str(e)}")
 
 
-async def _execute_task_background(task_id: str, request: ExecuteTaskRequest):
+async def _execute_task_background(
+    task_id: str, request: ExecuteTaskRequest, traceparent: Optional[str] = None
+):
     """Background task execution"""
     try:
         engine = get_omnibrain_engine()
@@ -372,7 +391,14 @@ async def _execute_task_background(task_id: str, request: ExecuteTaskRequest):
             timeout=request.timeout,
         )
 
-        result = await engine.execute(task_input)
+        with tracer.span(
+            "omnibrain.execute",
+            parent=parse_traceparent(traceparent),
+            attributes={"task_id": task_id, "user_id": request.user_id, "async": True},
+        ) as span:
+            result = await engine.execute(task_input, task_id=task_id)
+            if span:
+                span.set_attribute("status", result.status.value)
         logger.info(f"Background task {task_id} completed: {result.status.value}")
 
     except Exception as e:
@@ -665,6 +691,59 @@ async def websocket_stream(websocket: WebSocket):
             pass
 
 
+# ============================================
+# ADMIN - PROFILING
+# ============================================
+
+
+@router.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=120),
+    task_id: Optional[str] = Query(None, description="Amostrar só esta tarefa"),
+    format: str = Query("collapsed", pattern="^(collapsed|svg|json)$"),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+):
+    """
+    Profiling estatístico do worker por N segundos
+
+    Sem task_id amostra todas as threads. Com task_id amostra apenas o
+    event loop enquanto a asyncio.Task que executa essa tarefa no engine
+    está rodando (classificação, geração de código, validação, filtros).
+
+    Returns:
+        collapsed stacks (text/plain), flamegraph SVG ou resumo JSON
+    """
+    if sampling_profiler.busy:
+        raise HTTPException(status_code=409, detail="Profiling already running")
+
+    thread_filter: Optional[ThreadFilter] = None
+    if task_id:
+        engine = get_omnibrain_engine()
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+
+        def task_filter(thread_id: int) -> bool:
+            if thread_id != loop_thread:
+                return False
+            return engine.get_running_task_id(asyncio.current_task(loop)) == task_id
+
+        thread_filter = task_filter
+
+    try:
+        result = await asyncio.to_thread(
+            sampling_profiler.profile, seconds, thread_filter, interval_ms / 1000
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    title = f"omnibrain {task_id or 'worker'} ({result.duration:.1f}s)"
+    if format == "svg":
+        return Response(content=result.flamegraph_svg(title), media_type="image/svg+xml")
+    if format == "json":
+        return {"task_id": task_id, **result.to_dict()}
+    return PlainTextResponse(result.collapsed())
+
+
 # ============================================
 # STARTUP EVENT
 # ============================================
@@ -31,7 +31,6 @@ from reportlab.platypus import (
     Table,
     TableStyle,
 )
-from weasyprint import HTML
 
 router = APIRouter()
 
@@ -202,7 +201,9 @@ async def pdf_from_html(request: PDFFromHTMLRequest):
         </html>
         """
 
-        # Gerar PDF
+        # Gerar PDF (WeasyPrint é pesado: importado sob demanda)
+        from weasyprint import HTML
+
         pdf_bytes = HTML(string=full_html).write_pdf()
 
         # Converter para base64
@@ -11,7 +11,7 @@ import asyncio
 import base64
 import json
 from io import BytesIO
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from urllib.parse import urljoin, urlparse
 
 import httpx
@@ -19,13 +19,10 @@ import requests
 from bs4 import BeautifulSoup
 from fastapi import APIRouter, HTTPException
 from loguru import logger
-from playwright.async_api import async_playwright
 from pydantic import BaseModel, Field, HttpUrl
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+
+from app.services.dom_extraction import extract_items
+from app.services.network_profiles import NetworkPolicy
 
 # ==========================================
 # ROUTER
@@ -33,6 +30,18 @@ from selenium.webdriver.support.ui import WebDriverWait
 
 router = APIRouter()
 
+# Seletores da detecção automática de produtos (em ordem de preferência)
+PRODUCT_CONTAINER_SELECTORS = [
+    ".product",
+    ".product-item",
+    ".product-card",
+    "[data-product]",
+    ".item",
+    ".grid-item",
+]
+PRODUCT_NAME_SELECTORS = [".product-name", ".title", "h2", "h3", "[data-product-name]"]
+PRODUCT_PRICE_SELECTORS = [".price", ".product-price", "[data-price]", ".amount"]
+
 # ==========================================
 # MODELS
 # ==========================================
@@ -57,6 +66,13 @@ class ScrapeRequest(BaseModel):
     approach: str = Field(
         "auto", description="Abordagem: auto, requests, playwright, selenium"
     )
+    network_profile: Optional[Literal["full", "no-media", "text-only"]] = Field(
+        None,
+        description=(
+            "Interceptação no Playwright: full, no-media (sem imagens, mídia, "
+            "fontes e trackers) ou text-only; padrão: no-media, full com screenshot"
+        ),
+    )
 
 
 class Product(BaseModel):
@@ -83,6 +99,7 @@ class ScrapeResponse(BaseModel):
     links: Optional[List[str]] = None
     products: Optional[List[Product]] = None
     screenshot: Optional[str] = None
+    network: Optional[Dict[str, Any]] = None
     method: str
     error: Optional[str] = None
     execution_time: float
@@ -95,6 +112,9 @@ class ProductScrapeRequest(BaseModel):
     max_products: int = Field(100, description="Máximo de produtos a extrair")
     pagination: bool = Field(False, description="Seguir paginação")
     max_pages: int = Field(5, description="Máximo de páginas")
+    network_profile: Literal["full", "no-media", "text-only"] = Field(
+        "no-media", description="Interceptação de requests (só o DOM é necessário)"
+    )
 
 
 # ==========================================
@@ -147,6 +167,7 @@ async def scrape_website(request: ScrapeRequest):
             images=result.get("images"),
             links=result.get("links"),
             screenshot=result.get("screenshot"),
+            network=result.get("network"),
             method=approach,
             execution_time=execution_time,
         )
@@ -175,40 +196,31 @@ async def scrape_products(request: ProductScrapeRequest):
 
         products = []
 
+        from playwright.async_api import async_playwright
+
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
+            context = await browser.new_context()
+            network = NetworkPolicy(request.network_profile)
+            await network.attach(context)
+            page = await context.new_page()
 
             await page.goto(request.url, wait_until="networkidle", timeout=30000)
 
             # Aguardar produtos carregarem
             await page.wait_for_timeout(2000)
 
-            # Tentar detectar produtos automaticamente
-            product_selectors = [
-                ".product",
-                ".product-item",
-                ".product-card",
-                "[data-product]",
-                ".item",
-                ".grid-item",
-            ]
-
-            product_elements = None
-            for selector in product_selectors:
-                elements = await page.query_selector_all(selector)
-                if elements and len(elements) > 0:
-                    product_elements = elements
-                    logger.info(
-                        f"✅ Encontrados {len(elements)} produtos com: {selector}"
-                    )
-                    break
-
-            if product_elements:
-                for element in product_elements[: request.max_products]:
-                    product = await extract_product_data(element, page)
-                    if product:
-                        products.append(product)
+            # Detecção automática + extração num único evaluate (um round
+            # trip para a página inteira, em vez de um por campo de produto)
+            extracted = await extract_items(
+                page, product_card_spec(request.max_products)
+            )
+            if extracted["container"]:
+                logger.info(
+                    f"✅ Encontrados {extracted['total']} produtos com: "
+                    f"{extracted['container']}"
+                )
+            products = extracted["items"]
 
             await browser.close()
 
@@ -217,6 +229,7 @@ async def scrape_products(request: ProductScrapeRequest):
             "url": request.url,
             "total_products": len(products),
             "products": products,
+            "network": network.page.to_dict(),
         }
 
     except Exception as e:
@@ -307,6 +320,7 @@ async def scrape_with_requests(request: ScrapeRequest) -> Dict[str, Any]:
 
 async def scrape_with_playwright(request: ScrapeRequest) -> Dict[str, Any]:
     """Scraping com Playwright (suporta JavaScript)"""
+    from playwright.async_api import async_playwright
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
@@ -316,6 +330,14 @@ async def scrape_with_playwright(request: ScrapeRequest) -> Dict[str, Any]:
             context_options["user_agent"] = request.user_agent
 
         context = await browser.new_context(**context_options)
+
+        # Bloqueia o que o scraping não usa; assets estáticos vêm do cache
+        # compartilhado entre contextos
+        profile = request.network_profile or (
+            "full" if request.screenshot else "no-media"
+        )
+        network = NetworkPolicy(profile)
+        await network.attach(context)
         page = await context.new_page()
 
         # Navegar
@@ -376,6 +398,7 @@ async def scrape_with_playwright(request: ScrapeRequest) -> Dict[str, Any]:
             )
             result["links"] = links
 
+        result["network"] = network.page.to_dict()
         await browser.close()
 
     return result
@@ -383,6 +406,12 @@ async def scrape_with_playwright(request: ScrapeRequest) -> Dict[str, Any]:
 
 def scrape_with_selenium(request: ScrapeRequest) -> Dict[str, Any]:
     """Scraping com Selenium (compatibilidade máxima)"""
+    # Selenium só é importado quando approach="selenium"
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
 
     chrome_options = Options()
     chrome_options.add_argument("--headless")
@@ -420,60 +449,21 @@ def scrape_with_selenium(request: ScrapeRequest) -> Dict[str, Any]:
         driver.quit()
 
 
-async def extract_product_data(element, page) -> Optional[Dict[str, Any]]:
-    """Extrai dados de um elemento de produto"""
-
-    try:
-        product = {}
-
-        # Nome
-        name_selectors = [".product-name", ".title", "h2", "h3", "[data-product-name]"]
-        for selector in name_selectors:
-            try:
-                name_el = await element.query_selector(selector)
-                if name_el:
-                    product["name"] = await name_el.inner_text()
-                    break
-            except:
-                continue
-
-        # Preço
-        price_selectors = [".price", ".product-price", "[data-price]", ".amount"]
-        for selector in price_selectors:
-            try:
-                price_el = await element.query_selector(selector)
-                if price_el:
-                    product["price"] = await price_el.inner_text()
-                    break
-            except:
-                continue
-
-        # Imagem
-        try:
-            img_el = await element.query_selector("img")
-            if img_el:
-                src = await img_el.get_attribute("src") or await img_el.get_attribute(
-                    "data-src"
-                )
-                product["image"] = src
-        except:
-            pass
-
-        # Link
-        try:
-            link_el = await element.query_selector("a")
-            if link_el:
-                href = await link_el.get_attribute("href")
-                if href:
-                    product["link"] = href
-        except:
-            pass
-
-        return product if product.get("name") else None
-
-    except Exception as e:
-        logger.error(f"❌ Erro ao extrair produto: {str(e)}")
-        return None
+def product_card_spec(max_products: int) -> Dict[str, Any]:
+    """Spec de extração (app.services.dom_extraction) dos cards de produto"""
+    return {
+        # Tentar detectar produtos automaticamente: primeiro seletor que casar
+        "containers": PRODUCT_CONTAINER_SELECTORS,
+        "limit": max_products,
+        "fields": [
+            {"key": "name", "selectors": PRODUCT_NAME_SELECTORS},
+            {"key": "price", "selectors": PRODUCT_PRICE_SELECTORS},
+            {"key": "image", "selectors": ["img"], "attrs": ["src", "data-src"]},
+            {"key": "link", "selectors": ["a"], "attrs": ["href"], "skip_empty": True},
+        ],
+        # Produto sem nome é descartado
+        "require": "name",
+    }
 
 
 # ==========================================
@@ -13,8 +13,9 @@ Endpoints:
 - POST /webhooks/{id}/pause - Pausar webhook
 - POST /webhooks/{id}/resume - Resumir webhook
 - POST /webhooks/{id}/test - Testar webhook
-- GET /webhooks/{id}/deliveries - Histórico de entregas
+- GET /webhooks/{id}/deliveries - Histórico de entregas (paginação por cursor)
 - GET /webhooks/statistics - Estatísticas gerais
+- GET /webhooks/dispatcher/metrics - Queue lag e entregas em andamento por host
 
 Autor: SyncAds AI Team
 Versão: 2.0.0
@@ -22,10 +23,11 @@ Data: 2025-01-15
 ============================================
 """
 
+import asyncio
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from pydantic import BaseModel, Field, HttpUrl
 
 from app.webhooks import (
@@ -61,6 +63,8 @@ class WebhookCreateRequest(BaseModel):
     retry_delay: int = Field(5, ge=1, le=60)
     filters: Optional[dict] = {}
     rate_limit: Optional[int] = Field(None, ge=1)
+    batch_max_size: int = Field(1, ge=1, le=1000, description="1 = sem batching")
+    batch_max_latency: float = Field(1.0, ge=0.01, le=300)
 
     class Config:
         schema_extra = {
@@ -86,6 +90,8 @@ class WebhookUpdateRequest(BaseModel):
     retry_delay: Optional[int] = Field(None, ge=1, le=60)
     filters: Optional[dict] = None
     rate_limit: Optional[int] = Field(None, ge=1)
+    batch_max_size: Optional[int] = Field(None, ge=1, le=1000)
+    batch_max_latency: Optional[float] = Field(None, ge=0.01, le=300)
 
 
 class WebhookResponse(BaseModel):
@@ -101,6 +107,8 @@ class WebhookResponse(BaseModel):
     last_delivery: Optional[str] = None
     success_count: int
     failure_count: int
+    batch_max_size: int = 1
+    batch_max_latency: float = 1.0
     secret: str  # Incluir apenas na criação
 
 
@@ -142,6 +150,7 @@ class DeliveryHistoryResponse(BaseModel):
     deliveries: List[DeliveryResponse]
     total: int
     webhook_id: str
+    next_cursor: Optional[str] = None
 
 
 class WebhookStatisticsResponse(BaseModel):
@@ -150,6 +159,7 @@ class WebhookStatisticsResponse(BaseModel):
     total_webhooks: int
     active_webhooks: int
     total_deliveries: int
+    stored_deliveries: int
     total_sent: int
     total_success: int
     total_failed: int
@@ -192,6 +202,8 @@ def webhook_to_response(webhook) -> WebhookResponse:
         else None,
         success_count=webhook.success_count,
         failure_count=webhook.failure_count,
+        batch_max_size=webhook.batch_max_size,
+        batch_max_latency=webhook.batch_max_latency,
         secret=webhook.secret,
     )
 
@@ -244,6 +256,8 @@ async def create_webhook(request: WebhookCreateRequest):
         retry_delay=request.retry_delay,
         filters=request.filters or {},
         rate_limit=request.rate_limit,
+        batch_max_size=request.batch_max_size,
+        batch_max_latency=request.batch_max_latency,
     )
 
     return webhook_to_response(webhook)
@@ -272,6 +286,69 @@ async def list_webhooks(status_filter: Optional[str] = None):
     )
 
 
+@router.get("/statistics", response_model=WebhookStatisticsResponse)
+async def get_webhook_statistics():
+    """Retorna estatísticas de webhooks"""
+    manager = get_webhook_manager()
+
+    stats = manager.get_statistics()
+
+    # Calcular taxas
+    total_sent = stats.get("total_sent", 0)
+    success_rate = (
+        (stats.get("total_success", 0) / total_sent * 100) if total_sent > 0 else 0.0
+    )
+    failure_rate = (
+        (stats.get("total_failed", 0) / total_sent * 100) if total_sent > 0 else 0.0
+    )
+
+    return WebhookStatisticsResponse(
+        total_webhooks=stats.get("total_webhooks", 0),
+        active_webhooks=stats.get("active_webhooks", 0),
+        total_deliveries=stats.get("total_deliveries", 0),
+        stored_deliveries=stats.get("stored_deliveries", 0),
+        total_sent=total_sent,
+        total_success=stats.get("total_success", 0),
+        total_failed=stats.get("total_failed", 0),
+        total_retries=stats.get("total_retries", 0),
+        success_rate=round(success_rate, 2),
+        failure_rate=round(failure_rate, 2),
+    )
+
+
+@router.get("/dispatcher/metrics")
+async def get_dispatcher_metrics():
+    """Queue lag, entregas em andamento e backlog por host de destino"""
+    dispatcher = get_webhook_dispatcher()
+    return dispatcher.get_metrics()
+
+
+# ============================================
+# HEALTH CHECK
+# ============================================
+
+
+@router.get("/health")
+async def webhooks_health():
+    """Health check do sistema de webhooks"""
+    manager = get_webhook_manager()
+    dispatcher = get_webhook_dispatcher()
+
+    stats = manager.get_statistics()
+
+    return {
+        "status": "healthy",
+        "service": "webhooks",
+        "dispatcher_running": dispatcher.running,
+        "total_webhooks": stats.get("total_webhooks", 0),
+        "active_webhooks": stats.get("active_webhooks", 0),
+        "queue_size": manager.queue.qsize(),
+        "workers": len(dispatcher.worker_tasks),
+        "in_flight": sum(lane.in_flight for lane in dispatcher.lanes.values()),
+    }
+
+
+# Rotas com {webhook_id} ficam depois das rotas fixas (/statistics, /health)
 @router.get("/{webhook_id}", response_model=WebhookResponse)
 async def get_webhook(webhook_id: str):
     """Busca webhook específico"""
@@ -317,6 +394,10 @@ async def update_webhook(webhook_id: str, request: WebhookUpdateRequest):
         updates["filters"] = request.filters
     if request.rate_limit is not None:
         updates["rate_limit"] = request.rate_limit
+    if request.batch_max_size is not None:
+        updates["batch_max_size"] = request.batch_max_size
+    if request.batch_max_latency is not None:
+        updates["batch_max_latency"] = request.batch_max_latency
 
     # Atualizar
     webhook = manager.update(webhook_id, **updates)
@@ -407,8 +488,18 @@ async def test_webhook(webhook_id: str, request: WebhookTestRequest):
 
 
 @router.get("/{webhook_id}/deliveries", response_model=DeliveryHistoryResponse)
-async def get_webhook_deliveries(webhook_id: str, limit: int = 50, offset: int = 0):
-    """Busca histórico de deliveries de um webhook"""
+async def get_webhook_deliveries(
+    webhook_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+):
+    """
+    Busca histórico de deliveries de um webhook
+
+    Use `next_cursor` da resposta como `cursor` para a próxima página;
+    `offset` é mantido para compatibilidade.
+    """
     manager = get_webhook_manager()
 
     webhook = manager.get(webhook_id)
@@ -417,75 +508,25 @@ async def get_webhook_deliveries(webhook_id: str, limit: int = 50, offset: int =
             status_code=status.HTTP_404_NOT_FOUND, detail="Webhook not found"
         )
 
-    # Filtrar deliveries deste webhook
-    deliveries = [d for d in manager.deliveries.values() if d.webhook_id == webhook_id]
-
-    # Ordenar por data (mais recentes primeiro)
-    deliveries.sort(key=lambda d: d.created_at, reverse=True)
+    # Log persistente, mais recentes primeiro (keyset no índice do webhook)
+    try:
+        deliveries, next_cursor = await asyncio.to_thread(
+            manager.list_deliveries, webhook_id, limit, cursor, offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Paginação
-    total = len(deliveries)
-    deliveries = deliveries[offset : offset + limit]
+    # Total vem dos contadores incrementais (sem COUNT no log)
+    total = manager.delivery_stats(webhook_id)["stored"]
 
     return DeliveryHistoryResponse(
         deliveries=[delivery_to_response(d) for d in deliveries],
         total=total,
         webhook_id=webhook_id,
+        next_cursor=next_cursor,
     )
 
 
-@router.get("/statistics", response_model=WebhookStatisticsResponse)
-async def get_webhook_statistics():
-    """Retorna estatísticas de webhooks"""
-    manager = get_webhook_manager()
-
-    stats = manager.get_statistics()
-
-    # Calcular taxas
-    total_sent = stats.get("total_sent", 0)
-    success_rate = (
-        (stats.get("total_success", 0) / total_sent * 100) if total_sent > 0 else 0.0
-    )
-    failure_rate = (
-        (stats.get("total_failed", 0) / total_sent * 100) if total_sent > 0 else 0.0
-    )
-
-    return WebhookStatisticsResponse(
-        total_webhooks=stats.get("total_webhooks", 0),
-        active_webhooks=stats.get("active_webhooks", 0),
-        total_deliveries=stats.get("total_deliveries", 0),
-        total_sent=total_sent,
-        total_success=stats.get("total_success", 0),
-        total_failed=stats.get("total_failed", 0),
-        total_retries=stats.get("total_retries", 0),
-        success_rate=round(success_rate, 2),
-        failure_rate=round(failure_rate, 2),
-    )
-
-
-# ============================================
-# HEALTH CHECK
-# ============================================
-
-
-@router.get("/health")
-async def webhooks_health():
-    """Health check do sistema de webhooks"""
-    manager = get_webhook_manager()
-    dispatcher = get_webhook_dispatcher()
-
-    stats = manager.get_statistics()
-
-    return {
-        "status": "healthy",
-        "service": "webhooks",
-        "dispatcher_running": dispatcher.running,
-        "total_webhooks": stats.get("total_webhooks", 0),
-        "active_webhooks": stats.get("active_webhooks", 0),
-        "queue_size": manager.queue.qsize(),
-    }
-
-
 # ============================================
 # STARTUP EVENT
 # ============================================
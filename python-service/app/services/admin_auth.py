@@ -0,0 +1,25 @@
+"""
+Admin Authentication
+FastAPI dependency guarding operational endpoints (profiling, debugging).
+
+Callers must send the X-Admin-Token header matching ADMIN_API_TOKEN.
+When ADMIN_API_TOKEN is not configured, admin endpoints are disabled.
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject the request unless X-Admin-Token matches ADMIN_API_TOKEN"""
+    expected = os.getenv("ADMIN_API_TOKEN")
+    if not expected:
+        raise HTTPException(
+            status_code=403, detail="Admin endpoints disabled (ADMIN_API_TOKEN not set)"
+        )
+
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
@@ -0,0 +1,269 @@
+"""
+Browser Farm
+Session-affine sharding of browser automation over several Chromium
+processes.
+
+A single BrowserService drives one Chromium through one Playwright
+driver, so every session shares that browser process and its driver
+connection, and throughput stops at about one core. The farm runs
+`shards` independent BrowserServices (each with its own driver, browser
+process and ContextPool) and routes every call by session_id:
+
+    shard = crc32(session_id) % shards
+
+The hash is stable across processes and restarts, so a session always
+lands on the browser that holds its context, and replicas / workers
+agree on the mapping.
+
+A health check pings every started shard (`is_connected()` plus a
+throwaway context) every `health_interval` seconds and restarts the
+ones whose browser crashed or stopped answering. Sessions of a
+restarted shard are lost; the others are untouched.
+
+Shards start lazily, on their first session. The farm spreads the
+browser side (Chromium + driver) across cores; for Python-side CPU run
+more API workers, each with its own farm (e.g. BROWSER_SHARDS=1 per
+worker), with session-sticky routing in front of them.
+
+Sharding is opt-in: every shard is a whole Chromium, so the default is
+a single one. BROWSER_MAX_CONTEXTS and BROWSER_PREWARM_CONTEXTS are
+totals for the farm and are split across the shards (rounded up), so
+raising BROWSER_SHARDS does not multiply the memory budget.
+
+Configuration (env):
+    BROWSER_SHARDS            browser processes (default 1)
+    BROWSER_HEALTH_INTERVAL   seconds between health checks (default 15)
+    BROWSER_HEALTH_TIMEOUT    seconds a ping may take (default 10)
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def shard_index(session_id: str, shards: int) -> int:
+    """Stable session -> shard mapping (same in every process)"""
+    return zlib.crc32(session_id.encode()) % shards
+
+
+class BrowserFarm:
+    """
+    N BrowserService shards behind the BrowserService API
+    """
+
+    def __init__(
+        self,
+        shard_factory: Callable[[], Any],
+        shards: int = 1,
+        health_interval: float = 15.0,
+        health_timeout: float = 10.0,
+    ):
+        self.shards: List[Any] = [shard_factory() for _ in range(max(1, shards))]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.restarts = [0] * len(self.shards)
+        self._health_task: Optional[asyncio.Task] = None
+
+    def shard_for(self, session_id: str):
+        self._ensure_health_check()
+        return self.shards[shard_index(session_id, len(self.shards))]
+
+    # ------------------------------------------
+    # SESSIONS (routed by session_id)
+    # ------------------------------------------
+
+    @property
+    def contexts(self) -> Dict[str, Any]:
+        return {sid: c for shard in self.shards for sid, c in shard.contexts.items()}
+
+    @property
+    def pages(self) -> Dict[str, Any]:
+        return {sid: p for shard in self.shards for sid, p in shard.pages.items()}
+
+    async def create_session(
+        self,
+        session_id: str,
+        user_agent: Optional[str] = None,
+        network_profile: Optional[str] = None,
+        persist: bool = True,
+    ):
+        return await self.shard_for(session_id).create_session(
+            session_id, user_agent, network_profile, persist
+        )
+
+    @asynccontextmanager
+    async def pinned(self, session_id: str):
+        async with self.shard_for(session_id).pinned(session_id):
+            yield
+
+    async def set_network_profile(self, session_id: str, network_profile: str):
+        shard = self.shard_for(session_id)
+        await shard.set_network_profile(session_id, network_profile)
+
+    @asynccontextmanager
+    async def network_profile(self, session_id: str, network_profile: Optional[str]):
+        shard = self.shard_for(session_id)
+        async with shard.network_profile(session_id, network_profile):
+            yield
+
+    async def close_session(self, session_id: str, forget: bool = False) -> bool:
+        return await self.shard_for(session_id).close_session(session_id, forget)
+
+    @asynccontextmanager
+    async def temp_session(
+        self, prefix: str = "temp", network_profile: Optional[str] = None
+    ):
+        # Temp ids are random: put the session on the least loaded shard
+        # and draw an id that hashes to it, so routing by id still works
+        index = min(
+            range(len(self.shards)),
+            key=lambda i: len(self.shards[i].pool.sessions),
+        )
+        session_id = f"{prefix}_{uuid.uuid4()}"
+        while shard_index(session_id, len(self.shards)) != index:
+            session_id = f"{prefix}_{uuid.uuid4()}"
+
+        self._ensure_health_check()
+        async with self.shards[index].temp_session(
+            session_id=session_id, network_profile=network_profile
+        ):
+            yield session_id
+
+    async def navigate(
+        self, session_id: str, url: str, human: bool = True
+    ) -> Dict[str, Any]:
+        return await self.shard_for(session_id).navigate(session_id, url, human)
+
+    async def run_batch(
+        self, session_id: str, steps: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        return await self.shard_for(session_id).run_batch(session_id, steps)
+
+    async def fill_form(
+        self,
+        session_id: str,
+        form_data: Dict[str, Any],
+        form_selector: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        return await self.shard_for(session_id).fill_form(
+            session_id, form_data, form_selector
+        )
+
+    async def click_element(self, session_id: str, selector: str) -> Dict[str, Any]:
+        return await self.shard_for(session_id).click_element(session_id, selector)
+
+    async def extract_data(
+        self, session_id: str, selectors: Dict[str, str]
+    ) -> Dict[str, Any]:
+        return await self.shard_for(session_id).extract_data(session_id, selectors)
+
+    async def screenshot(
+        self, session_id: str, full_page: bool = False
+    ) -> Dict[str, Any]:
+        return await self.shard_for(session_id).screenshot(session_id, full_page)
+
+    async def scrape_products(
+        self, session_id: str, product_selectors: Dict[str, str]
+    ) -> Dict[str, Any]:
+        return await self.shard_for(session_id).scrape_products(
+            session_id, product_selectors
+        )
+
+    async def detect_checkout_form(self, session_id: str) -> Dict[str, Any]:
+        return await self.shard_for(session_id).detect_checkout_form(session_id)
+
+    # ------------------------------------------
+    # HEALTH
+    # ------------------------------------------
+
+    def _ensure_health_check(self):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(
+                self._health_loop(), name="browser-farm-health"
+            )
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_health()
+
+    async def check_health(self) -> List[int]:
+        """Restart crashed or hung shards; returns the restarted indexes"""
+        restarted = []
+        for index, shard in enumerate(self.shards):
+            if shard.browser is None:
+                continue  # not started yet
+            try:
+                healthy = await asyncio.wait_for(shard.ping(), self.health_timeout)
+            except Exception as e:
+                logger.warning(f"Browser shard {index} ping failed: {e}")
+                healthy = False
+            if healthy:
+                continue
+
+            logger.error(f"Browser shard {index} is down; restarting")
+            try:
+                await shard.restart()
+                self.restarts[index] += 1
+                restarted.append(index)
+            except Exception as e:
+                logger.error(f"Browser shard {index} restart failed: {e}")
+        return restarted
+
+    async def cleanup(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await asyncio.gather(
+            *(shard.cleanup() for shard in self.shards), return_exceptions=True
+        )
+
+    def get_network_statistics(self) -> Dict[str, Any]:
+        # Process-wide (cache and totals are shared by every shard)
+        return self.shards[0].get_network_statistics()
+
+    def get_pool_statistics(self) -> Dict[str, Any]:
+        shards = []
+        for index, shard in enumerate(self.shards):
+            stats = shard.get_pool_statistics()
+            stats.update(
+                shard=index,
+                started=shard.browser is not None,
+                connected=shard.is_connected(),
+                restarts=self.restarts[index],
+            )
+            shards.append(stats)
+        return {
+            "shards": len(self.shards),
+            "live": sum(s["live"] for s in shards),
+            "warm": sum(s["warm"] for s in shards),
+            "max_contexts": sum(s["max_contexts"] for s in shards),
+            "restarts": sum(self.restarts),
+            "per_shard": shards,
+        }
+
+
+def create_browser_farm_from_env(shard_factory: Callable[..., Any]) -> BrowserFarm:
+    """
+    Build the farm from BROWSER_SHARDS / BROWSER_HEALTH_* env vars
+
+    `shard_factory(shards=n)` builds one shard sized for a farm of n.
+    """
+    shards = max(1, int(os.getenv("BROWSER_SHARDS", "1")))
+    return BrowserFarm(
+        partial(shard_factory, shards=shards),
+        shards=shards,
+        health_interval=float(os.getenv("BROWSER_HEALTH_INTERVAL", "15")),
+        health_timeout=float(os.getenv("BROWSER_HEALTH_TIMEOUT", "10")),
+    )
@@ -0,0 +1,389 @@
+"""
+Browser Context Pool
+Bounded pool of Playwright browser contexts, one per session.
+
+Contexts used to live in a dict keyed by session_id until someone closed
+them by hand, so one-off sessions that hit an error path (and every
+session a client forgot about) stayed open until Chromium was OOM-killed.
+
+- At most `max_contexts` sessions are live. Opening another one evicts
+  the least recently used session that is not pinned (pinned = a
+  one-off request is still using it); PoolExhausted when all are pinned.
+- A sweeper closes sessions idle for more than `idle_timeout` seconds.
+- `prewarm` blank contexts, each with an about:blank page, are kept
+  ready: a new session takes one instead of waiting for a context and a
+  page to be created, and a background task refills the warm set.
+- With a SessionStateStore, closing a session (eviction, idle, explicit
+  close, shutdown) saves its storage state, and a returning session_id
+  gets a context created from it, so logins survive evictions and
+  restarts. Such sessions are cold-started: storage state can only be
+  set when a context is created. Sessions opened with persist=False
+  (generated one-off ids) are never saved, and the sweeper also prunes
+  expired states every `prune_interval` seconds.
+
+Configuration (env):
+    BROWSER_MAX_CONTEXTS          max live sessions (default 20)
+    BROWSER_CONTEXT_IDLE_TIMEOUT  seconds before an idle session is closed
+                                  (default 300)
+    BROWSER_PREWARM_CONTEXTS      blank contexts kept ready (default 2)
+    (context counts are per process: a browser farm splits them across
+    its shards)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from app.services.session_state import (
+    SessionStateStore,
+    create_session_state_store_from_env,
+)
+
+logger = logging.getLogger(__name__)
+
+# Creates a configured BrowserContext: (user_agent, storage_state);
+# user_agent None = pick one, storage_state None = empty context
+ContextFactory = Callable[[Optional[str], Optional[Dict[str, Any]]], Awaitable[Any]]
+
+
+class PoolExhausted(Exception):
+    """Every live session is pinned; nothing can be evicted"""
+
+
+@dataclass(eq=False)
+class PooledSession:
+    """A browser context and the page the session is working on"""
+
+    context: Any
+    page: Any = None
+    session_id: Optional[str] = None
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    pins: int = 0
+    # False for one-off sessions: nothing worth keeping after they close
+    persist: bool = True
+    # Request interception of the context (NetworkPolicy, set by BrowserService)
+    network: Any = None
+
+    def touch(self):
+        self.last_used = time.monotonic()
+
+    async def get_page(self):
+        """Current page, opening a new one if it was closed"""
+        if self.page is None or self.page.is_closed():
+            self.page = await self.context.new_page()
+        return self.page
+
+    async def close(self):
+        # Closing the context closes its pages too
+        try:
+            await self.context.close()
+        except Exception as e:
+            logger.warning(f"Failed to close browser context {self.session_id}: {e}")
+        self.page = None
+
+
+class ContextPool:
+    """
+    LRU + idle-timeout pool of per-session browser contexts
+    """
+
+    def __init__(
+        self,
+        factory: ContextFactory,
+        max_contexts: int = 20,
+        idle_timeout: float = 300.0,
+        prewarm: int = 2,
+        sweep_interval: float = 30.0,
+        state_store: Optional[SessionStateStore] = None,
+        prune_interval: float = 3600.0,
+    ):
+        self.factory = factory
+        self.state_store = state_store
+        self.max_contexts = max_contexts
+        self.idle_timeout = idle_timeout
+        self.prewarm = prewarm
+        self.sweep_interval = sweep_interval
+        self.prune_interval = prune_interval
+        self._last_prune = time.monotonic()
+
+        self.sessions: "OrderedDict[str, PooledSession]" = OrderedDict()
+        self.warm: Deque[PooledSession] = deque()
+        self._lock = asyncio.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._warmer: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.stats = {
+            "opened": 0,
+            "warm_hits": 0,
+            "cold_starts": 0,
+            "evicted_lru": 0,
+            "evicted_idle": 0,
+            "closed": 0,
+            "warm_errors": 0,
+            "restored": 0,
+        }
+
+    # ------------------------------------------
+    # SESSIONS
+    # ------------------------------------------
+
+    def get(self, session_id: str) -> Optional[PooledSession]:
+        """Live session (marked as used), or None"""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            session.touch()
+            self.sessions.move_to_end(session_id)
+        return session
+
+    async def acquire(
+        self, session_id: str, user_agent: Optional[str] = None
+    ) -> PooledSession:
+        """Existing session, or a new one (from the warm set when possible)"""
+        session = self.get(session_id)
+        if session is not None:
+            return session
+        async with self._lock:
+            session = self.get(session_id)
+            if session is None:
+                session = await self._open(session_id, user_agent)
+        return session
+
+    async def open(
+        self, session_id: str, user_agent: Optional[str] = None, persist: bool = True
+    ) -> PooledSession:
+        """
+        Fresh session, replacing (and closing) one with the same id
+
+        persist=False: no state is restored or saved for it (one-off ids).
+        """
+        async with self._lock:
+            await self.close_session(session_id)
+            return await self._open(session_id, user_agent, persist)
+
+    async def _open(
+        self, session_id: str, user_agent: Optional[str], persist: bool = True
+    ) -> PooledSession:
+        await self._make_room()
+
+        state = None
+        if self.state_store is not None and persist:
+            state = await self.state_store.load(session_id)
+
+        if state is not None:
+            self.stats["restored"] += 1
+            self.stats["cold_starts"] += 1
+            session = await self._new_session(user_agent, state)
+        elif self.warm and user_agent is None:
+            self.stats["warm_hits"] += 1
+            session = self.warm.popleft()
+        else:
+            self.stats["cold_starts"] += 1
+            session = await self._new_session(user_agent)
+
+        session.session_id = session_id
+        session.persist = persist
+        session.touch()
+        self.sessions[session_id] = session
+        self.stats["opened"] += 1
+        self._ensure_background()
+        return session
+
+    async def _new_session(
+        self,
+        user_agent: Optional[str] = None,
+        storage_state: Optional[Dict[str, Any]] = None,
+    ) -> PooledSession:
+        context = await self.factory(user_agent, storage_state)
+        session = PooledSession(context)
+        try:
+            await session.get_page()
+        except Exception:
+            await session.close()
+            raise
+        return session
+
+    async def _make_room(self):
+        while len(self.sessions) >= self.max_contexts:
+            victim = next(
+                (sid for sid, s in self.sessions.items() if s.pins == 0), None
+            )
+            if victim is None:
+                raise PoolExhausted(
+                    f"All {self.max_contexts} browser sessions are in use"
+                )
+            logger.info(f"Browser pool full: evicting session {victim}")
+            await self.close_session(victim, reason="lru")
+
+    async def close_session(
+        self, session_id: str, reason: Optional[str] = None
+    ) -> bool:
+        """Close a session (saving its state first); False when it was not open"""
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return False
+        await self._save_state(session)
+        await session.close()
+        self.stats[f"evicted_{reason}" if reason else "closed"] += 1
+        return True
+
+    async def _save_state(self, session: PooledSession):
+        if self.state_store is None or not session.persist:
+            return
+        try:
+            state = await session.context.storage_state()
+        except Exception as e:
+            # Browser already gone (crash): nothing left to save
+            logger.warning(f"Could not read state of session {session.session_id}: {e}")
+            return
+        await self.state_store.save(session.session_id, state)
+
+    @asynccontextmanager
+    async def pinned(self, session_id: str, user_agent: Optional[str] = None):
+        """Session protected from eviction while the block runs"""
+        session = await self.acquire(session_id, user_agent)
+        session.pins += 1
+        try:
+            yield session
+        finally:
+            session.pins -= 1
+            session.touch()
+
+    # ------------------------------------------
+    # BACKGROUND (idle sweep + warm set)
+    # ------------------------------------------
+
+    def start(self):
+        """Start the sweeper and fill the warm set (needs a running loop)"""
+        if self.state_store is not None:
+            self.state_store.prune()
+        self._ensure_background()
+
+    def _ensure_background(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(
+                self._sweep_loop(), name="browser-pool-sweeper"
+            )
+        if len(self.warm) < self.prewarm and (
+            self._warmer is None or self._warmer.done()
+        ):
+            self._warmer = asyncio.create_task(
+                self._refill_warm(), name="browser-pool-warmer"
+            )
+
+    async def _sweep_loop(self):
+        while not self._closing:
+            await asyncio.sleep(self.sweep_interval)
+            await self.evict_idle()
+            await self.prune_states()
+
+    async def prune_states(self, force: bool = False) -> int:
+        """Remove expired saved states, at most every `prune_interval` s"""
+        if self.state_store is None:
+            return 0
+        now = time.monotonic()
+        if not force and now - self._last_prune < self.prune_interval:
+            return 0
+        self._last_prune = now
+        try:
+            return await asyncio.to_thread(self.state_store.prune)
+        except Exception as e:
+            logger.warning(f"Failed to prune browser states: {e}")
+            return 0
+
+    def _is_idle(self, session: PooledSession, now: float) -> bool:
+        return session.pins == 0 and now - session.last_used >= self.idle_timeout
+
+    async def evict_idle(self) -> int:
+        """Close sessions unused for `idle_timeout` seconds"""
+        closed = 0
+        async with self._lock:
+            candidates = list(self.sessions)
+            for session_id in candidates:
+                # Re-checked right before each close: earlier closes await,
+                # and a request may pin or use the session meanwhile
+                session = self.sessions.get(session_id)
+                if session is None or not self._is_idle(session, time.monotonic()):
+                    continue
+                logger.info(f"Closing idle browser session {session_id}")
+                await self.close_session(session_id, reason="idle")
+                closed += 1
+        return closed
+
+    async def _refill_warm(self):
+        while not self._closing and len(self.warm) < self.prewarm:
+            try:
+                session = await self._new_session()
+            except Exception as e:
+                self.stats["warm_errors"] += 1
+                logger.warning(f"Failed to pre-warm browser context: {e}")
+                return
+            if self._closing:
+                await session.close()
+                return
+            self.warm.append(session)
+
+    async def close(self):
+        """Close every session and warm context (shutdown / browser restart)"""
+        self._closing = True
+        for task in (self._sweeper, self._warmer):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sweeper = self._warmer = None
+
+        for session_id in list(self.sessions):
+            await self.close_session(session_id)
+        while self.warm:
+            await self.warm.popleft().close()
+        self._closing = False
+
+    def get_statistics(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        idle = [now - s.last_used for s in self.sessions.values()]
+        return {
+            **self.stats,
+            "live": len(self.sessions),
+            "warm": len(self.warm),
+            "pinned": sum(1 for s in self.sessions.values() if s.pins),
+            "max_contexts": self.max_contexts,
+            "occupancy": round(len(self.sessions) / self.max_contexts, 3),
+            "prewarm": self.prewarm,
+            "idle_timeout": self.idle_timeout,
+            "max_idle_s": round(max(idle), 1) if idle else 0.0,
+            "state_store": (
+                None
+                if self.state_store is None
+                else self.state_store.get_statistics()
+            ),
+        }
+
+
+def create_context_pool_from_env(
+    factory: ContextFactory, shards: int = 1
+) -> ContextPool:
+    """
+    Build a pool from BROWSER_* env vars (state store: see session_state)
+
+    With `shards` pools (one per farm shard) each gets its share of the
+    context counts, rounded up.
+    """
+    shards = max(1, shards)
+    max_contexts = int(os.getenv("BROWSER_MAX_CONTEXTS", "20"))
+    prewarm = int(os.getenv("BROWSER_PREWARM_CONTEXTS", "2"))
+    return ContextPool(
+        factory,
+        max_contexts=max(1, -(-max_contexts // shards)),
+        idle_timeout=float(os.getenv("BROWSER_CONTEXT_IDLE_TIMEOUT", "300")),
+        prewarm=-(-prewarm // shards),
+        state_store=create_session_state_store_from_env(),
+    )
@@ -12,56 +12,320 @@ from datetime import datetime
 from playwright.async_api import async_playwright, Browser, Page, BrowserContext
 from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import random
+import uuid
+from contextlib import asynccontextmanager
+
+from app.services.browser_farm import create_browser_farm_from_env
+from app.services.browser_pool import PooledSession, create_context_pool_from_env
+from app.services.dom_extraction import detect_form_fields, extract_items, product_spec
+from app.services.network_profiles import NetworkPolicy, get_network_statistics
+from app.services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Runs a batch of DOM actions in one page.evaluate round trip (no human
+# emulation). Steps: {type: click|fill|extract|scroll, selector, value,
+# selectors}; returns one {type, success, ms, ...} per step, in order.
+# A failed step does not stop the batch, like the one-by-one execution.
+# el.click() does not wait for a navigation it starts: callers end the
+# batch at a click and run_batch waits for that navigation afterwards.
+# After a batch click: how long a main-frame navigation request may take
+# to show up before the click counts as "did not navigate", and how long
+# a started navigation may take to reach domcontentloaded (seconds)
+BATCH_NAVIGATION_GRACE = 0.25
+BATCH_NAVIGATION_TIMEOUT = 30.0
+
+BATCH_ACTIONS_SCRIPT = """
+(steps) => {
+    const fieldCandidates = (id) => [
+        `input[name="${id}"]`, `input[id="${id}"]`,
+        `textarea[name="${id}"]`, `select[name="${id}"]`, id,
+    ];
+    const find = (selectors) => {
+        for (const sel of selectors) {
+            try {
+                const el = document.querySelector(sel);
+                if (el) return el;
+            } catch (e) { /* not a valid CSS selector */ }
+        }
+        throw new Error('Element not found: ' + selectors[selectors.length - 1]);
+    };
+    const setValue = (el, value) => {
+        // Native setter so React/Vue controlled inputs see the change
+        const proto = Object.getPrototypeOf(el);
+        const desc = Object.getOwnPropertyDescriptor(proto, 'value');
+        if (desc && desc.set) desc.set.call(el, value); else el.value = value;
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+    };
+
+    const results = [];
+    for (const step of steps) {
+        const start = performance.now();
+        const out = {type: step.type, selector: step.selector || null};
+        try {
+            if (step.type === 'scroll') {
+                window.scrollTo(0, document.body.scrollHeight);
+                out.scrolled = true;
+            } else if (step.type === 'extract') {
+                const data = {};
+                for (const [key, sel] of Object.entries(step.selectors)) {
+                    const el = document.querySelector(sel);
+                    data[key] = el ? el.innerText.trim() : null;
+                }
+                out.data = data;
+                out.url = location.href;
+            } else if (step.type === 'click') {
+                const el = find([step.selector]);
+                el.scrollIntoView({block: 'center'});
+                el.click();
+            } else if (step.type === 'fill') {
+                const el = find(fieldCandidates(step.selector));
+                el.focus();
+                if (el.type === 'checkbox' || el.type === 'radio') {
+                    const on = ['true', '1', 'on', 'yes'].includes(
+                        String(step.value).toLowerCase());
+                    if (el.checked !== on) el.click();
+                } else {
+                    setValue(el, step.value == null ? '' : String(step.value));
+                }
+                el.blur();
+                out.filled_fields = [step.selector];
+            } else {
+                throw new Error('Action not batchable: ' + step.type);
+            }
+            out.success = true;
+        } catch (e) {
+            out.success = false;
+            out.error = String((e && e.message) || e);
+        }
+        out.ms = Math.round((performance.now() - start) * 1000) / 1000;
+        results.push(out);
+    }
+    return results;
+}
+"""
+
+# Common checkout form field patterns (first match per field wins)
+CHECKOUT_FIELD_PATTERNS = {
+    'card_number': [
+        'input[name*="card"][name*="number"]',
+        'input[id*="card"][id*="number"]',
+        'input[autocomplete="cc-number"]',
+        'input[placeholder*="card"]',
+    ],
+    'expiry': [
+        'input[name*="expir"]',
+        'input[autocomplete="cc-exp"]',
+        'input[placeholder*="MM/YY"]',
+    ],
+    'cvv': [
+        'input[name*="cvv"]',
+        'input[name*="cvc"]',
+        'input[autocomplete="cc-csc"]',
+    ],
+    'name': [
+        'input[name*="name"][name*="card"]',
+        'input[autocomplete="cc-name"]',
+    ],
+    'email': [
+        'input[type="email"]',
+        'input[name*="email"]',
+    ],
+    'address': [
+        'input[name*="address"]',
+        'input[autocomplete="street-address"]',
+    ],
+    'city': [
+        'input[name*="city"]',
+        'input[autocomplete="address-level2"]',
+    ],
+    'zip': [
+        'input[name*="zip"]',
+        'input[name*="postal"]',
+        'input[autocomplete="postal-code"]',
+    ]
+}
+
 
 class BrowserService:
     """
     Unified browser automation service using Playwright
     Handles all browser-based tasks with anti-detection measures
+    Sessions live in a bounded ContextPool (LRU + idle eviction, pre-warmed)
     """
     
-    def __init__(self):
+    def __init__(self, shards: int = 1):
         self.playwright = None
         self.browser: Optional[Browser] = None
-        self.contexts: Dict[str, BrowserContext] = {}
-        self.pages: Dict[str, Page] = {}
+        # One of `shards` browsers of a farm: gets its share of the contexts
+        self.pool = create_context_pool_from_env(self._new_context, shards)
+        self._init_lock = asyncio.Lock()
+
+    @property
+    def contexts(self) -> Dict[str, BrowserContext]:
+        """Live session contexts (read-only view of the pool)"""
+        return {sid: s.context for sid, s in self.pool.sessions.items()}
+
+    @property
+    def pages(self) -> Dict[str, Page]:
+        """Current page of each live session (read-only view of the pool)"""
+        return {
+            sid: s.page for sid, s in self.pool.sessions.items() if s.page is not None
+        }
         
     async def initialize(self, headless: bool = True):
         """Initialize Playwright and browser"""
-        if self.playwright is None:
-            self.playwright = await async_playwright().start()
-            
-        if self.browser is None:
-            self.browser = await self.playwright.chromium.launch(
-                headless=headless,
-                args=[
-                    '--no-sandbox',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-dev-shm-usage',
-                ]
-            )
-            logger.info("Browser initialized successfully")
+        async with self._init_lock:
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+
+            if self.browser is None:
+                self.browser = await self.playwright.chromium.launch(
+                    headless=headless,
+                    args=[
+                        '--no-sandbox',
+                        '--disable-blink-features=AutomationControlled',
+                        '--disable-dev-shm-usage',
+                    ]
+                )
+                self.browser.on("disconnected", self._on_disconnected)
+                logger.info("Browser initialized successfully")
+                self.pool.start()
+
+    def is_connected(self) -> bool:
+        return self.browser is not None and self.browser.is_connected()
+
+    async def ping(self) -> bool:
+        """Health check: the browser answers and can open a context"""
+        if not self.is_connected():
+            return False
+        context = await self.browser.new_context()
+        await context.close()
+        return True
+
+    async def restart(self):
+        """Relaunch a crashed/hung browser; its sessions are lost"""
+        browser, self.browser = self.browser, None
+        await self.pool.close()
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"Closing the old browser failed: {e}")
+        await self.initialize()
+
+    def _on_disconnected(self, browser: Browser):
+        if browser is self.browser:
+            logger.error("Browser disconnected (crashed or killed)")
             
     async def cleanup(self):
         """Cleanup all resources"""
-        for page in self.pages.values():
-            await page.close()
-        for context in self.contexts.values():
-            await context.close()
+        await self.pool.close()
         if self.browser:
             await self.browser.close()
+            self.browser = None
         if self.playwright:
             await self.playwright.stop()
+            self.playwright = None
         logger.info("Browser cleanup completed")
         
-    async def create_session(self, session_id: str, user_agent: Optional[str] = None) -> BrowserContext:
-        """Create a new browser context (isolated session)"""
+    @traced("browser.create_session", record=("session_id",))
+    async def create_session(
+        self,
+        session_id: str,
+        user_agent: Optional[str] = None,
+        network_profile: Optional[str] = None,
+        persist: bool = True,
+    ) -> BrowserContext:
+        """
+        Create a new browser context (isolated session), replacing an old one
+
+        `network_profile` (full / no-media / text-only) applies to every
+        navigation of the session; default BROWSER_NETWORK_PROFILE.
+        persist=False: never save its storage state (generated ids).
+        """
+        session = await self.pool.open(session_id, user_agent, persist)
+        await self._ensure_network(session, network_profile)
+        logger.info(f"Session created: {session_id}")
+        return session.context
+
+    @asynccontextmanager
+    async def pinned(self, session_id: str):
+        """Keep the session from being evicted while the block runs"""
+        async with self.pool.pinned(session_id):
+            yield
+
+    async def set_network_profile(self, session_id: str, network_profile: str):
+        """Change the session's interception profile (next requests)"""
+        session = await self._session(session_id)
+        session.network.set_profile(network_profile)
+
+    @asynccontextmanager
+    async def network_profile(self, session_id: str, network_profile: Optional[str]):
+        """Per-request profile: applied inside the block, then restored"""
+        if network_profile is None:
+            yield
+            return
+        session = await self._session(session_id)
+        previous = session.network.profile.name
+        session.network.set_profile(network_profile)
+        try:
+            yield
+        finally:
+            session.network.set_profile(previous)
+
+    async def close_session(self, session_id: str, forget: bool = False) -> bool:
+        """
+        Close a session and its pages; False if it was not open
+
+        Its storage state (cookies, logins) is kept for the next time the
+        session_id is used, unless `forget` is set.
+        """
+        closed = await self.pool.close_session(session_id)
+        if forget and self.pool.state_store is not None:
+            await self.pool.state_store.delete(session_id)
+        return closed
+
+    @asynccontextmanager
+    async def temp_session(
+        self,
+        prefix: str = "temp",
+        session_id: Optional[str] = None,
+        network_profile: Optional[str] = None,
+    ):
+        """
+        One-off session, closed when the block exits (errors included)
+
+        Pinned while in use, so pool pressure cannot evict it mid-request.
+        """
+        session_id = session_id or f"{prefix}_{uuid.uuid4()}"
+        try:
+            async with self.pool.pinned(session_id) as session:
+                session.persist = False
+                await self._ensure_network(session, network_profile)
+                yield session_id
+        finally:
+            await self.pool.close_session(session_id)
+
+    def get_pool_statistics(self) -> Dict[str, Any]:
+        return self.pool.get_statistics()
+
+    def get_network_statistics(self) -> Dict[str, Any]:
+        """Profiles, process-wide page totals and the shared asset cache"""
+        return get_network_statistics()
+
+    async def _new_context(
+        self,
+        user_agent: Optional[str] = None,
+        storage_state: Optional[Dict[str, Any]] = None,
+    ) -> BrowserContext:
+        """Configured context for the pool (anti-detection, pt-BR, saved state)"""
         await self.initialize()
         
         context = await self.browser.new_context(
             user_agent=user_agent or self._get_random_user_agent(),
+            storage_state=storage_state,
             viewport={'width': 1920, 'height': 1080},
             locale='pt-BR',
             timezone_id='America/Sao_Paulo',
@@ -76,20 +340,19 @@ class BrowserService:
                 get: () => [1, 2, 3, 4, 5]
             });
         """)
-        
-        self.contexts[session_id] = context
-        logger.info(f"Session created: {session_id}")
         return context
         
-    async def navigate(self, session_id: str, url: str) -> Dict[str, Any]:
-        """Navigate to URL"""
-        context = await self._get_or_create_context(session_id)
-        page = await context.new_page()
-        self.pages[session_id] = page
+    @traced("browser.navigate", record=("session_id", "url"))
+    async def navigate(self, session_id: str, url: str, human: bool = True) -> Dict[str, Any]:
+        """Navigate to URL (reuses the session's page)"""
+        session = await self._session(session_id)
+        page = await session.get_page()
         
         # Human-like delay before navigation
-        await self._human_delay(0.5, 1.5)
+        if human:
+            await self._human_delay(0.5, 1.5)
         
+        network = session.network.new_page_load()
         try:
             response = await page.goto(url, wait_until='networkidle', timeout=30000)
             
@@ -97,7 +360,8 @@ class BrowserService:
                 'success': True,
                 'url': page.url,
                 'title': await page.title(),
-                'status': response.status if response else None
+                'status': response.status if response else None,
+                'network': network.to_dict()
             }
         except PlaywrightTimeoutError:
             logger.warning(f"Navigation timeout for {url}")
@@ -107,6 +371,7 @@ class BrowserService:
                 'url': url
             }
             
+    @traced("browser.fill_form", record=("session_id",))
     async def fill_form(self, session_id: str, form_data: Dict[str, Any], form_selector: Optional[str] = None) -> Dict[str, Any]:
         """
         Fill form with provided data
@@ -116,7 +381,7 @@ class BrowserService:
             form_data: Dict with field selectors/names as keys and values to fill
             form_selector: Optional form element selector to scope the search
         """
-        page = self.pages.get(session_id)
+        page = self._get_page(session_id)
         if not page:
             return {'success': False, 'error': 'No active page'}
             
@@ -181,9 +446,10 @@ class BrowserService:
             'total_errors': len(errors)
         }
         
+    @traced("browser.click", record=("session_id", "selector"))
     async def click_element(self, session_id: str, selector: str) -> Dict[str, Any]:
         """Click an element"""
-        page = self.pages.get(session_id)
+        page = self._get_page(session_id)
         if not page:
             return {'success': False, 'error': 'No active page'}
             
@@ -197,6 +463,84 @@ class BrowserService:
             logger.error(f"Click failed: {e}")
             return {'success': False, 'error': str(e), 'selector': selector}
             
+    @traced("browser.run_batch", record=("session_id",))
+    async def run_batch(self, session_id: str, steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run click/fill/extract/scroll steps in a single evaluate call
+
+        Throughput mode: no human-like delays or per-key typing; fills set
+        the value and fire input/change events. Each step reports its own
+        in-page time (`ms`). When a click starts a navigation, returns
+        once the new document reached domcontentloaded, so the next batch
+        runs on the page the click opened.
+        """
+        page = self._get_page(session_id)
+        if not page:
+            return {'success': False, 'error': 'No active page'}
+
+        loop = asyncio.get_running_loop()
+        requested = loop.create_future()
+        committed = loop.create_future()
+
+        def on_request(request):
+            if (
+                not requested.done()
+                and request.is_navigation_request()
+                and request.frame == page.main_frame
+            ):
+                requested.set_result(request)
+
+        def on_navigated(frame):
+            if not committed.done() and frame == page.main_frame:
+                committed.set_result(frame)
+
+        clicks = any(step.get('type') == 'click' for step in steps)
+        if clicks:
+            page.on('request', on_request)
+            page.on('framenavigated', on_navigated)
+        try:
+            try:
+                results = await page.evaluate(BATCH_ACTIONS_SCRIPT, steps)
+            except Exception as e:
+                # e.g. a click navigated away and destroyed the execution context
+                logger.error(f"Action batch failed: {e}")
+                return {'success': False, 'error': str(e)}
+
+            if clicks:
+                await self._wait_click_navigation(page, requested, committed)
+        finally:
+            if clicks:
+                page.remove_listener('request', on_request)
+                page.remove_listener('framenavigated', on_navigated)
+
+        return {
+            'success': all(r['success'] for r in results),
+            'results': results,
+        }
+
+    async def _wait_click_navigation(
+        self, page: Page, requested: asyncio.Future, committed: asyncio.Future
+    ):
+        """
+        Wait for the navigation a batch click started, if any
+
+        The current document is already loaded, so its load state says
+        nothing about the click: wait for the main-frame navigation
+        request, then for the new document to commit and load.
+        """
+        try:
+            await asyncio.wait_for(asyncio.shield(requested), BATCH_NAVIGATION_GRACE)
+        except asyncio.TimeoutError:
+            return  # the click did not navigate
+        try:
+            await asyncio.wait_for(asyncio.shield(committed), BATCH_NAVIGATION_TIMEOUT)
+            await page.wait_for_load_state(
+                'domcontentloaded', timeout=BATCH_NAVIGATION_TIMEOUT * 1000
+            )
+        except (asyncio.TimeoutError, PlaywrightTimeoutError) as e:
+            logger.warning(f"Navigation after batch click did not finish: {e}")
+
+    @traced("browser.extract_data", record=("session_id",))
     async def extract_data(self, session_id: str, selectors: Dict[str, str]) -> Dict[str, Any]:
         """
         Extract data from page using selectors
@@ -205,7 +549,7 @@ class BrowserService:
             session_id: Browser session ID
             selectors: Dict mapping data keys to CSS selectors
         """
-        page = self.pages.get(session_id)
+        page = self._get_page(session_id)
         if not page:
             return {'success': False, 'error': 'No active page'}
             
@@ -229,9 +573,10 @@ class BrowserService:
             'url': page.url
         }
         
+    @traced("browser.screenshot", record=("session_id",))
     async def screenshot(self, session_id: str, full_page: bool = False) -> Dict[str, Any]:
         """Take screenshot"""
-        page = self.pages.get(session_id)
+        page = self._get_page(session_id)
         if not page:
             return {'success': False, 'error': 'No active page'}
             
@@ -248,6 +593,7 @@ class BrowserService:
             logger.error(f"Screenshot failed: {e}")
             return {'success': False, 'error': str(e)}
             
+    @traced("browser.scrape_products", record=("session_id",))
     async def scrape_products(self, session_id: str, product_selectors: Dict[str, str]) -> Dict[str, Any]:
         """
         Scrape products from e-commerce page
@@ -263,42 +609,15 @@ class BrowserService:
                     'link': 'a'
                 }
         """
-        page = self.pages.get(session_id)
+        page = self._get_page(session_id)
         if not page:
             return {'success': False, 'error': 'No active page'}
             
         try:
-            container_selector = product_selectors.get('container', '.product')
-            products = await page.query_selector_all(container_selector)
-            
-            scraped_products = []
-            
-            for product in products:
-                product_data = {}
-                
-                for field, selector in product_selectors.items():
-                    if field == 'container':
-                        continue
-                        
-                    try:
-                        if field == 'image':
-                            img = await product.query_selector(selector)
-                            if img:
-                                product_data['image'] = await img.get_attribute('src')
-                        elif field == 'link':
-                            link = await product.query_selector(selector)
-                            if link:
-                                product_data['url'] = await link.get_attribute('href')
-                        else:
-                            element = await product.query_selector(selector)
-                            if element:
-                                product_data[field] = (await element.inner_text()).strip()
-                    except:
-                        product_data[field] = None
-                        
-                if product_data:
-                    scraped_products.append(product_data)
-                    
+            # One evaluate for the whole page instead of a round trip per field
+            extracted = await extract_items(page, product_spec(product_selectors))
+            scraped_products = extracted['items']
+
             return {
                 'success': True,
                 'products': scraped_products,
@@ -310,74 +629,20 @@ class BrowserService:
             logger.error(f"Product scraping failed: {e}")
             return {'success': False, 'error': str(e)}
             
+    @traced("browser.detect_checkout_form", record=("session_id",))
     async def detect_checkout_form(self, session_id: str) -> Dict[str, Any]:
         """
         Detect checkout/payment form on current page
         Returns detected fields and their selectors
         """
-        page = self.pages.get(session_id)
+        page = self._get_page(session_id)
         if not page:
             return {'success': False, 'error': 'No active page'}
             
         try:
-            # Common checkout form field patterns
-            field_patterns = {
-                'card_number': [
-                    'input[name*="card"][name*="number"]',
-                    'input[id*="card"][id*="number"]',
-                    'input[autocomplete="cc-number"]',
-                    'input[placeholder*="card"]',
-                ],
-                'expiry': [
-                    'input[name*="expir"]',
-                    'input[autocomplete="cc-exp"]',
-                    'input[placeholder*="MM/YY"]',
-                ],
-                'cvv': [
-                    'input[name*="cvv"]',
-                    'input[name*="cvc"]',
-                    'input[autocomplete="cc-csc"]',
-                ],
-                'name': [
-                    'input[name*="name"][name*="card"]',
-                    'input[autocomplete="cc-name"]',
-                ],
-                'email': [
-                    'input[type="email"]',
-                    'input[name*="email"]',
-                ],
-                'address': [
-                    'input[name*="address"]',
-                    'input[autocomplete="street-address"]',
-                ],
-                'city': [
-                    'input[name*="city"]',
-                    'input[autocomplete="address-level2"]',
-                ],
-                'zip': [
-                    'input[name*="zip"]',
-                    'input[name*="postal"]',
-                    'input[autocomplete="postal-code"]',
-                ]
-            }
-            
-            detected_fields = {}
-            
-            for field_name, selectors in field_patterns.items():
-                for selector in selectors:
-                    try:
-                        element = await page.query_selector(selector)
-                        if element:
-                            detected_fields[field_name] = {
-                                'selector': selector,
-                                'type': await element.get_attribute('type'),
-                                'placeholder': await element.get_attribute('placeholder'),
-                                'required': await element.get_attribute('required') is not None
-                            }
-                            break
-                    except:
-                        continue
-                        
+            # All patterns probed in one evaluate instead of one call per selector
+            detected_fields = await detect_form_fields(page, CHECKOUT_FIELD_PATTERNS)
+
             is_checkout = len(detected_fields) >= 3  # At least 3 payment fields detected
             
             return {
@@ -394,9 +659,26 @@ class BrowserService:
             
     async def _get_or_create_context(self, session_id: str) -> BrowserContext:
         """Get existing context or create new one"""
-        if session_id not in self.contexts:
-            await self.create_session(session_id)
-        return self.contexts[session_id]
+        session = await self._session(session_id)
+        return session.context
+
+    async def _session(self, session_id: str) -> PooledSession:
+        """Live or new pooled session, with request interception attached"""
+        session = await self.pool.acquire(session_id)
+        await self._ensure_network(session)
+        return session
+
+    async def _ensure_network(self, session: PooledSession, profile: Optional[str] = None):
+        if session.network is None:
+            session.network = NetworkPolicy(profile)
+            await session.network.attach(session.context)
+        elif profile is not None:
+            session.network.set_profile(profile)
+
+    def _get_page(self, session_id: str) -> Optional[Page]:
+        """Current page of a live session (counts as use for LRU/idle)"""
+        session = self.pool.get(session_id)
+        return session.page if session is not None else None
         
     async def _human_delay(self, min_seconds: float = 0.1, max_seconds: float = 0.5):
         """Simulate human-like delay"""
@@ -419,5 +701,6 @@ class BrowserService:
         return random.choice(user_agents)
         
 
-# Singleton instance
-browser_service = BrowserService()
+# Singleton instance: BROWSER_SHARDS BrowserServices routed by session_id
+# (default 1)
+browser_service = create_browser_farm_from_env(BrowserService)
@@ -0,0 +1,335 @@
+"""
+Extension Command Results
+In-process completion registry for remote (Chrome extension) commands.
+
+A caller that sends a command to the user's browser registers a future
+for the command id and awaits it. /api/extension/result (and the in-band
+result of the WebSocket channel) resolves that future directly, so the
+caller returns the moment the extension reports instead of polling the
+database.
+
+With several replicas the result may land on a different process than
+the one waiting for it. When EXTENSION_PUBSUB_DSN is set, results with
+no local waiter are published over Postgres LISTEN/NOTIFY and every
+replica resolves its own waiters from the notifications. Without it the
+registry is purely in-process.
+
+Results the extension writes straight to Supabase (the agent's
+"ExtensionCommand" rows) are published on the same channel by a
+database trigger (migration 20261019150000), so those waiters wake up
+the same way. An optional, infrequent fallback check supplied by the
+caller is the safety net (and the only path without a bridge).
+
+Configuration (env):
+    EXTENSION_PUBSUB_DSN            Postgres DSN for LISTEN/NOTIFY (optional)
+    EXTENSION_PUBSUB_CHANNEL        notification channel
+                                    (default extension_command_results)
+    EXTENSION_RESULT_FALLBACK_POLL  seconds between fallback checks (default 10)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import asyncpg
+
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    asyncpg = None
+    ASYNCPG_AVAILABLE = False
+
+# Outcome: {"commandId", "success", "result", "error"}
+Outcome = Dict[str, Any]
+FallbackCheck = Callable[[], Awaitable[Optional[Outcome]]]
+
+# pg_notify payloads are limited to 8000 bytes
+NOTIFY_MAX_BYTES = 7900
+
+
+class PostgresResultBridge:
+    """Fan results out to other replicas over Postgres LISTEN/NOTIFY"""
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str,
+        on_message: Callable[[Outcome], None],
+    ):
+        self.dsn = dsn
+        self.channel = channel
+        self.on_message = on_message
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def start(self):
+        async with self._lock:
+            if self.connected:
+                return
+            self._conn = await asyncpg.connect(self.dsn)
+            self._conn.add_termination_listener(self._on_terminated)
+            await self._conn.add_listener(self.channel, self._on_notify)
+            logger.info(f"Command result bridge listening on '{self.channel}'")
+
+    async def publish(self, outcome: Outcome):
+        message = json.dumps(outcome, default=str)
+        if len(message.encode()) > NOTIFY_MAX_BYTES:
+            # Só o status; quem espera busca o resultado completo no banco
+            message = json.dumps(
+                {
+                    "commandId": outcome["commandId"],
+                    "success": outcome.get("success"),
+                    "truncated": True,
+                }
+            )
+        await self.start()
+        async with self._lock:
+            await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, message)
+
+    def _on_notify(self, conn, pid, channel, payload):
+        if pid == conn.get_server_pid():
+            return  # own notification: already handled locally
+        try:
+            self.on_message(json.loads(payload))
+        except Exception as e:
+            logger.error(f"Invalid command result notification: {e}")
+
+    def _on_terminated(self, conn):
+        logger.warning("Command result bridge connection lost; reconnecting on demand")
+        self._conn = None
+
+    async def close(self):
+        if self.connected:
+            await self._conn.close()
+        self._conn = None
+
+
+class CommandResultRegistry:
+    """
+    Futures for in-flight remote commands, keyed by command id
+    """
+
+    def __init__(
+        self,
+        fallback_interval: float = 10.0,
+        recent_size: int = 1000,
+        recent_ttl: float = 120.0,
+    ):
+        self.fallback_interval = fallback_interval
+        self.recent_size = recent_size
+        self.recent_ttl = recent_ttl
+
+        self.waiters: Dict[str, asyncio.Future] = {}
+        # Results that arrived before anyone waited (fast extension, other replica)
+        self._recent: "OrderedDict[str, tuple]" = OrderedDict()
+        self.bridge: Optional[PostgresResultBridge] = None
+
+        self.stats = {
+            "waits": 0,
+            "resolved": 0,
+            "early": 0,
+            "fallback_hits": 0,
+            "timeouts": 0,
+            "published": 0,
+            "remote_received": 0,
+        }
+
+    # ------------------------------------------
+    # WAITERS
+    # ------------------------------------------
+
+    def expect(self, command_id: str) -> asyncio.Future:
+        """Register interest in a command; resolves immediately if already done"""
+        command_id = str(command_id)
+        future = self.waiters.get(command_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.waiters[command_id] = future
+
+        early = self._recent.pop(command_id, None)
+        if early is not None and not future.done():
+            self.stats["early"] += 1
+            future.set_result(early[0])
+        return future
+
+    async def wait(
+        self,
+        command_id: str,
+        timeout: float,
+        fallback: Optional[FallbackCheck] = None,
+        fallback_interval: Optional[float] = None,
+    ) -> Optional[Outcome]:
+        """
+        Wait for the command's outcome; None on timeout
+
+        `fallback` is awaited every `fallback_interval` seconds (and for
+        truncated cross-replica notifications) to catch results that were
+        written to the database without going through the API.
+        """
+        command_id = str(command_id)
+        future = self.expect(command_id)
+        self.stats["waits"] += 1
+        await self._ensure_bridge()
+
+        loop = asyncio.get_running_loop()
+        interval = fallback_interval or self.fallback_interval
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    return None
+
+                step = min(remaining, interval) if fallback else remaining
+                try:
+                    outcome = await asyncio.wait_for(asyncio.shield(future), step)
+                except asyncio.TimeoutError:
+                    if fallback is not None:
+                        try:
+                            outcome = await fallback()
+                        except Exception as e:
+                            logger.warning(f"Fallback check {command_id} failed: {e}")
+                            continue
+                        if outcome is not None:
+                            self.stats["fallback_hits"] += 1
+                            return outcome
+                    continue
+
+                if outcome.get("truncated") and fallback is not None:
+                    outcome = await fallback() or outcome
+                return outcome
+        finally:
+            if self.waiters.get(command_id) is future:
+                del self.waiters[command_id]
+
+    # ------------------------------------------
+    # RESULTS
+    # ------------------------------------------
+
+    def resolve(self, outcome: Outcome) -> bool:
+        """Resolve a local waiter; False when nobody here is waiting"""
+        command_id = str(outcome["commandId"])
+        future = self.waiters.get(command_id)
+        if future is None:
+            self._remember(command_id, outcome)
+            return False
+        if not future.done():
+            future.set_result(outcome)
+            self.stats["resolved"] += 1
+        return True
+
+    async def report(
+        self,
+        command_id: str,
+        success: bool,
+        result: Any = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        """
+        Entry point for /api/extension/result
+
+        Resolves the local waiter, or publishes to the other replicas
+        when the bridge is configured. Never raises: the result is already
+        persisted and the waiter still has its fallback check.
+        """
+        outcome = {
+            "commandId": str(command_id),
+            "success": success,
+            "result": result,
+            "error": error,
+        }
+        if self.resolve(outcome):
+            return True
+
+        await self._ensure_bridge()
+        if self.bridge is not None:
+            try:
+                await self.bridge.publish(outcome)
+                self.stats["published"] += 1
+            except Exception as e:
+                logger.error(f"Failed to publish command result {command_id}: {e}")
+        return False
+
+    def _on_remote(self, outcome: Outcome):
+        self.stats["remote_received"] += 1
+        self.resolve(outcome)
+
+    def _remember(self, command_id: str, outcome: Outcome):
+        now = time.monotonic()
+        self._recent[command_id] = (outcome, now)
+        self._recent.move_to_end(command_id)
+        while self._recent:
+            oldest_id, (_, stored_at) = next(iter(self._recent.items()))
+            expired = now - stored_at >= self.recent_ttl
+            if len(self._recent) <= self.recent_size and not expired:
+                break
+            del self._recent[oldest_id]
+
+    # ------------------------------------------
+    # BRIDGE
+    # ------------------------------------------
+
+    def configure_bridge(self, dsn: Optional[str], channel: str):
+        if not dsn:
+            return
+        if not ASYNCPG_AVAILABLE:
+            logger.warning("EXTENSION_PUBSUB_DSN set but asyncpg is not installed")
+            return
+        self.bridge = PostgresResultBridge(dsn, channel, self._on_remote)
+
+    async def _ensure_bridge(self):
+        if self.bridge is None or self.bridge.connected:
+            return
+        try:
+            await self.bridge.start()
+        except Exception as e:
+            logger.error(f"Command result bridge unavailable: {e}")
+
+    async def close(self):
+        if self.bridge is not None:
+            await self.bridge.close()
+        for future in self.waiters.values():
+            future.cancel()
+        self.waiters.clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "waiting": len(self.waiters),
+            "recent": len(self._recent),
+            "bridge": (
+                None
+                if self.bridge is None
+                else {
+                    "channel": self.bridge.channel,
+                    "connected": self.bridge.connected,
+                }
+            ),
+        }
+
+
+def create_command_results_from_env() -> CommandResultRegistry:
+    """Build the registry from EXTENSION_* env vars"""
+    registry = CommandResultRegistry(
+        fallback_interval=float(os.getenv("EXTENSION_RESULT_FALLBACK_POLL", "10")),
+    )
+    registry.configure_bridge(
+        os.getenv("EXTENSION_PUBSUB_DSN"),
+        os.getenv("EXTENSION_PUBSUB_CHANNEL", "extension_command_results"),
+    )
+    return registry
+
+
+# Singleton instance
+command_results = create_command_results_from_env()
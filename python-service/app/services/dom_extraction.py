@@ -0,0 +1,150 @@
+"""
+DOM Extraction
+In-page extraction programs: walk the DOM once, return JSON in one call.
+
+Extracting N products field by field through element handles costs a
+CDP round trip per query_selector / inner_text / get_attribute, i.e.
+thousands of round trips on a 200-product collection page; checkout
+form detection probes dozens of selectors the same way. These helpers
+send a declarative spec to a single `page.evaluate` and let the page do
+the walking.
+
+Product spec (see `extract_items`):
+
+    {
+        "containers": [".product", ".product-item"],  # first that matches
+        "limit": 100,
+        "fields": [
+            {"key": "name", "selectors": [".title", "h2"], "trim": True},
+            {"key": "image", "selectors": ["img"], "attrs": ["src", "data-src"]},
+            {"key": "url", "selectors": ["a"], "attrs": ["href"], "skip_empty": True},
+        ],
+        "require": "name",   # drop items without this key (optional)
+    }
+
+A field takes the first selector that matches inside the container;
+its value is the first non-empty attribute in `attrs`, or innerText.
+Fields whose selector matches nothing are left out of the item, like
+the element-handle code they replace.
+"""
+
+from typing import Any, Dict, List, Optional
+
+ITEMS_SCRIPT = """
+(spec) => {
+    const query = (root, sel, all) => {
+        try {
+            return all ? root.querySelectorAll(sel) : root.querySelector(sel);
+        } catch (e) {
+            return all ? [] : null;  // invalid selector: treat as no match
+        }
+    };
+
+    let container = null;
+    let elements = [];
+    for (const sel of spec.containers) {
+        const found = query(document, sel, true);
+        if (found.length) {
+            container = sel;
+            elements = Array.from(found);
+            break;
+        }
+    }
+    const total = elements.length;
+    if (spec.limit != null) elements = elements.slice(0, spec.limit);
+
+    const items = [];
+    for (const el of elements) {
+        const item = {};
+        for (const field of spec.fields) {
+            let target = null;
+            for (const sel of field.selectors) {
+                target = query(el, sel, false);
+                if (target) break;
+            }
+            if (!target) continue;
+
+            let value = null;
+            if (field.attrs) {
+                for (const attr of field.attrs) {
+                    value = target.getAttribute(attr);
+                    if (value) break;
+                }
+            } else {
+                value = target.innerText;
+                if (field.trim && value != null) value = value.trim();
+            }
+            if (field.skip_empty && !value) continue;
+            item[field.key] = value;
+        }
+        if (spec.require ? item[spec.require] : Object.keys(item).length) {
+            items.push(item);
+        }
+    }
+    return {container, total, items};
+}
+"""
+
+FORM_FIELDS_SCRIPT = """
+(patterns) => {
+    const detected = {};
+    for (const [name, selectors] of Object.entries(patterns)) {
+        for (const sel of selectors) {
+            let el = null;
+            try { el = document.querySelector(sel); } catch (e) { continue; }
+            if (!el) continue;
+            detected[name] = {
+                selector: sel,
+                type: el.getAttribute('type'),
+                placeholder: el.getAttribute('placeholder'),
+                required: el.hasAttribute('required'),
+            };
+            break;
+        }
+    }
+    return detected;
+}
+"""
+
+
+async def extract_items(page, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run an item spec in the page (one round trip)
+
+    Returns {"container": matched selector or None, "total": matches,
+    "items": [...]}.
+    """
+    return await page.evaluate(ITEMS_SCRIPT, spec)
+
+
+def product_spec(
+    product_selectors: Dict[str, str], limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Spec for BrowserService.scrape_products' selector dict
+
+    {"container": ..., "image": ..., "link": ..., <field>: ...}: image ->
+    src, link -> href (as "url"), any other field -> trimmed text.
+    """
+    fields: List[Dict[str, Any]] = []
+    for field, selector in product_selectors.items():
+        if field == "container":
+            continue
+        if field == "image":
+            fields.append({"key": "image", "selectors": [selector], "attrs": ["src"]})
+        elif field == "link":
+            fields.append({"key": "url", "selectors": [selector], "attrs": ["href"]})
+        else:
+            fields.append({"key": field, "selectors": [selector], "trim": True})
+    return {
+        "containers": [product_selectors.get("container", ".product")],
+        "limit": limit,
+        "fields": fields,
+    }
+
+
+async def detect_form_fields(
+    page, field_patterns: Dict[str, List[str]]
+) -> Dict[str, Dict[str, Any]]:
+    """First matching selector per field, with type/placeholder/required"""
+    return await page.evaluate(FORM_FIELDS_SCRIPT, field_patterns)
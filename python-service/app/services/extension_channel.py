@@ -0,0 +1,303 @@
+"""
+Extension Command Channel
+Push delivery of extension commands over long-lived connections.
+
+Each connected device (WebSocket or SSE) gets a DeviceConnection with a
+bounded outbox. /extension/command pushes the new command straight into
+the outbox of the device's live connection; the device acknowledges it
+and only then is the command marked "processing". Commands that are not
+acknowledged within `ack_timeout` are re-offered once and then left
+"pending", so the polling endpoint (and the backlog sent on reconnect)
+remains the fallback and nothing is lost. An ack that arrives after
+that still marks the command "processing" (only while it is pending),
+and queued copies of an acked command are dropped from the outbox, so a
+received command is not handed out again.
+
+Idle connections cost one coroutine and an empty queue; there is no
+per-device polling, so thousands of devices can stay connected to a
+single worker. A single sweeper task handles ack timeouts.
+
+Configuration (env):
+    EXTENSION_ACK_TIMEOUT       seconds to wait for an ack (default 15)
+    EXTENSION_OUTBOX_SIZE       max queued messages per connection (default 100)
+    EXTENSION_HEARTBEAT         keep-alive interval in seconds (default 25)
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Called with (device_id, command_ids) once the device acknowledged them
+AckHandler = Callable[[str, List[str]], Awaitable[None]]
+
+_connection_ids = itertools.count(1)
+
+
+@dataclass(eq=False)
+class DeviceConnection:
+    """One live channel (WebSocket or SSE stream) of a device"""
+
+    device_id: str
+    transport: str
+    outbox: asyncio.Queue
+    id: int = field(default_factory=lambda: next(_connection_ids))
+    connected_at: float = field(default_factory=time.time)
+    pushed: int = 0
+    acked: int = 0
+
+    def offer(self, message: Dict[str, Any]) -> bool:
+        """Queue a message without blocking; False when the outbox is full"""
+        try:
+            self.outbox.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def discard(self, command_ids: Set[str]) -> int:
+        """Drop queued (not yet sent) copies of these commands"""
+        kept, dropped = [], 0
+        while True:
+            try:
+                message = self.outbox.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if (
+                message.get("type") == "command"
+                and str(message["command"].get("id")) in command_ids
+            ):
+                dropped += 1
+            else:
+                kept.append(message)
+        for message in kept:
+            self.outbox.put_nowait(message)
+        return dropped
+
+    async def next_message(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next outgoing message, or None after `timeout` (time for a heartbeat)"""
+        try:
+            return await asyncio.wait_for(self.outbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+@dataclass
+class _PendingAck:
+    device_id: str
+    command: Dict[str, Any]
+    pushed_at: float
+    attempts: int = 1
+
+
+class CommandChannel:
+    """
+    Registry of connected devices and in-flight (unacknowledged) pushes
+    """
+
+    def __init__(
+        self,
+        ack_timeout: float = 15.0,
+        outbox_size: int = 100,
+        heartbeat: float = 25.0,
+        max_attempts: int = 2,
+    ):
+        self.ack_timeout = ack_timeout
+        self.outbox_size = outbox_size
+        self.heartbeat = heartbeat
+        self.max_attempts = max_attempts
+
+        self.connections: Dict[str, Set[DeviceConnection]] = {}
+        self.awaiting_ack: Dict[str, _PendingAck] = {}
+        self.on_ack: Optional[AckHandler] = None
+
+        self._sweeper: Optional[asyncio.Task] = None
+        self.stats = {
+            "pushed": 0,
+            "acked": 0,
+            "late_acks": 0,
+            "redelivered": 0,
+            "ack_timeouts": 0,
+            "outbox_full": 0,
+            "not_connected": 0,
+        }
+
+    # ------------------------------------------
+    # CONNECTIONS
+    # ------------------------------------------
+
+    def connect(self, device_id: str, transport: str = "websocket") -> DeviceConnection:
+        conn = DeviceConnection(
+            device_id=device_id,
+            transport=transport,
+            outbox=asyncio.Queue(maxsize=self.outbox_size),
+        )
+        self.connections.setdefault(device_id, set()).add(conn)
+        self._ensure_sweeper()
+        logger.info(
+            f"Extension device connected: {device_id} ({transport}, conn {conn.id})"
+        )
+        return conn
+
+    def disconnect(self, conn: DeviceConnection):
+        conns = self.connections.get(conn.device_id)
+        if conns is not None:
+            conns.discard(conn)
+            if not conns:
+                del self.connections[conn.device_id]
+        logger.info(f"Extension device disconnected: {conn.device_id} (conn {conn.id})")
+
+    def is_connected(self, device_id: str) -> bool:
+        return bool(self.connections.get(device_id))
+
+    # ------------------------------------------
+    # PUSH / ACK
+    # ------------------------------------------
+
+    def push(self, device_id: str, command: Dict[str, Any]) -> bool:
+        """
+        Push a command to the device's live connection
+
+        Returns False when the device has no connection on this worker (or
+        its outbox is full); the command then stays pending for polling.
+        """
+        command_id = str(command.get("id"))
+        if command_id in self.awaiting_ack:
+            return True  # already in flight
+
+        conn = self._pick(device_id)
+        if conn is None:
+            self.stats["not_connected"] += 1
+            return False
+        if not conn.offer({"type": "command", "command": command}):
+            self.stats["outbox_full"] += 1
+            return False
+
+        conn.pushed += 1
+        self.stats["pushed"] += 1
+        self.awaiting_ack[command_id] = _PendingAck(
+            device_id, command, time.monotonic()
+        )
+        return True
+
+    async def ack(self, device_id: str, command_ids: List[str]) -> List[str]:
+        """
+        Record acknowledgements; returns the acknowledged ids
+
+        Every id goes to `on_ack`, also when its push already timed out
+        (late ack) or was never tracked here: the device did receive the
+        command. on_ack must only move still-pending commands of this
+        device to "processing", which makes repeated acks harmless.
+        """
+        acked = list(dict.fromkeys(str(command_id) for command_id in command_ids))
+        if not acked:
+            return []
+
+        for command_id in acked:
+            pending = self.awaiting_ack.get(command_id)
+            if pending is not None and pending.device_id == device_id:
+                del self.awaiting_ack[command_id]
+                self.stats["acked"] += 1
+            else:
+                self.stats["late_acks"] += 1
+
+        # A re-offered copy may still be waiting in an outbox
+        for conn in self.connections.get(device_id, ()):
+            conn.discard(set(acked))
+        conn = self._pick(device_id)
+        if conn is not None:
+            conn.acked += len(acked)
+        if self.on_ack is not None:
+            await self.on_ack(device_id, acked)
+        return acked
+
+    def _pick(self, device_id: str) -> Optional[DeviceConnection]:
+        # Most recent connection wins (older ones are usually half-dead tabs)
+        conns = self.connections.get(device_id)
+        if not conns:
+            return None
+        return max(conns, key=lambda c: c.connected_at)
+
+    # ------------------------------------------
+    # ACK TIMEOUTS
+    # ------------------------------------------
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(
+                self._sweep_loop(), name="extension-ack-sweeper"
+            )
+
+    async def _sweep_loop(self):
+        interval = max(0.05, self.ack_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Extension ack sweep failed: {e}")
+            if not self.connections and not self.awaiting_ack:
+                self._sweeper = None
+                return
+
+    def sweep(self, now: Optional[float] = None) -> List[str]:
+        """Re-offer or give up on pushes whose ack timed out"""
+        now = now if now is not None else time.monotonic()
+        expired = [
+            command_id
+            for command_id, pending in self.awaiting_ack.items()
+            if now - pending.pushed_at >= self.ack_timeout
+        ]
+        for command_id in expired:
+            pending = self.awaiting_ack.pop(command_id)
+            self.stats["ack_timeouts"] += 1
+            conn = self._pick(pending.device_id)
+            if (
+                pending.attempts < self.max_attempts
+                and conn is not None
+                and conn.offer({"type": "command", "command": pending.command})
+            ):
+                pending.attempts += 1
+                pending.pushed_at = now
+                self.awaiting_ack[command_id] = pending
+                self.stats["redelivered"] += 1
+            # else: stays "pending" in the database (polling / reconnect backlog)
+        return expired
+
+    async def close(self):
+        """Tell every connection to go away and stop the sweeper"""
+        for conns in list(self.connections.values()):
+            for conn in conns:
+                conn.offer({"type": "close"})
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        by_transport: Dict[str, int] = {}
+        for conns in self.connections.values():
+            for conn in conns:
+                by_transport[conn.transport] = by_transport.get(conn.transport, 0) + 1
+        return {
+            **self.stats,
+            "connected_devices": len(self.connections),
+            "connections": by_transport,
+            "awaiting_ack": len(self.awaiting_ack),
+        }
+
+
+def create_command_channel_from_env() -> CommandChannel:
+    """Build the channel from EXTENSION_* env vars"""
+    return CommandChannel(
+        ack_timeout=float(os.getenv("EXTENSION_ACK_TIMEOUT", "15")),
+        outbox_size=int(os.getenv("EXTENSION_OUTBOX_SIZE", "100")),
+        heartbeat=float(os.getenv("EXTENSION_HEARTBEAT", "25")),
+    )
+
+
+# Singleton instance
+command_channel = create_command_channel_from_env()
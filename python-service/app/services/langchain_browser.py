@@ -2,18 +2,23 @@ from typing import Optional, Dict, Any, List
 from langchain_openai import ChatOpenAI
 from langchain.agents import AgentType, initialize_agent, Tool
 import os
-import asyncio
 import json
 import httpx
 from loguru import logger
 from app.file_uploader import FileUploader
 # Importar o serviço de navegador persistente
 from app.services.browser_service import browser_service
+# Espera de resultados de comandos da extensão
+from app.services.command_results import command_results
 
 # Diretório temporário para arquivos gerados
 TEMP_DIR = "/tmp/ai_generated"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Consulta ao ExtensionCommand quando não há LISTEN/NOTIFY (EXTENSION_PUBSUB_DSN):
+# sem o trigger da migration nada mais acorda a espera
+REMOTE_RESULT_POLL_INTERVAL = 2.0
+
 class BrowserAgent:
     """
     Agente de Automação HÍBRIDO (Server-Side + Client-Side Extension).
@@ -168,30 +173,47 @@ class BrowserAgent:
                 cmd_data = resp_cmd.json()
                 cmd_id = cmd_data[0]['id']
                 
-                # 3. Polling
-                start_time = asyncio.get_event_loop().time()
-                
-                while (asyncio.get_event_loop().time() - start_time) < timeout_seconds:
-                    await asyncio.sleep(2)
-                    
+                # 3. Aguardar resultado. A extensão grava o ExtensionCommand direto no
+                # Supabase; o trigger da migration publica o resultado via pg_notify e
+                # o command_results acorda a espera na hora. A consulta ao banco fica
+                # como rede de segurança esparsa (EXTENSION_RESULT_FALLBACK_POLL)
+                async def check_status() -> Optional[Dict[str, Any]]:
                     resp_check = await client.get(
                         f"{supabase_url}/rest/v1/ExtensionCommand?id=eq.{cmd_id}&select=status,result,error", 
                         headers=headers
                     )
-                    
-                    if resp_check.status_code == 200:
-                        current_cmd = resp_check.json()[0]
-                        status = current_cmd.get('status')
-                        
-                        if status == 'COMPLETED':
-                            result = current_cmd.get('result', {})
-                            return f"SUCESSO: {json.dumps(result, ensure_ascii=False)}"
-                        
-                        if status == 'FAILED':
-                            error = current_cmd.get('error', 'Erro desconhecido')
-                            return f"FALHA na execução remota: {error}"
-                
-                return f"TIMEOUT: Navegador não respondeu em {timeout_seconds}s."
+                    if resp_check.status_code != 200 or not resp_check.json():
+                        return None
+                    current_cmd = resp_check.json()[0]
+                    status = current_cmd.get('status')
+                    if status not in ('COMPLETED', 'FAILED'):
+                        return None
+                    return {
+                        "success": status == 'COMPLETED',
+                        "result": current_cmd.get('result', {}),
+                        "error": current_cmd.get('error'),
+                    }
+
+                outcome = await command_results.wait(
+                    cmd_id,
+                    timeout_seconds,
+                    fallback=check_status,
+                    fallback_interval=(
+                        None
+                        if command_results.bridge is not None
+                        else REMOTE_RESULT_POLL_INTERVAL
+                    ),
+                )
+
+                if outcome is None:
+                    return f"TIMEOUT: Navegador não respondeu em {timeout_seconds}s."
+
+                if outcome.get('success'):
+                    result = outcome.get('result') or {}
+                    return f"SUCESSO: {json.dumps(result, ensure_ascii=False)}"
+
+                error = outcome.get('error') or 'Erro desconhecido'
+                return f"FALHA na execução remota: {error}"
 
         # --- FERRAMENTAS DE ARQUIVO ---
 
@@ -293,6 +315,8 @@ class BrowserAgent:
         # Se um ID de sessão foi passado, usá-lo. 
         # Se não, criar um temporário? Não, melhor pedir para criar antes.
         # Por segurança, se não vier session_id, criamos um baseado no user_id ou random
+        # (id gerado = sessão descartável: cookies não são gravados em disco)
+        persist = bool(session_id)
         if not session_id:
              import uuid
              session_id = f"auto_{uuid.uuid4()}"
@@ -301,7 +325,7 @@ class BrowserAgent:
         
         # Garantir que a sessão existe no browser service
         if session_id not in browser_service.contexts:
-            await browser_service.create_session(session_id)
+            await browser_service.create_session(session_id, persist=persist)
             
         if not self.agent_chain:
             await self.initialize()
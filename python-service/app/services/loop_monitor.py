@@ -0,0 +1,249 @@
+"""
+Event Loop Monitor
+Continuously measures asyncio event-loop lag and captures the stack of
+whatever is blocking the loop past a threshold.
+
+Two cooperating parts:
+- a heartbeat coroutine on the loop (sleeps `interval`, records how late
+  it woke up = loop lag)
+- a watchdog thread that notices when the heartbeat stops and snapshots
+  the loop thread's stack while the stall is still happening
+
+Configuration (env):
+    LOOP_MONITOR_ENABLED    1/0 (default 1)
+    LOOP_MONITOR_INTERVAL   heartbeat interval in seconds (default 0.1)
+    LOOP_MONITOR_THRESHOLD  stall threshold in seconds (default 0.25)
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets (seconds) for lag, Prometheus-style cumulative
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoopMonitor:
+    """
+    Event-loop lag monitor and blocking-call detector
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        max_samples: int = 600,
+        max_stalls: int = 50,
+        stack_limit: int = 40,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+
+        self.samples: Deque[float] = deque(maxlen=max_samples)
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=max_stalls)
+        self.bucket_counts = [0] * len(LAG_BUCKETS)
+        self.sample_count = 0
+        self.lag_sum = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._current_stall: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None and not self._heartbeat_task.done()
+
+    def start(self):
+        """Start monitoring the running loop (call from inside the loop)"""
+        if self.running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            f"Loop monitor started (interval={self.interval}s, threshold={self.threshold}s)"
+        )
+
+    async def stop(self):
+        """Stop heartbeat and watchdog"""
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        logger.info("Loop monitor stopped")
+
+    async def _heartbeat(self):
+        """Sleep `interval` and record how late the loop woke us up"""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - start - self.interval)
+            self._last_beat = now
+            self._record(lag)
+
+    def _record(self, lag: float):
+        with self._lock:
+            self.samples.append(lag)
+            self.sample_count += 1
+            self.lag_sum += lag
+            self.max_lag = max(self.max_lag, lag)
+            for i, bound in enumerate(LAG_BUCKETS):
+                if lag <= bound:
+                    self.bucket_counts[i] += 1
+
+            # Heartbeat resumed: close the stall captured by the watchdog
+            if self._current_stall is not None:
+                self._current_stall["duration_seconds"] = round(lag + self.interval, 4)
+                self._current_stall["ongoing"] = False
+                logger.warning(
+                    f"Event loop blocked for {lag + self.interval:.3f}s in "
+                    f"{self._current_stall.get('task') or 'unknown task'}"
+                )
+                self._current_stall = None
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack during a stall"""
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            silent_for = time.monotonic() - self._last_beat - self.interval
+            if silent_for < self.threshold:
+                continue
+
+            with self._lock:
+                if self._current_stall is not None:
+                    self._current_stall["duration_seconds"] = round(silent_for, 4)
+                    continue
+                stall = self._capture(silent_for)
+                self._current_stall = stall
+                self.stalls.append(stall)
+                self.stall_count += 1
+
+    def _capture(self, silent_for: float) -> Dict[str, Any]:
+        """Snapshot of the loop thread's stack and the task currently running"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=self.stack_limit) if frame else []
+
+        task_name = None
+        coroutine = None
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = task.get_name()
+                coroutine = getattr(task.get_coro(), "__qualname__", None)
+        except RuntimeError:
+            pass
+
+        return {
+            "detected_at": time.time(),
+            "duration_seconds": round(silent_for, 4),
+            "ongoing": True,
+            "task": task_name,
+            "coroutine": coroutine,
+            "stack": [line.rstrip() for line in stack],
+        }
+
+    def get_stats(self, include_stacks: bool = True) -> Dict[str, Any]:
+        """Current lag statistics and recent stalls"""
+        with self._lock:
+            recent = list(self.samples)
+            stalls = [dict(s) for s in self.stalls]
+
+        if not include_stacks:
+            for stall in stalls:
+                stall.pop("stack", None)
+
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "samples": self.sample_count,
+            "lag_seconds": {
+                "last": recent[-1] if recent else 0.0,
+                "avg": self.lag_sum / self.sample_count if self.sample_count else 0.0,
+                "p50": _percentile(recent, 50),
+                "p95": _percentile(recent, 95),
+                "p99": _percentile(recent, 99),
+                "max_recent": max(recent) if recent else 0.0,
+                "max": self.max_lag,
+            },
+            "stalls_total": self.stall_count,
+            "stalls": stalls,
+        }
+
+    def prometheus_metrics(self) -> str:
+        """Prometheus text exposition of lag histogram and stall counter"""
+        with self._lock:
+            buckets = list(self.bucket_counts)
+            count, total = self.sample_count, self.lag_sum
+            stalls, last = self.stall_count, (self.samples[-1] if self.samples else 0.0)
+
+        lines = [
+            "# HELP event_loop_lag_seconds Event loop scheduling lag",
+            "# TYPE event_loop_lag_seconds histogram",
+        ]
+        for bound, value in zip(LAG_BUCKETS, buckets):
+            lines.append(f'event_loop_lag_seconds_bucket{{le="{bound}"}} {value}')
+        lines += [
+            f'event_loop_lag_seconds_bucket{{le="+Inf"}} {count}',
+            f"event_loop_lag_seconds_sum {total}",
+            f"event_loop_lag_seconds_count {count}",
+            "# HELP event_loop_lag_last_seconds Most recent lag sample",
+            "# TYPE event_loop_lag_last_seconds gauge",
+            f"event_loop_lag_last_seconds {last}",
+            "# HELP event_loop_stalls_total Loop stalls longer than the threshold",
+            "# TYPE event_loop_stalls_total counter",
+            f"event_loop_stalls_total {stalls}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def create_loop_monitor_from_env() -> Optional[LoopMonitor]:
+    """Build the monitor from LOOP_MONITOR_* env vars (None if disabled)"""
+    if os.getenv("LOOP_MONITOR_ENABLED", "1") in ("0", "false", "no"):
+        return None
+
+    return LoopMonitor(
+        interval=float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1")),
+        threshold=float(os.getenv("LOOP_MONITOR_THRESHOLD", "0.25")),
+    )
+
+
+# Singleton instance
+loop_monitor = create_loop_monitor_from_env()
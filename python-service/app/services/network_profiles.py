@@ -0,0 +1,453 @@
+"""
+Network Profiles
+Request interception for browser contexts: block what the task does not
+need, serve static assets from a shared in-process cache, and measure
+both per page.
+
+Profiles:
+    full       load everything (static assets still go through the cache)
+    no-media   block images, media, fonts and known trackers
+    text-only  no-media + stylesheets and other non-document traffic
+               (beacons, websockets, manifests); scripts still run
+
+Routing a context disables Chromium's HTTP cache, so cacheable GETs of
+scripts, stylesheets, fonts and images are fetched from Python
+(`route.fetch`) and kept in StaticAssetCache, shared by every context in
+the process (all sessions, all browser shards, one-off scrapes). A hit
+is answered with `route.fulfill` and never touches the network.
+
+The cache is shared across sessions, so it only keeps what a shared
+HTTP cache may: 200 responses marked `public` or with a max-age, to
+requests without Cookie / Authorization, without Set-Cookie and without
+Vary (other than Accept-Encoding: the body is stored decoded). Requests
+that cannot be cached, and URLs whose last response was not stored, go
+through `route.continue_()` instead of being copied through Python.
+
+Per page (reset on every navigation) NetworkPolicy counts requests,
+blocked requests by type, cache hits, bytes fetched / served from cache
+and the fetch time the hits saved. Blocked bytes and time are estimates
+from the average size / fetch time seen for that resource type.
+
+Configuration (env):
+    BROWSER_NETWORK_PROFILE     default profile of browser sessions (default full)
+    BROWSER_ASSET_CACHE_MB      static asset cache size (default 64, 0 = off)
+    BROWSER_ASSET_CACHE_TTL     seconds for `public` without max-age (default 3600)
+    BROWSER_ASSET_MAX_ENTRY_KB  largest cached response (default 2048)
+"""
+
+import logging
+import os
+import re
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class NetworkProfile:
+    """Which requests a context lets through"""
+
+    name: str
+    block_types: FrozenSet[str] = frozenset()
+    block_trackers: bool = False
+
+
+NETWORK_PROFILES: Dict[str, NetworkProfile] = {
+    "full": NetworkProfile("full"),
+    "no-media": NetworkProfile(
+        "no-media", frozenset({"image", "media", "font"}), block_trackers=True
+    ),
+    "text-only": NetworkProfile(
+        "text-only",
+        frozenset(
+            {
+                "image",
+                "media",
+                "font",
+                "stylesheet",
+                "texttrack",
+                "eventsource",
+                "websocket",
+                "manifest",
+                "other",
+            }
+        ),
+        block_trackers=True,
+    ),
+}
+
+# Analytics / ads hosts (suffix match)
+TRACKER_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "connect.facebook.net",
+    "analytics.tiktok.com",
+    "hotjar.com",
+    "clarity.ms",
+    "segment.io",
+    "segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "bat.bing.com",
+    "snap.licdn.com",
+    "static.ads-twitter.com",
+)
+
+CACHEABLE_TYPES = frozenset({"script", "stylesheet", "font", "image"})
+
+# Decoded body is fulfilled as-is: encoding/length headers no longer apply
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+_MAX_AGE = re.compile(r"(?<![-\w])max-age=(\d+)")
+# Requests whose responses depend on who asks: never shared between sessions
+_CREDENTIAL_HEADERS = ("cookie", "authorization")
+
+
+def get_profile(name: Optional[str]) -> NetworkProfile:
+    """Profile by name; ValueError for unknown names"""
+    if name is None:
+        return NETWORK_PROFILES[DEFAULT_PROFILE]
+    try:
+        return NETWORK_PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown network profile '{name}' (use {', '.join(NETWORK_PROFILES)})"
+        )
+
+
+def is_tracker(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(
+        host == domain or host.endswith("." + domain) for domain in TRACKER_DOMAINS
+    )
+
+
+# ============================================
+# STATIC ASSET CACHE
+# ============================================
+
+
+@dataclass
+class CachedAsset:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    fetch_ms: float
+    expires_at: float
+
+
+class StaticAssetCache:
+    """
+    Process-wide LRU (by bytes) of static asset responses, keyed by URL
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: float = 3600.0,
+        max_entry_bytes: int = 2 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.entries: "OrderedDict[str, CachedAsset]" = OrderedDict()
+        self.size = 0
+        # URL -> expiry of responses put() refused: fetched with continue_()
+        self.uncacheable: "OrderedDict[str, float]" = OrderedDict()
+        self.max_uncacheable = 4096
+        # resource type -> [responses, bytes, fetch ms] (for estimates)
+        self._observed: Dict[str, list] = defaultdict(lambda: [0, 0, 0.0])
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "evicted": 0,
+            "refused": 0,
+            "bypassed": 0,
+        }
+
+    def get(self, url: str) -> Optional[CachedAsset]:
+        asset = self.entries.get(url)
+        if asset is None or asset.expires_at < time.monotonic():
+            if asset is not None:
+                self._remove(url)
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(url)
+        self.stats["hits"] += 1
+        return asset
+
+    def bypass(self, url: str, request_headers: Dict[str, str]) -> bool:
+        """True when the request should skip the cache (and route.fetch)"""
+        if any(request_headers.get(name) for name in _CREDENTIAL_HEADERS):
+            self.stats["bypassed"] += 1
+            return True
+        expires_at = self.uncacheable.get(url)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self.uncacheable[url]
+            return False
+        self.stats["bypassed"] += 1
+        return True
+
+    def ttl_for(self, status: int, headers: Dict[str, str], size: int) -> float:
+        """Seconds a shared cache may keep the response; 0 = not storable"""
+        headers = {k.lower(): v for k, v in headers.items()}
+        cache_control = headers.get("cache-control", "").lower()
+        vary = {v.strip().lower() for v in headers.get("vary", "").split(",")}
+        if (
+            status != 200
+            or size > self.max_entry_bytes
+            or "set-cookie" in headers
+            or vary - {"", "accept-encoding"}
+            or "no-store" in cache_control
+            or "no-cache" in cache_control
+            or "private" in cache_control
+        ):
+            return 0.0
+
+        match = _MAX_AGE.search(cache_control)
+        if match:
+            return float(min(int(match.group(1)), 86400))
+        return self.default_ttl if "public" in cache_control else 0.0
+
+    def put(
+        self,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+        fetch_ms: float,
+    ) -> bool:
+        """Store a response if it is cacheable; True when stored"""
+        ttl = self.ttl_for(status, headers, len(body))
+        if ttl <= 0:
+            # Next requests for the URL skip route.fetch (continue_ instead)
+            self.stats["refused"] += 1
+            self.uncacheable[url] = time.monotonic() + self.default_ttl
+            self.uncacheable.move_to_end(url)
+            while len(self.uncacheable) > self.max_uncacheable:
+                self.uncacheable.popitem(last=False)
+            return False
+        self.uncacheable.pop(url, None)
+
+        if url in self.entries:
+            self._remove(url)
+        self.entries[url] = CachedAsset(
+            status,
+            {k: v for k, v in headers.items() if k.lower() not in _DROPPED_HEADERS},
+            body,
+            fetch_ms,
+            time.monotonic() + ttl,
+        )
+        self.size += len(body)
+        self.stats["stored"] += 1
+        while self.size > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+            self.stats["evicted"] += 1
+        return True
+
+    def _remove(self, url: str):
+        asset = self.entries.pop(url)
+        self.size -= len(asset.body)
+
+    def observe(self, resource_type: str, size: int, fetch_ms: float):
+        observed = self._observed[resource_type]
+        observed[0] += 1
+        observed[1] += size
+        observed[2] += fetch_ms
+
+    def average(self, resource_type: str) -> Tuple[float, float]:
+        """Average (bytes, fetch ms) seen for a resource type; zeros if unseen"""
+        count, size, fetch_ms = self._observed.get(resource_type, (0, 0, 0.0))
+        if not count:
+            return 0.0, 0.0
+        return size / count, fetch_ms / count
+
+    def get_statistics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": len(self.entries),
+            "uncacheable_urls": len(self.uncacheable),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# ============================================
+# PER-CONTEXT POLICY
+# ============================================
+
+
+# Totals over every page load in the process (for /network/stats)
+network_totals: Dict[str, float] = defaultdict(float)
+
+
+@dataclass
+class PageNetworkStats:
+    """Network counters of one page load"""
+
+    profile: str
+    requests: int = 0
+    blocked: Dict[str, int] = field(default_factory=dict)
+    cache_hits: int = 0
+    fetched: int = 0
+    bytes_fetched: int = 0
+    bytes_from_cache: int = 0
+    time_saved_ms: float = 0.0
+    estimated_bytes_blocked: float = 0.0
+    estimated_time_blocked_ms: float = 0.0
+
+    def add(self, counter: str, amount: float = 1):
+        """Count on this page and in the process-wide totals"""
+        setattr(self, counter, getattr(self, counter) + amount)
+        network_totals[counter] += amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "profile": self.profile,
+            "requests": self.requests,
+            "blocked": sum(self.blocked.values()),
+            "blocked_by_type": dict(self.blocked),
+            "cache_hits": self.cache_hits,
+            "fetched": self.fetched,
+            "bytes_fetched": self.bytes_fetched,
+            "bytes_from_cache": self.bytes_from_cache,
+            "time_saved_ms": round(self.time_saved_ms, 1),
+            "estimated_bytes_blocked": int(self.estimated_bytes_blocked),
+            "estimated_time_blocked_ms": round(self.estimated_time_blocked_ms, 1),
+        }
+
+
+class NetworkPolicy:
+    """
+    Route handler of one browser context; the profile can change anytime
+    """
+
+    def __init__(
+        self,
+        profile: Optional[str] = None,
+        cache: Optional[StaticAssetCache] = None,
+    ):
+        self.profile = get_profile(profile)
+        self.cache = cache if cache is not None else static_asset_cache
+        self.page = PageNetworkStats(self.profile.name)
+
+    async def attach(self, context):
+        await context.route("**/*", self._handle)
+
+    def set_profile(self, name: Optional[str]):
+        self.profile = get_profile(name)
+
+    def new_page_load(self) -> PageNetworkStats:
+        """Start counting a new navigation (stats of the current page)"""
+        self.page = PageNetworkStats(self.profile.name)
+        network_totals["pages"] += 1
+        return self.page
+
+    async def _handle(self, route, request):
+        page = self.page
+        page.add("requests")
+        resource_type = request.resource_type
+        try:
+            if resource_type in self.profile.block_types or (
+                self.profile.block_trackers and is_tracker(request.url)
+            ):
+                page.blocked[resource_type] = page.blocked.get(resource_type, 0) + 1
+                network_totals["blocked"] += 1
+                size, fetch_ms = self.cache.average(resource_type)
+                page.add("estimated_bytes_blocked", size)
+                page.add("estimated_time_blocked_ms", fetch_ms)
+                await route.abort("blockedbyclient")
+                return
+
+            if (
+                self.cache.max_bytes > 0
+                and request.method == "GET"
+                and resource_type in CACHEABLE_TYPES
+            ):
+                await self._serve_cached(route, request, page)
+                return
+
+            await route.continue_()
+        except Exception as e:
+            # Page closed mid-request, route already handled, etc.
+            logger.debug(f"Route handling failed for {request.url}: {e}")
+
+    async def _serve_cached(self, route, request, page: PageNetworkStats):
+        url = request.url
+        # Credentialed or known-uncacheable: plain continue_, no copy via Python
+        if self.cache.bypass(url, await request.all_headers()):
+            await route.continue_()
+            return
+
+        asset = self.cache.get(url)
+        if asset is not None:
+            page.add("cache_hits")
+            page.add("bytes_from_cache", len(asset.body))
+            page.add("time_saved_ms", asset.fetch_ms)
+            await route.fulfill(
+                status=asset.status, headers=asset.headers, body=asset.body
+            )
+            return
+
+        start = time.perf_counter()
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.continue_()
+            return
+        fetch_ms = (time.perf_counter() - start) * 1000
+
+        headers = response.headers
+        page.add("fetched")
+        page.add("bytes_fetched", len(body))
+        self.cache.observe(request.resource_type, len(body), fetch_ms)
+        self.cache.put(url, response.status, headers, body, fetch_ms)
+        await route.fulfill(
+            status=response.status,
+            headers={
+                k: v for k, v in headers.items() if k.lower() not in _DROPPED_HEADERS
+            },
+            body=body,
+        )
+
+
+def get_network_statistics() -> Dict[str, Any]:
+    return {
+        "default_profile": DEFAULT_PROFILE,
+        "profiles": {
+            name: sorted(profile.block_types)
+            for name, profile in NETWORK_PROFILES.items()
+        },
+        "totals": {k: round(v, 1) for k, v in network_totals.items()},
+        "asset_cache": static_asset_cache.get_statistics(),
+    }
+
+
+def create_static_asset_cache_from_env() -> StaticAssetCache:
+    """Build the cache from BROWSER_ASSET_* env vars"""
+    return StaticAssetCache(
+        max_bytes=int(float(os.getenv("BROWSER_ASSET_CACHE_MB", "64")) * 1024 * 1024),
+        default_ttl=float(os.getenv("BROWSER_ASSET_CACHE_TTL", "3600")),
+        max_entry_bytes=int(os.getenv("BROWSER_ASSET_MAX_ENTRY_KB", "2048")) * 1024,
+    )
+
+
+DEFAULT_PROFILE = os.getenv("BROWSER_NETWORK_PROFILE", "full")
+if DEFAULT_PROFILE not in NETWORK_PROFILES:
+    logger.warning(f"Unknown BROWSER_NETWORK_PROFILE '{DEFAULT_PROFILE}'; using full")
+    DEFAULT_PROFILE = "full"
+
+# Singleton instance
+static_asset_cache = create_static_asset_cache_from_env()
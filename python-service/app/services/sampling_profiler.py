@@ -0,0 +1,240 @@
+"""
+Sampling Profiler
+Low-overhead statistical profiler for the live worker.
+
+A sampler thread reads every thread's current frame (sys._current_frames)
+at a fixed interval and aggregates the stacks into collapsed form
+("root;caller;callee count"), the input format of flamegraph tools.
+No tracing hooks are installed, so the profiled code runs at full
+speed; cost is proportional to sampling rate and stack depth.
+
+Results can be returned as collapsed stacks, a self-contained SVG
+flamegraph, or a JSON summary of the hottest functions.
+"""
+
+import html
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Decide per sample whether a thread should be recorded
+ThreadFilter = Callable[[int], bool]
+
+
+@dataclass
+class ProfileResult:
+    """Aggregated samples of one profiling run"""
+
+    duration: float
+    interval: float
+    samples: int
+    stacks: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed format: one 'frame;frame;frame count' per line"""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def top_functions(self, limit: int = 30) -> List[Dict[str, Any]]:
+        """Hottest functions by self and total (inclusive) samples"""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+
+        total = sum(self.stacks.values()) or 1
+        return [
+            {
+                "function": frame,
+                "self_samples": self_counts[frame],
+                "total_samples": count,
+                "self_pct": round(self_counts[frame] / total * 100, 2),
+                "total_pct": round(count / total * 100, 2),
+            }
+            for frame, count in total_counts.most_common(limit)
+        ]
+
+    def to_dict(self, limit: int = 30) -> Dict[str, Any]:
+        return {
+            "duration_seconds": round(self.duration, 3),
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "recorded_stacks": sum(self.stacks.values()),
+            "top_functions": self.top_functions(limit),
+        }
+
+    def flamegraph_svg(self, title: str = "Flamegraph", width: int = 1200) -> str:
+        """Render a static SVG flamegraph (root at the bottom)"""
+        return render_flamegraph_svg(self.stacks, title=title, width=width)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler driven by a background sampler thread
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._busy = threading.Lock()
+        self._project_root = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+
+    @property
+    def busy(self) -> bool:
+        return self._busy.locked()
+
+    def profile(
+        self,
+        duration: float,
+        thread_filter: Optional[ThreadFilter] = None,
+        interval: Optional[float] = None,
+    ) -> ProfileResult:
+        """
+        Sample all (or filtered) threads for `duration` seconds
+
+        Blocking: call it through asyncio.to_thread from async code.
+        Raises RuntimeError if another profile is already running.
+        """
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("A profiling session is already running")
+
+        interval = interval or self.interval
+        own_thread = threading.get_ident()
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        stacks: Counter = Counter()
+        samples = 0
+
+        try:
+            start = time.perf_counter()
+            deadline = start + duration
+            while time.perf_counter() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    if thread_filter is not None and not thread_filter(thread_id):
+                        continue
+                    name = thread_names.get(thread_id, f"thread-{thread_id}")
+                    stacks[self._collapse(name, frame)] += 1
+                samples += 1
+                time.sleep(interval)
+
+            elapsed = time.perf_counter() - start
+        finally:
+            self._busy.release()
+
+        logger.info(
+            f"Profiled {elapsed:.1f}s: {samples} samples, {len(stacks)} distinct stacks"
+        )
+        return ProfileResult(
+            duration=elapsed, interval=interval, samples=samples, stacks=stacks
+        )
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({self._short_path(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        frames.reverse()
+        return ";".join(f.replace(";", ":") for f in frames)
+
+    def _short_path(self, filename: str) -> str:
+        if filename.startswith(self._project_root):
+            return os.path.relpath(filename, self._project_root)
+        # site-packages/<pkg>/... -> <pkg>/...
+        marker = "site-packages" + os.sep
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+        return os.path.basename(filename)
+
+
+# ============================================
+# FLAMEGRAPH RENDERING
+# ============================================
+
+
+def _build_tree(stacks: Counter) -> Dict[str, Any]:
+    root: Dict[str, Any] = {"name": "all", "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["value"] += count
+        for frame in stack.split(";"):
+            child = node["children"].setdefault(
+                frame, {"name": frame, "value": 0, "children": {}}
+            )
+            child["value"] += count
+            node = child
+    return root
+
+
+def _color(name: str) -> str:
+    # Stable warm palette per function name
+    h = sum(ord(c) for c in name)
+    return f"rgb({205 + h % 50},{80 + h % 120},{30 + h % 40})"
+
+
+def render_flamegraph_svg(
+    stacks: Counter, title: str = "Flamegraph", width: int = 1200, row_height: int = 17
+) -> str:
+    """Static SVG flamegraph; hover a frame to see samples and percentage"""
+    root = _build_tree(stacks)
+    total = root["value"] or 1
+    rects: List[tuple] = []
+    max_depth = 0
+
+    def walk(node: Dict[str, Any], x: float, depth: int):
+        nonlocal max_depth
+        max_depth = max(max_depth, depth)
+        for child in sorted(node["children"].values(), key=lambda n: n["name"]):
+            w = child["value"] / total * width
+            if w >= 0.5:
+                rects.append((x, depth, w, child))
+                walk(child, x, depth + 1)
+            x += w
+
+    walk(root, 0.0, 0)
+    height = (max_depth + 2) * row_height + 30
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        '<rect width="100%" height="100%" fill="#fafafa"/>',
+        f'<text x="{width / 2}" y="16" text-anchor="middle" font-size="14">'
+        f"{html.escape(title)} ({root['value']} samples)</text>",
+    ]
+    for x, depth, w, node in rects:
+        y = height - (depth + 1) * row_height
+        pct = node["value"] / total * 100
+        label = html.escape(node["name"])
+        parts.append(
+            f'<g><title>{label} — {node["value"]} samples ({pct:.2f}%)</title>'
+            f'<rect x="{x:.2f}" y="{y}" width="{w:.2f}" height="{row_height - 1}" '
+            f'fill="{_color(node["name"])}" rx="2"/>'
+        )
+        max_chars = int(w / 7)
+        if max_chars >= 3:
+            text = node["name"] if len(node["name"]) <= max_chars else node["name"][: max_chars - 2] + ".."
+            parts.append(
+                f'<text x="{x + 3:.2f}" y="{y + row_height - 5}">{html.escape(text)}</text>'
+            )
+        parts.append("</g>")
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+# Singleton instance
+sampling_profiler = SamplingProfiler()
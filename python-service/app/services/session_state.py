@@ -0,0 +1,134 @@
+"""
+Browser Session State
+Local store for Playwright storage state (cookies + localStorage).
+
+Contexts closed by idle/LRU eviction, shutdown or a browser restart used
+to take their cookies and logins with them, so automations re-ran slow
+login flows. The context pool saves `context.storage_state()` here when
+a session closes and creates the context with it (`storage_state=`)
+when the same session_id comes back.
+
+Opt-in: the files hold live auth cookies, so nothing is written unless
+BROWSER_PERSIST_STATE is set. Sessions with generated ids (one-off
+requests) are never saved.
+
+One JSON file per session (sha256 of the id as the name), written
+atomically with 0600 permissions: the files hold live auth cookies.
+States older than `ttl` are ignored and removed.
+
+Configuration (env):
+    BROWSER_PERSIST_STATE  save/restore session state (default false)
+    BROWSER_STATE_DIR      directory (default <tmp>/syncads-browser-state)
+    BROWSER_STATE_TTL      seconds a saved state stays valid (default 604800)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStateStore:
+    """
+    File-per-session storage state store
+    """
+
+    def __init__(self, directory: Path, ttl: float = 7 * 86400):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.stats = {"saved": 0, "restored": 0, "expired": 0, "errors": 0}
+
+    def _path(self, session_id: str) -> Path:
+        name = hashlib.sha256(session_id.encode()).hexdigest()
+        return self.directory / f"{name}.json"
+
+    # ------------------------------------------
+    # LOAD / SAVE
+    # ------------------------------------------
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Saved storage state for the session, or None"""
+        try:
+            return await asyncio.to_thread(self._load, session_id)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Failed to load browser state for {session_id}: {e}")
+            return None
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(session_id)
+        try:
+            record = json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        if time.time() - record.get("saved_at", 0) > self.ttl:
+            self.stats["expired"] += 1
+            path.unlink(missing_ok=True)
+            return None
+        self.stats["restored"] += 1
+        return record["state"]
+
+    async def save(self, session_id: str, state: Dict[str, Any]):
+        try:
+            await asyncio.to_thread(self._save, session_id, state)
+            self.stats["saved"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Failed to save browser state for {session_id}: {e}")
+
+    def _save(self, session_id: str, state: Dict[str, Any]):
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        record = {"session_id": session_id, "saved_at": time.time(), "state": state}
+        path = self._path(session_id)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp, path)  # mkstemp files are already 0600
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    async def delete(self, session_id: str) -> bool:
+        """Forget a session's state; False if none was saved"""
+        path = self._path(session_id)
+        existed = path.exists()
+        path.unlink(missing_ok=True)
+        return existed
+
+    def prune(self) -> int:
+        """Remove expired states (by file mtime); returns how many"""
+        if not self.directory.is_dir():
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for path in self.directory.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        self.stats["expired"] += removed
+        return removed
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self.stats, "directory": str(self.directory), "ttl": self.ttl}
+
+
+def create_session_state_store_from_env() -> Optional[SessionStateStore]:
+    """Build the store from BROWSER_* env vars; None when disabled"""
+    if os.getenv("BROWSER_PERSIST_STATE", "false").lower() not in ("1", "true", "yes"):
+        return None
+    default_dir = Path(tempfile.gettempdir()) / "syncads-browser-state"
+    return SessionStateStore(
+        Path(os.getenv("BROWSER_STATE_DIR", str(default_dir))),
+        ttl=float(os.getenv("BROWSER_STATE_TTL", str(7 * 86400))),
+    )
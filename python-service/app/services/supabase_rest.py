@@ -0,0 +1,293 @@
+"""
+Supabase REST (async)
+Shared, pooled async access to Supabase's PostgREST API.
+
+`supabase.create_client()` builds a new synchronous client (and HTTP
+connection) per call, and its `.execute()` blocks the event loop for the
+whole round trip. This module keeps one `httpx.AsyncClient` per process:
+connections are pooled and kept alive between requests, every call has
+a timeout (overridable per call), and the loop keeps serving other
+requests while a query is in flight.
+
+The pool is split into small clients (`shard_size` connections each)
+used round-robin, with a semaphore capping in-flight requests at the
+total pool size: httpcore's scheduling cost grows with connections x
+queued requests, so one 50-connection client under load spends more CPU
+assigning requests than sending them.
+
+Filters use PostgREST syntax; `eq()` and `in_()` build the common ones:
+
+    rows = await db.select(
+        "extension_commands",
+        filters={"device_id": eq(device_id), "status": eq("pending")},
+        order="priority.desc,created_at.asc",
+        limit=10,
+    )
+
+Configuration (env):
+    SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY
+    SUPABASE_REST_TIMEOUT           per-call timeout in seconds (default 10)
+    SUPABASE_REST_MAX_CONNECTIONS   pool size (default 50)
+    SUPABASE_REST_SHARD_SIZE        connections per client (default 8)
+"""
+
+import asyncio
+import itertools
+import logging
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+Rows = List[Dict[str, Any]]
+
+
+class SupabaseError(Exception):
+    """PostgREST returned an error response"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Supabase {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+def eq(value: Any) -> str:
+    return f"eq.{value}"
+
+
+def in_(values: Iterable[Any]) -> str:
+    return "in.(" + ",".join(f'"{value}"' for value in values) + ")"
+
+
+class SupabaseREST:
+    """
+    Async PostgREST client with a shared connection pool
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        timeout: float = 10.0,
+        max_connections: int = 50,
+        shard_size: int = 8,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.key = key
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.shards = max(1, math.ceil(max_connections / shard_size))
+        per_shard = math.ceil(max_connections / self.shards)
+        self.limits = httpx.Limits(
+            max_connections=per_shard,
+            max_keepalive_connections=per_shard,
+            keepalive_expiry=30.0,
+        )
+        self._transport = transport
+        self._clients: List[httpx.AsyncClient] = []
+        self._round_robin = itertools.count()
+        self._slots = asyncio.Semaphore(max_connections)
+
+        self.stats = {"requests": 0, "errors": 0, "timeouts": 0, "seconds": 0.0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily, inside the running event loop
+        if not self._clients:
+            self._clients = [self._new_client() for _ in range(self.shards)]
+        return self._clients[next(self._round_robin) % len(self._clients)]
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "apikey": self.key,
+                "Authorization": f"Bearer {self.key}",
+                "Content-Type": "application/json",
+            },
+            limits=self.limits,
+            timeout=self.timeout,
+            transport=self._transport,
+        )
+
+    # ------------------------------------------
+    # QUERIES
+    # ------------------------------------------
+
+    async def select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, str]] = None,
+        columns: str = "*",
+        order: Optional[str] = None,
+        limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Rows:
+        params = {"select": columns, **(filters or {})}
+        if order:
+            params["order"] = order
+        if limit is not None:
+            params["limit"] = str(limit)
+        return await self._request("GET", table, params=params, timeout=timeout)
+
+    async def insert(
+        self,
+        table: str,
+        rows: Union[Dict[str, Any], Rows],
+        returning: bool = True,
+        timeout: Optional[float] = None,
+    ) -> Rows:
+        return await self._request(
+            "POST",
+            table,
+            json=rows,
+            prefer=["return=representation" if returning else "return=minimal"],
+            timeout=timeout,
+        )
+
+    async def upsert(
+        self,
+        table: str,
+        rows: Union[Dict[str, Any], Rows],
+        on_conflict: str,
+        returning: bool = True,
+        timeout: Optional[float] = None,
+    ) -> Rows:
+        return await self._request(
+            "POST",
+            table,
+            params={"on_conflict": on_conflict},
+            json=rows,
+            prefer=[
+                "resolution=merge-duplicates",
+                "return=representation" if returning else "return=minimal",
+            ],
+            timeout=timeout,
+        )
+
+    async def update(
+        self,
+        table: str,
+        values: Dict[str, Any],
+        filters: Dict[str, str],
+        returning: bool = False,
+        timeout: Optional[float] = None,
+    ) -> Rows:
+        return await self._request(
+            "PATCH",
+            table,
+            params=filters,
+            json=values,
+            prefer=["return=representation" if returning else "return=minimal"],
+            timeout=timeout,
+        )
+
+    async def delete(
+        self,
+        table: str,
+        filters: Dict[str, str],
+        timeout: Optional[float] = None,
+    ) -> Rows:
+        return await self._request(
+            "DELETE", table, params=filters, prefer=["return=minimal"], timeout=timeout
+        )
+
+    async def rpc(
+        self,
+        function: str,
+        params: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Call a Postgres function exposed by PostgREST (/rpc/<function>)"""
+        rows = await self._request(
+            "POST", f"rpc/{function}", json=params, timeout=timeout
+        )
+        return rows[0] if len(rows) == 1 else rows
+
+    async def _request(
+        self,
+        method: str,
+        table: str,
+        params: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        prefer: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Rows:
+        headers = {"Prefer": ",".join(prefer)} if prefer else None
+        start = time.perf_counter()
+        self.stats["requests"] += 1
+        try:
+            async with self._slots:
+                response = await self.client.request(
+                    method,
+                    f"/{table}",
+                    params=params,
+                    json=json,
+                    headers=headers,
+                    timeout=timeout if timeout is not None else self.timeout,
+                )
+        except httpx.TimeoutException:
+            self.stats["timeouts"] += 1
+            raise
+        finally:
+            self.stats["seconds"] += time.perf_counter() - start
+
+        if response.status_code >= 400:
+            self.stats["errors"] += 1
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise SupabaseError(response.status_code, message)
+
+        if not response.content:
+            return []
+        data = response.json()
+        return data if isinstance(data, list) else [data]
+
+    async def close(self):
+        clients, self._clients = self._clients, []
+        for client in clients:
+            await client.aclose()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        requests = self.stats["requests"]
+        avg = self.stats["seconds"] / requests if requests else 0.0
+        return {
+            **self.stats,
+            "seconds": round(self.stats["seconds"], 3),
+            "avg_ms": round(avg * 1000, 2),
+            "max_connections": self.max_connections,
+            "shards": self.shards,
+        }
+
+
+def create_supabase_rest_from_env() -> Optional[SupabaseREST]:
+    """Build the client from SUPABASE_* env vars; None when not configured"""
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not url or not key:
+        return None
+    return SupabaseREST(
+        url,
+        key,
+        timeout=float(os.getenv("SUPABASE_REST_TIMEOUT", "10")),
+        max_connections=int(os.getenv("SUPABASE_REST_MAX_CONNECTIONS", "50")),
+        shard_size=int(os.getenv("SUPABASE_REST_SHARD_SIZE", "8")),
+    )
+
+
+_supabase_rest: Optional[SupabaseREST] = None
+
+
+def get_supabase_rest() -> Optional[SupabaseREST]:
+    """Process-wide client (created on first use, after env is loaded)"""
+    global _supabase_rest
+    if _supabase_rest is None:
+        _supabase_rest = create_supabase_rest_from_env()
+    return _supabase_rest
@@ -0,0 +1,470 @@
+"""
+Tracing
+W3C trace-context spans propagated across the service's hops.
+
+A span is opened per hop (HTTP request, omnibrain task, LLM call,
+browser action, Supabase write, webhook delivery). The active span lives
+in a contextvar, so child spans and asyncio tasks created inside it
+inherit the trace automatically. Across process boundaries the context
+travels as a `traceparent` header (00-<trace_id>-<span_id>-<flags>):
+outgoing webhook requests carry it, and extension_commands rows store it
+so the extension's result can be joined back to the originating trace.
+
+Finished spans go to a local exporter: an in-memory ring buffer (always)
+and, optionally, a JSONL file written in batches by a background thread.
+`get_waterfall(trace_id)` rebuilds the end-to-end latency waterfall of
+one trace without an external collector.
+
+Configuration (env):
+    TRACING_ENABLED     1/0 (default 1)
+    TRACE_BUFFER_SIZE   spans kept in memory (default 5000)
+    TRACE_EXPORT_FILE   JSONL file to append finished spans to (optional)
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Mapping, MutableMapping, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+
+_TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+# ============================================
+# CONTEXT
+# ============================================
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identity of a span as carried in the traceparent header"""
+
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header (None if absent or malformed)"""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if not match:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return SpanContext(trace_id, span_id, sampled=bool(int(flags, 16) & 0x01))
+
+
+@dataclass
+class Span:
+    """One timed operation inside a trace"""
+
+    name: str
+    context: SpanContext
+    parent_id: Optional[str] = None
+    kind: str = "internal"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_time: float = field(default_factory=time.time)
+    end_time: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    _start_perf: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.trace_id
+
+    @property
+    def span_id(self) -> str:
+        return self.context.span_id
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_time is None:
+            return None
+        return round((self.end_time - self.start_time) * 1000, 3)
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        if self.end_time is None:
+            # perf_counter for the duration, wall clock only as the anchor
+            self.end_time = self.start_time + (time.perf_counter() - self._start_perf)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def get_current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent of the active span (None outside a trace)"""
+    span = _current_span.get()
+    return span.context.traceparent if span else None
+
+
+def inject(headers: MutableMapping[str, str]) -> MutableMapping[str, str]:
+    """Add the active span's traceparent to outgoing headers"""
+    traceparent = current_traceparent()
+    if traceparent:
+        headers[TRACEPARENT_HEADER] = traceparent
+    return headers
+
+
+def extract(headers: Mapping[str, str]) -> Optional[SpanContext]:
+    """Read a traceparent from incoming headers"""
+    value = headers.get(TRACEPARENT_HEADER) or headers.get("Traceparent")
+    return parse_traceparent(value)
+
+
+# ============================================
+# EXPORTERS
+# ============================================
+
+
+class RingExporter:
+    """Keeps the last N finished spans in memory, grouped by trace"""
+
+    def __init__(self, max_spans: int = 5000):
+        self.max_spans = max_spans
+        self._spans: Deque[Span] = deque()
+        self._by_trace: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            self._by_trace.setdefault(span.trace_id, []).append(span)
+            self._by_trace.move_to_end(span.trace_id)
+            while len(self._spans) > self.max_spans:
+                old = self._spans.popleft()
+                siblings = self._by_trace.get(old.trace_id)
+                if siblings:
+                    siblings.remove(old)
+                    if not siblings:
+                        del self._by_trace[old.trace_id]
+
+    def get_trace(self, trace_id: str) -> List[Span]:
+        with self._lock:
+            return list(self._by_trace.get(trace_id, []))
+
+    def recent_traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recently active traces with root span and total duration"""
+        with self._lock:
+            traces = [(k, list(v)) for k, v in list(self._by_trace.items())[-limit:]]
+
+        summaries = []
+        for trace_id, spans in reversed(traces):
+            root = next((s for s in spans if s.parent_id is None), None) or min(
+                spans, key=lambda s: s.start_time
+            )
+            start = min(s.start_time for s in spans)
+            end = max(s.end_time or s.start_time for s in spans)
+            summaries.append(
+                {
+                    "trace_id": trace_id,
+                    "root": root.name,
+                    "spans": len(spans),
+                    "errors": sum(1 for s in spans if s.status == "error"),
+                    "start_time": start,
+                    "duration_ms": round((end - start) * 1000, 3),
+                }
+            )
+        return summaries
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._by_trace.clear()
+
+
+class FileExporter:
+    """
+    Appends finished spans to a JSONL file
+
+    export() only queues the span; a daemon thread serializes and writes
+    the queue in batches every `flush_interval` seconds, so the event
+    loop never waits on the file. When more than `max_pending` spans are
+    queued (disk stalled), new spans are dropped and counted.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, max_pending: int = 10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: Deque[Span] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._run, name="trace-file-exporter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def export(self, span: Span):
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(span)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(self.flush_interval)
+                batch = list(self._pending)
+                self._pending.clear()
+                closed = self._closed
+            if batch:
+                self._write(batch)
+            if closed:
+                return
+
+    def _write(self, batch: List[Span]):
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in batch)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning(f"Could not write {len(batch)} spans to {self.path}: {e}")
+
+    def close(self):
+        """Write what is still queued and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._writer.join(timeout=5)
+
+
+# ============================================
+# TRACER
+# ============================================
+
+
+class Tracer:
+    """Creates spans, tracks the active one and hands finished spans to exporters"""
+
+    def __init__(self, enabled: bool = True, buffer_size: int = 5000, export_file: Optional[str] = None):
+        self.enabled = enabled
+        self.ring = RingExporter(buffer_size)
+        self.exporters: List[Any] = [self.ring]
+        if export_file:
+            self.exporters.append(FileExporter(export_file))
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        kind: str = "internal",
+        parent: Optional[SpanContext] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Optional[Span]]:
+        """
+        Open a span as a child of `parent` or of the active span
+
+        Works in sync and async code (`with tracer.span(...)` inside a
+        coroutine). Yields None when tracing is disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        active = _current_span.get()
+        parent_ctx = parent or (active.context if active else None)
+        context = SpanContext(
+            trace_id=parent_ctx.trace_id if parent_ctx else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            sampled=parent_ctx.sampled if parent_ctx else True,
+        )
+        span = Span(
+            name=name,
+            context=context,
+            parent_id=parent_ctx.span_id if parent_ctx else None,
+            kind=kind,
+            attributes=dict(attributes or {}),
+        )
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            if context.sampled:
+                self._export(span)
+
+    def _export(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.warning(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+    def get_waterfall(self, trace_id: str) -> Dict[str, Any]:
+        """
+        Spans of one trace ordered by start, with their offset from the
+        trace start and nesting depth (end-to-end latency waterfall)
+        """
+        spans = sorted(self.ring.get_trace(trace_id), key=lambda s: s.start_time)
+        if not spans:
+            return {"trace_id": trace_id, "spans": [], "duration_ms": 0.0}
+
+        depth: Dict[str, int] = {}
+        known = {s.span_id for s in spans}
+        start = spans[0].start_time
+        end = max(s.end_time or s.start_time for s in spans)
+
+        rows = []
+        for s in spans:
+            parent_depth = depth.get(s.parent_id, -1) if s.parent_id in known else -1
+            depth[s.span_id] = parent_depth + 1
+            rows.append(
+                {
+                    **s.to_dict(),
+                    "depth": depth[s.span_id],
+                    "offset_ms": round((s.start_time - start) * 1000, 3),
+                }
+            )
+
+        return {
+            "trace_id": trace_id,
+            "duration_ms": round((end - start) * 1000, 3),
+            "span_count": len(rows),
+            "spans": rows,
+        }
+
+
+def traced(name: str, kind: str = "internal", record: Sequence[str] = ()):
+    """
+    Decorator: run an async function inside a span named `name`
+
+    `record` lists argument names whose values become span attributes.
+    """
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            attributes = {}
+            if record:
+                bound = signature.bind_partial(*args, **kwargs).arguments
+                attributes = {key: bound[key] for key in record if key in bound}
+            with get_tracer().span(name, kind=kind, attributes=attributes):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TraceMiddleware:
+    """
+    ASGI middleware: one server span per HTTP request
+
+    Continues the caller's trace when a traceparent header is present and
+    returns the request span's traceparent in the response headers.
+    """
+
+    def __init__(self, app, tracer: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer or get_tracer()
+
+    async def __call__(self, scope, receive, send):
+        tracer = self.tracer
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        name = f"{scope.get('method', 'GET')} {scope.get('path', '')}"
+
+        with tracer.span(
+            name,
+            kind="server",
+            parent=extract(headers),
+            attributes={"http.method": scope.get("method"), "http.path": scope.get("path")},
+        ) as span:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    status = message.get("status", 200)
+                    span.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        span.status = "error"
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (TRACEPARENT_HEADER.encode(), span.context.traceparent.encode())
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+
+
+def create_tracer_from_env() -> Tracer:
+    """Build the tracer from TRACING_* / TRACE_* env vars"""
+    return Tracer(
+        enabled=os.getenv("TRACING_ENABLED", "1") not in ("0", "false", "no"),
+        buffer_size=int(os.getenv("TRACE_BUFFER_SIZE", "5000")),
+        export_file=os.getenv("TRACE_EXPORT_FILE") or None,
+    )
+
+
+def get_tracer() -> Tracer:
+    return tracer
+
+
+# Singleton instance
+tracer = create_tracer_from_env()
@@ -0,0 +1,299 @@
+"""
+Write Buffer
+In-process batching of small database writes.
+
+Endpoints hit by chatty clients (extension logs, command results) put
+rows into a WriteBuffer instead of writing them one by one. A single
+flusher task hands them to the sink in batches, once `max_batch` rows
+are queued or the oldest row has waited `max_delay` seconds, so N
+requests become roughly N / max_batch round trips and the request path
+never waits on the database.
+
+Backpressure: the buffer holds at most `max_pending` rows, counting the
+batch being written. `put()` waits up to `put_timeout` for room and then
+raises BufferFull, so callers can reject (or drop) instead of growing
+memory without bound while the database is slow or down.
+
+Failed flushes are retried with backoff (`max_retries`); a batch that
+still fails goes back to the front of the queue for the next flush, so
+an outage fills the buffer (and turns into BufferFull for producers)
+instead of losing rows. When the caller's `is_bad_row` says an error
+was caused by the data (a constraint violation, a malformed value),
+retrying cannot help: the batch is split in halves and each half
+written on its own, down to single rows, so one bad row costs only
+itself. Rows that are given up on (rejected rows, and rows still failing
+at `close()`) are handed to `on_drop`, so the caller can record the
+failure somewhere else.
+
+Configuration (env, per buffer prefix, e.g. EXTENSION_LOGS_):
+    <PREFIX>BATCH        max rows per flush (default 200)
+    <PREFIX>DELAY        max seconds a row waits for a flush (default 0.25)
+    <PREFIX>MAX_PENDING  max queued rows before backpressure (default 5000)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+FlushFn = Callable[[List[Row]], Awaitable[None]]
+# True when a flush error is caused by the rows themselves (not retryable)
+BadRowCheck = Callable[[Exception], bool]
+# Rows the buffer gave up on, with the error that made it give up
+DropFn = Callable[[List[Row], Exception], Awaitable[None]]
+
+
+class BufferFull(Exception):
+    """No room in the buffer within the put timeout"""
+
+
+class WriteBuffer:
+    """
+    Size/time batched writer with bounded memory
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: FlushFn,
+        max_batch: int = 200,
+        max_delay: float = 0.25,
+        max_pending: int = 5000,
+        put_timeout: float = 2.0,
+        max_retries: int = 3,
+        is_bad_row: Optional[BadRowCheck] = None,
+        on_drop: Optional[DropFn] = None,
+    ):
+        self.name = name
+        self.flush_fn = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.is_bad_row = is_bad_row
+        self.on_drop = on_drop
+
+        self.rows: Deque[Row] = deque()
+        # Rows taken by the flusher and not yet written or dropped
+        self.in_flight = 0
+        self._oldest: Optional[float] = None
+        self._has_rows = asyncio.Event()
+        self._full_batch = asyncio.Event()
+        self._space = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._last_error: Optional[Exception] = None
+
+        self.stats = {
+            "rows": 0,
+            "flushes": 0,
+            "flushed_rows": 0,
+            "failed_flushes": 0,
+            "dropped_rows": 0,
+            "requeued_rows": 0,
+            "bad_rows": 0,
+            "split_flushes": 0,
+            "rejected": 0,
+            "backpressure_waits": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return len(self.rows) + self.in_flight
+
+    def _has_room(self) -> bool:
+        return self.pending < self.max_pending
+
+    # ------------------------------------------
+    # PRODUCERS
+    # ------------------------------------------
+
+    async def put(self, row: Row):
+        """Queue a row; waits for room, BufferFull after `put_timeout`"""
+        if self._closing:
+            raise BufferFull(f"{self.name} buffer is closing")
+
+        async with self._space:
+            if not self._has_room():
+                self.stats["backpressure_waits"] += 1
+                try:
+                    await asyncio.wait_for(
+                        self._space.wait_for(self._has_room),
+                        self.put_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    self.stats["rejected"] += 1
+                    raise BufferFull(
+                        f"{self.name} buffer full ({self.max_pending} rows pending)"
+                    )
+            # Appended while holding the condition: no other put can take
+            # the slot between the room check and the append
+            self._append(row)
+
+    def _append(self, row: Row):
+        if not self.rows:
+            self._oldest = time.monotonic()
+        self.rows.append(row)
+        self.stats["rows"] += 1
+        self._has_rows.set()
+        if len(self.rows) >= self.max_batch:
+            self._full_batch.set()
+        self._ensure_flusher()
+
+    # ------------------------------------------
+    # FLUSHER
+    # ------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(
+                self._flush_loop(), name=f"write-buffer-{self.name}"
+            )
+
+    async def _flush_loop(self):
+        while not self._closing:
+            await self._has_rows.wait()
+            if self._closing:
+                return  # close() flushes the rest
+
+            # Wait for a full batch or for the oldest row to reach max_delay
+            wait = self.max_delay - (time.monotonic() - (self._oldest or 0))
+            if wait > 0 and len(self.rows) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full_batch.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            await self._flush_batch()
+
+    async def _flush_batch(self) -> int:
+        size = min(self.max_batch, len(self.rows))
+        batch = [self.rows.popleft() for _ in range(size)]
+        self._sync_events()
+        if not batch:
+            return 0
+
+        self.in_flight += len(batch)
+        try:
+            failed = await self._write(batch)
+        finally:
+            self.in_flight -= len(batch)
+
+        if failed:
+            if self._closing:
+                await self._drop(failed, self._last_error)
+            else:
+                # Kept for the next flush, ahead of newer rows
+                self.stats["requeued_rows"] += len(failed)
+                self.rows.extendleft(reversed(failed))
+                self._sync_events()
+
+        # Room only counts once the batch is written or dropped
+        async with self._space:
+            self._space.notify_all()
+        return len(batch) - len(failed)
+
+    def _sync_events(self):
+        self._full_batch.clear()
+        if self.rows:
+            self._oldest = self._oldest or time.monotonic()
+            self._has_rows.set()
+            if len(self.rows) >= self.max_batch:
+                self._full_batch.set()
+        else:
+            self._oldest = None
+            self._has_rows.clear()
+
+    async def _write(self, batch: List[Row]) -> List[Row]:
+        """Write with retries; returns the rows that still failed"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.flush_fn(batch)
+                self.stats["flushes"] += 1
+                self.stats["flushed_rows"] += len(batch)
+                return []
+            except Exception as e:
+                self.stats["failed_flushes"] += 1
+                self._last_error = e
+                if self.is_bad_row is not None and self.is_bad_row(e):
+                    return await self._split(batch, e)
+                logger.warning(
+                    f"{self.name} flush of {len(batch)} rows failed "
+                    f"(attempt {attempt + 1}): {e}"
+                )
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(0.5 * 2**attempt, 5.0))
+
+        logger.error(f"{self.name}: {len(batch)} rows still failing after retries")
+        return batch
+
+    async def _split(self, batch: List[Row], error: Exception) -> List[Row]:
+        """Isolate the row(s) the database rejected; write the rest"""
+        if len(batch) == 1:
+            self.stats["bad_rows"] += 1
+            logger.error(f"{self.name}: rejected row {batch[0]!r}: {error}")
+            await self._drop(batch, error)
+            return []
+        self.stats["split_flushes"] += 1
+        middle = len(batch) // 2
+        return await self._write(batch[:middle]) + await self._write(batch[middle:])
+
+    async def _drop(self, rows: List[Row], error: Optional[Exception]):
+        self.stats["dropped_rows"] += len(rows)
+        logger.error(f"{self.name}: dropped {len(rows)} rows: {error}")
+        if self.on_drop is None:
+            return
+        try:
+            await self.on_drop(rows, error)
+        except Exception as e:
+            logger.error(f"{self.name}: on_drop failed for {len(rows)} rows: {e}")
+
+    async def flush(self):
+        """Flush everything queued right now"""
+        while self.rows:
+            await self._flush_batch()
+
+    async def close(self):
+        """Stop accepting rows and flush what is left (app shutdown)"""
+        self._closing = True
+        if self._task is not None:
+            # Let an in-flight flush finish instead of cancelling it mid-batch
+            self._has_rows.set()
+            self._full_batch.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "max_pending": self.max_pending,
+            "max_batch": self.max_batch,
+        }
+
+
+def create_write_buffer_from_env(
+    name: str,
+    flush: FlushFn,
+    prefix: str,
+    is_bad_row: Optional[BadRowCheck] = None,
+    on_drop: Optional[DropFn] = None,
+) -> WriteBuffer:
+    """Build a buffer from <prefix>BATCH / DELAY / MAX_PENDING env vars"""
+    return WriteBuffer(
+        name,
+        flush,
+        max_batch=int(os.getenv(f"{prefix}BATCH", "200")),
+        max_delay=float(os.getenv(f"{prefix}DELAY", "0.25")),
+        max_pending=int(os.getenv(f"{prefix}MAX_PENDING", "5000")),
+        is_bad_row=is_bad_row,
+        on_drop=on_drop,
+    )
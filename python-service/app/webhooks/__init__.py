@@ -7,13 +7,21 @@ Sistema completo de Webhooks para notificações event-driven
 Features:
 - Webhook registration e management
 - Event dispatching assíncrono
-- Retry automático com exponential backoff
+- Retry automático com exponential backoff (agendado no log persistente)
 - Signature verification (HMAC)
+- Corpo do evento serializado uma única vez (orjson se disponível) e
+  HMAC incremental sobre o prefixo compartilhado
+- Formato do corpo: JSON compacto em UTF-8 (sem espaços, não-ASCII sem
+  escape), não mais o json.dumps padrão. Receptores devem validar a
+  assinatura sobre o corpo bruto, nunca re-serializando o JSON
 - Event types e filtering
-- Delivery queue com priority
+- Delivery queue com limite de concorrência por host; cada envio roda
+  como task própria sob um limite global (um host lento não prende workers)
+- Entrega em lote opcional (vários eventos num único POST assinado)
 - Rate limiting
 - Webhook health monitoring
 - Delivery history e analytics
+- Log de entregas persistente (SQLite), at-least-once com visibility timeout
 
 Autor: SyncAds AI Team
 Versão: 2.0.0
@@ -22,21 +30,55 @@ Data: 2025-01-15
 """
 
 import asyncio
+import base64
 import hashlib
 import hmac
 import json
 import logging
+import os
 import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
 from uuid import uuid4
 
 import httpx
 
+from app.services.tracing import current_traceparent, inject, parse_traceparent, tracer
+
+from .store import DeliveryStore
+from .timer_wheel import TimerWheel
+
 logger = logging.getLogger("omnibrain.webhooks")
 
+# Encoder JSON rápido (opcional)
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """
+    JSON compacto em UTF-8 (orjson quando disponível)
+
+    orjson e o fallback json produzem JSON equivalente, mas não
+    necessariamente os mesmos bytes (floats, datetimes): a assinatura
+    vale para os bytes efetivamente enviados.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # tipos que o orjson não serializa: cai no json
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
 
 # ============================================
 # ENUMS
@@ -129,6 +171,15 @@ class WebhookConfig:
     rate_limit: Optional[int] = None  # requests per minute
     rate_limit_window: int = 60  # seconds
 
+    # Batching (opt-in): eventos acumulados até batch_max_size ou até
+    # batch_max_latency segundos e entregues num único POST
+    batch_max_size: int = 1  # 1 = sem batching
+    batch_max_latency: float = 1.0  # seconds
+
+    @property
+    def batching(self) -> bool:
+        return self.batch_max_size > 1
+
     def should_trigger(self, event: WebhookEvent, payload: Dict) -> bool:
         """Verifica se webhook deve ser disparado para este evento"""
         if self.status != WebhookStatus.ACTIVE:
@@ -145,6 +196,42 @@ class WebhookConfig:
 
         return True
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa para persistência"""
+        return {
+            "id": self.id,
+            "url": self.url,
+            "events": [e.value for e in self.events],
+            "secret": self.secret,
+            "status": self.status.value,
+            "description": self.description,
+            "headers": self.headers,
+            "timeout": self.timeout,
+            "max_retries": self.max_retries,
+            "retry_delay": self.retry_delay,
+            "filters": self.filters,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "last_delivery": self.last_delivery.isoformat() if self.last_delivery else None,
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "rate_limit": self.rate_limit,
+            "rate_limit_window": self.rate_limit_window,
+            "batch_max_size": self.batch_max_size,
+            "batch_max_latency": self.batch_max_latency,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WebhookConfig":
+        """Reconstrói a partir de to_dict()"""
+        data = dict(data)
+        data["events"] = [WebhookEvent(e) for e in data["events"]]
+        data["status"] = WebhookStatus(data["status"])
+        for key in ("created_at", "updated_at", "last_delivery"):
+            if data.get(key):
+                data[key] = datetime.fromisoformat(data[key])
+        return cls(**data)
+
 
 @dataclass
 class WebhookPayload:
@@ -163,6 +250,45 @@ class WebhookPayload:
     api_version: str = "2.0"
     retry_count: int = 0
 
+    # Corpo serializado até `"retry_count":` (cache, ver encode)
+    _prefix: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    # HMAC do prefixo por secret (cache, ver sign)
+    _macs: Dict[str, Any] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def encode(self, retry_count: Optional[int] = None) -> bytes:
+        """
+        Corpo JSON do evento
+
+        O evento é serializado uma única vez e compartilhado por todos os
+        inscritos e tentativas; só o retry_count (último campo) é anexado
+        por tentativa.
+        """
+        if self._prefix is None:
+            head = self.to_dict()
+            del head["retry_count"]
+            self._prefix = dumps_bytes(head)[:-1] + b',"retry_count":'
+        count = self.retry_count if retry_count is None else retry_count
+        return self._prefix + str(count).encode() + b"}"
+
+    def sign(self, secret: str, retry_count: Optional[int] = None) -> Tuple[bytes, str]:
+        """
+        Corpo JSON e sua assinatura HMAC-SHA256
+
+        O HMAC do prefixo compartilhado é calculado uma vez por secret;
+        cada inscrito/tentativa copia esse estado e só processa o sufixo
+        (retry_count).
+        """
+        body = self.encode(retry_count)
+        mac = self._macs.get(secret)
+        if mac is None:
+            mac = hmac.new(secret.encode(), self._prefix, hashlib.sha256)
+            self._macs[secret] = mac
+        mac = mac.copy()
+        mac.update(body[len(self._prefix):])
+        return body, mac.hexdigest()
+
     def to_dict(self) -> Dict[str, Any]:
         """Converte para dicionário"""
         return {
@@ -176,6 +302,20 @@ class WebhookPayload:
             "retry_count": self.retry_count,
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WebhookPayload":
+        """Reconstrói a partir de to_dict()"""
+        return cls(
+            event=WebhookEvent(data["event"]),
+            event_id=data["event_id"],
+            timestamp=datetime.fromisoformat(data["timestamp"]),
+            data=data.get("data") or {},
+            task_id=data.get("task_id"),
+            user_id=data.get("user_id"),
+            api_version=data.get("api_version", "2.0"),
+            retry_count=data.get("retry_count", 0),
+        )
+
 
 @dataclass
 class WebhookDelivery:
@@ -205,6 +345,117 @@ class WebhookDelivery:
     # Retry
     next_retry_at: Optional[datetime] = None
 
+    # Trace de origem (W3C traceparent capturado no dispatch)
+    traceparent: Optional[str] = None
+
+    # Desde quando (epoch) a entrega está pronta para envio, para medir queue lag
+    enqueued_at: Optional[float] = None
+
+    def to_record(self) -> Dict[str, Any]:
+        """Linha do DeliveryStore"""
+        created = self.created_at.timestamp()
+        return {
+            "id": self.id,
+            "webhook_id": self.webhook_id,
+            "event": self.event.value,
+            "url": self.url,
+            "payload": self.payload.encode().decode(),
+            "traceparent": self.traceparent,
+            "status": self.status.value,
+            "attempt": self.attempt,
+            "max_attempts": self.max_attempts,
+            "created_at": created,
+            "available_at": self.next_retry_at.timestamp() if self.next_retry_at else created,
+        }
+
+    @classmethod
+    def from_record(
+        cls,
+        record: Dict[str, Any],
+        payloads: Optional[Dict[str, WebhookPayload]] = None,
+    ) -> "WebhookDelivery":
+        """
+        Reconstrói a partir de uma linha do DeliveryStore
+
+        `payloads` (texto do payload -> WebhookPayload) permite que as
+        entregas do mesmo evento compartilhem o payload já decodificado.
+        """
+
+        def ts(key: str) -> Optional[datetime]:
+            value = record.get(key)
+            return datetime.fromtimestamp(value) if value is not None else None
+
+        status = DeliveryStatus(record["status"])
+        return cls(
+            id=record["id"],
+            webhook_id=record["webhook_id"],
+            event=WebhookEvent(record["event"]),
+            payload=_decode_payload(record["payload"], payloads),
+            status=status,
+            url=record["url"],
+            attempt=record["attempt"],
+            max_attempts=record["max_attempts"],
+            created_at=ts("created_at"),
+            sent_at=ts("sent_at"),
+            completed_at=ts("completed_at"),
+            status_code=record.get("status_code"),
+            response_body=record.get("response_body"),
+            error=record.get("error"),
+            next_retry_at=ts("available_at") if status == DeliveryStatus.RETRY else None,
+            traceparent=record.get("traceparent"),
+            enqueued_at=record.get("available_at"),
+        )
+
+
+def _decode_payload(
+    text: str, cache: Optional[Dict[str, WebhookPayload]] = None
+) -> WebhookPayload:
+    if cache is None:
+        return WebhookPayload.from_dict(json.loads(text))
+    payload = cache.get(text)
+    if payload is None:
+        payload = cache[text] = WebhookPayload.from_dict(json.loads(text))
+    return payload
+
+
+@dataclass
+class WebhookBatch:
+    """Lote de entregas para o mesmo webhook (um único POST assinado)"""
+
+    id: str
+    webhook_id: str
+    url: str
+    deliveries: List[WebhookDelivery] = field(default_factory=list)
+
+    @property
+    def status(self) -> DeliveryStatus:
+        return self.deliveries[0].status if self.deliveries else DeliveryStatus.PENDING
+
+    def encode(self) -> bytes:
+        """
+        Corpo do POST: eventos na ordem de chegada
+
+        Cada evento reaproveita o corpo já serializado do payload e recebe
+        o delivery_id (receptores deduplicam, at-least-once).
+        """
+        head = dumps_bytes(
+            {
+                "event": "batch",
+                "batch_id": self.id,
+                "timestamp": datetime.now().isoformat(),
+                "api_version": "2.0",
+                "count": len(self.deliveries),
+            }
+        )
+        events = b",".join(
+            d.payload.encode(d.attempt - 1)[:-1]
+            + b',"delivery_id":'
+            + dumps_bytes(d.id)
+            + b"}"
+            for d in self.deliveries
+        )
+        return head[:-1] + b',"events":[' + events + b"]}"
+
 
 # ============================================
 # WEBHOOK MANAGER
@@ -212,20 +463,26 @@ class WebhookDelivery:
 
 
 class WebhookManager:
-    """Gerenciador de webhooks"""
+    """
+    Gerenciador de webhooks
+
+    Configurações e entregas ficam no DeliveryStore; `deliveries` guarda
+    apenas as entregas reivindicadas por este processo (em andamento).
+    `subscriptions` indexa os webhooks por tipo de evento, para que o
+    dispatch só avalie quem assina o evento.
+    """
 
-    def __init__(self):
+    def __init__(self, store: Optional[DeliveryStore] = None):
+        self.store = store or DeliveryStore()
         self.webhooks: Dict[str, WebhookConfig] = {}
+        self.subscriptions: Dict[WebhookEvent, Dict[str, WebhookConfig]] = {}
         self.deliveries: Dict[str, WebhookDelivery] = {}
         self.queue: asyncio.Queue = asyncio.Queue()
 
-        # Stats
-        self.stats = {
-            "total_sent": 0,
-            "total_success": 0,
-            "total_failed": 0,
-            "total_retries": 0,
-        }
+        for config in self.store.load_webhooks():
+            webhook = WebhookConfig.from_dict(config)
+            self.webhooks[webhook.id] = webhook
+            self._index(webhook)
 
         logger.info("WebhookManager initialized")
 
@@ -249,6 +506,8 @@ class WebhookManager:
         )
 
         self.webhooks[webhook_id] = webhook
+        self._index(webhook)
+        self.persist(webhook)
         logger.info(f"Webhook registered: {webhook_id} -> {url}")
 
         return webhook
@@ -259,11 +518,18 @@ class WebhookManager:
         if not webhook:
             return None
 
+        if "events" in kwargs:
+            self._unindex(webhook)
+
         for key, value in kwargs.items():
             if hasattr(webhook, key):
                 setattr(webhook, key, value)
 
+        if "events" in kwargs:
+            self._index(webhook)
+
         webhook.updated_at = datetime.now()
+        self.persist(webhook)
         logger.info(f"Webhook updated: {webhook_id}")
 
         return webhook
@@ -271,7 +537,8 @@ class WebhookManager:
     def delete(self, webhook_id: str) -> bool:
         """Remove um webhook"""
         if webhook_id in self.webhooks:
-            del self.webhooks[webhook_id]
+            self._unindex(self.webhooks.pop(webhook_id))
+            self.store.delete_webhook(webhook_id)
             logger.info(f"Webhook deleted: {webhook_id}")
             return True
         return False
@@ -280,6 +547,26 @@ class WebhookManager:
         """Busca webhook por ID"""
         return self.webhooks.get(webhook_id)
 
+    def subscribers(self, event: WebhookEvent, data: Dict[str, Any]) -> List[WebhookConfig]:
+        """Webhooks que devem receber o evento (só os inscritos são avaliados)"""
+        return [
+            webhook
+            for webhook in self.subscriptions.get(event, {}).values()
+            if webhook.should_trigger(event, data)
+        ]
+
+    def _index(self, webhook: WebhookConfig):
+        for event in webhook.events:
+            self.subscriptions.setdefault(event, {})[webhook.id] = webhook
+
+    def _unindex(self, webhook: WebhookConfig):
+        for event in webhook.events:
+            subscribed = self.subscriptions.get(event)
+            if subscribed is not None:
+                subscribed.pop(webhook.id, None)
+                if not subscribed:
+                    del self.subscriptions[event]
+
     def list(self, status: Optional[WebhookStatus] = None) -> List[WebhookConfig]:
         """Lista todos os webhooks"""
         if status:
@@ -294,59 +581,280 @@ class WebhookManager:
         """Resume um webhook pausado"""
         return self.update(webhook_id, status=WebhookStatus.ACTIVE) is not None
 
+    def persist(self, webhook: WebhookConfig):
+        """Grava configuração (e contadores) do webhook no store"""
+        self.store.save_webhook(webhook.id, webhook.to_dict())
+
+    def get_delivery(self, delivery_id: str) -> Optional[WebhookDelivery]:
+        """Entrega em andamento ou registrada no log"""
+        delivery = self.deliveries.get(delivery_id)
+        if delivery:
+            return delivery
+        record = self.store.get(delivery_id)
+        return WebhookDelivery.from_record(record) if record else None
+
+    def list_deliveries(
+        self,
+        webhook_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+    ) -> Tuple[List[WebhookDelivery], Optional[str]]:
+        """
+        Histórico de entregas de um webhook (mais recentes primeiro)
+
+        Retorna a página e o cursor da próxima (None na última). Cursor
+        inválido levanta ValueError.
+        """
+        before = decode_delivery_cursor(cursor) if cursor else None
+        records = self.store.list_for_webhook(webhook_id, limit + 1, before, offset)
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            last = records[-1]
+            next_cursor = encode_delivery_cursor(last["created_at"], last["id"])
+        return [WebhookDelivery.from_record(r) for r in records], next_cursor
+
+    def delivery_stats(self, webhook_id: Optional[str] = None) -> Dict[str, int]:
+        """Contadores incrementais de entregas (de um webhook ou de todos)"""
+        return self.store.stats(webhook_id)
+
     def _generate_secret(self) -> str:
         """Gera secret para webhook"""
         return hmac.new(uuid4().bytes, uuid4().bytes, hashlib.sha256).hexdigest()
 
     def get_statistics(self) -> Dict[str, Any]:
-        """Retorna estatísticas de webhooks"""
+        """Retorna estatísticas de webhooks (contadores do store, sem varrer o log)"""
+        totals = self.store.stats()
         return {
-            **self.stats,
+            "total_sent": totals["attempts"],
+            "total_success": totals["success"],
+            "total_failed": totals["failed"],
+            "total_retries": totals["retries"],
             "total_webhooks": len(self.webhooks),
             "active_webhooks": len(
                 [w for w in self.webhooks.values() if w.status == WebhookStatus.ACTIVE]
             ),
-            "total_deliveries": len(self.deliveries),
+            "total_deliveries": totals["total"],
+            "stored_deliveries": totals["stored"],
+            "in_flight_deliveries": len(self.deliveries),
         }
 
 
+def encode_delivery_cursor(created_at: float, delivery_id: str) -> str:
+    """Cursor opaco de paginação: posição (created_at, id) no histórico"""
+    raw = json.dumps([created_at, delivery_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_delivery_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, delivery_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(created_at), str(delivery_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
 # ============================================
 # WEBHOOK DISPATCHER
 # ============================================
 
 
-class WebhookDispatcher:
-    """Dispatcher de webhooks com retry e queue"""
+class HostLane:
+    """
+    Entregas de um host de destino
+
+    Cada host tem seu próprio pool de conexões e limite de entregas
+    simultâneas. As entregas esperam em `pending` sem ocupar um worker
+    e a lane entra na fila de lanes prontas enquanto tiver vaga, então
+    um endpoint lento não trava os demais.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        limit: int,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.host = host
+        self.limit = limit
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.pending: Deque[WebhookDelivery] = deque()
+        self.queued = False  # está na fila de lanes prontas
+        self.client = httpx.AsyncClient(
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=limit, max_keepalive_connections=limit
+            ),
+            transport=transport,
+        )
+
+        # Stats
+        self.delivered = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.max_in_flight = 0
 
-    def __init__(self, manager: WebhookManager):
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.limit
+
+    def idle_for(self, now: float) -> float:
+        """Segundos sem entrega pendente/em andamento (0 se ativa)"""
+        if self.in_flight or self.pending or self.queued:
+            return 0.0
+        return now - self.last_used
+
+    def get_statistics(self) -> Dict[str, Any]:
+        attempts = self.delivered + self.failed
+        return {
+            "in_flight": self.in_flight,
+            "pending": len(self.pending),
+            "limit": self.limit,
+            "max_in_flight": self.max_in_flight,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "avg_latency_ms": round(self.total_latency / attempts * 1000, 2)
+            if attempts
+            else 0.0,
+        }
+
+
+class WebhookDispatcher:
+    """
+    Dispatcher de webhooks com retry e queue
+
+    Um pump reivindica entregas prontas no DeliveryStore (com lease de
+    `visibility_timeout`) e as passa para a queue em memória; um router
+    distribui a queue nas HostLanes (uma por host, com limite de
+    concorrência per_host_limit) e N workers atendem as lanes prontas em
+    rodízio, um item por vez. O worker só dispara o envio: cada POST roda
+    como task própria sob o limite global `max_in_flight`, então um host
+    lento ocupa no máximo per_host_limit envios e nunca um worker.
+    Lanes ociosas por `lane_idle_timeout` são descartadas (com o pool de
+    conexões). O lease das entregas em posse do processo é renovado até o
+    ack; se o processo morrer, elas voltam a ficar visíveis quando o
+    lease expira.
+
+    Timers (retry vencendo, latência máxima de lote) ficam num único
+    TimerWheel avançado por um task, em vez de um timer por entrega.
+    """
+
+    def __init__(
+        self,
+        manager: WebhookManager,
+        workers: int = 8,
+        per_host_limit: int = 4,
+        visibility_timeout: float = 120.0,
+        retention_seconds: float = 72 * 3600,
+        poll_interval: float = 1.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        max_in_flight: int = 256,
+        lane_idle_timeout: float = 300.0,
+    ):
         self.manager = manager
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.transport = transport  # testes/load test: receptor em processo
+        self.store = manager.store
+        self.workers = workers
+        self.per_host_limit = per_host_limit
+        self.max_in_flight = max_in_flight
+        self.lane_idle_timeout = lane_idle_timeout
+        self.visibility_timeout = visibility_timeout
+        self.retention_seconds = retention_seconds
+        self.poll_interval = poll_interval
+        self.prefetch = max(workers * 4, 256)
+        self.lanes: Dict[str, HostLane] = {}
+        self.batches: Dict[str, WebhookBatch] = {}
+        self.timers = TimerWheel()
+        # Payloads decodificados por texto: inscritos do mesmo evento e
+        # retries compartilham o corpo já serializado (FIFO limitado)
+        self._payloads: "OrderedDict[str, WebhookPayload]" = OrderedDict()
+        self.payload_cache_size = 1024
         self.running = False
-        self.worker_task = None
+        self.worker_tasks: List[asyncio.Task] = []
+        self.router_task: Optional[asyncio.Task] = None
+        self.pump_task: Optional[asyncio.Task] = None
+        self.timer_task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._timers_changed = asyncio.Event()
+        # Lanes com entrega pendente e vaga (rodízio entre hosts)
+        self._ready: "asyncio.Queue[HostLane]" = asyncio.Queue()
+        # Envios em andamento (tasks) e vagas globais para novos envios
+        self._sends: Set[asyncio.Task] = set()
+        self._send_slots = asyncio.Semaphore(max_in_flight)
+        self._last_lane_sweep = time.monotonic()
+        self.lanes_evicted = 0
+
+        # Queue lag (segundos) das entregas mais recentes
+        self.lag_samples: Deque[float] = deque(maxlen=1000)
+        self.max_lag = 0.0
 
-        logger.info("WebhookDispatcher initialized")
+        logger.info(
+            f"WebhookDispatcher initialized (workers={workers}, per_host_limit={per_host_limit})"
+        )
 
     async def start(self):
-        """Inicia worker de processamento"""
+        """Inicia pool de workers"""
         if self.running:
             return
 
         self.running = True
-        self.worker_task = asyncio.create_task(self._process_queue())
-        logger.info("WebhookDispatcher started")
+        self.worker_tasks = [
+            asyncio.create_task(self._process_lanes(), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+        self.router_task = asyncio.create_task(self._route_queue(), name="webhook-router")
+        self.pump_task = asyncio.create_task(self._pump(), name="webhook-pump")
+        self.timer_task = asyncio.create_task(self._run_timers(), name="webhook-timers")
+        logger.info(f"WebhookDispatcher started ({self.workers} workers)")
 
     async def stop(self):
-        """Para worker"""
+        """
+        Para workers e fecha pools de conexão
+
+        Entregas ainda não confirmadas continuam no store e são
+        retomadas (após o lease) na próxima inicialização.
+        """
         self.running = False
-        if self.worker_task:
-            self.worker_task.cancel()
-            try:
-                await self.worker_task
-            except asyncio.CancelledError:
-                pass
-        await self.client.aclose()
+        tasks = self.worker_tasks + [
+            task for task in (self.router_task, self.pump_task, self.timer_task) if task
+        ]
+        tasks += list(self._sends)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._sends.clear()
+        self._send_slots = asyncio.Semaphore(self.max_in_flight)
+        self.worker_tasks = []
+        self.router_task = None
+        self.pump_task = None
+        self.timer_task = None
+        self.timers = TimerWheel()
+        self._payloads.clear()
+        self.batches.clear()
+        self.manager.deliveries.clear()
+        while not self.manager.queue.empty():
+            self.manager.queue.get_nowait()
+
+        self._ready = asyncio.Queue()
+
+        for lane in self.lanes.values():
+            await lane.client.aclose()
+        self.lanes.clear()
         logger.info("WebhookDispatcher stopped")
 
+    def _lane_for(self, url: str) -> HostLane:
+        """HostLane do destino (criada sob demanda)"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}".lower()
+        lane = self.lanes.get(host)
+        if lane is None:
+            lane = HostLane(host, self.per_host_limit, self.transport)
+            self.lanes[host] = lane
+        return lane
+
     async def dispatch(
         self,
         event: WebhookEvent,
@@ -366,19 +874,15 @@ class WebhookDispatcher:
         )
 
         # Encontrar webhooks que devem ser notificados
-        webhooks_to_notify = [
-            webhook
-            for webhook in self.manager.webhooks.values()
-            if webhook.should_trigger(event, data)
-        ]
+        webhooks_to_notify = self.manager.subscribers(event, data)
 
         if not webhooks_to_notify:
             logger.debug(f"No webhooks registered for event: {event.value}")
             return
 
-        # Adicionar à queue
-        for webhook in webhooks_to_notify:
-            delivery = WebhookDelivery(
+        # Gravar no log persistente; o pump entrega
+        deliveries = [
+            WebhookDelivery(
                 id=str(uuid4()),
                 webhook_id=webhook.id,
                 event=event,
@@ -386,113 +890,448 @@ class WebhookDispatcher:
                 status=DeliveryStatus.PENDING,
                 url=webhook.url,
                 max_attempts=webhook.max_retries,
+                traceparent=current_traceparent(),
             )
-
-            self.manager.deliveries[delivery.id] = delivery
-            await self.manager.queue.put(delivery)
+            for webhook in webhooks_to_notify
+        ]
+        await asyncio.to_thread(self.store.enqueue, [d.to_record() for d in deliveries])
+        self._wake.set()
 
         logger.info(
             f"Dispatched event {event.value} to {len(webhooks_to_notify)} webhooks"
         )
 
-    async def _process_queue(self):
-        """Processa queue de webhooks"""
+    async def _pump(self):
+        """Reivindica entregas prontas no store, renova leases e aplica retenção"""
+        last_renew = last_purge = time.monotonic()
+
         while self.running:
             try:
-                # Pegar próximo delivery da queue
-                delivery = await asyncio.wait_for(self.manager.queue.get(), timeout=1.0)
+                self._wake.clear()
+                capacity = self.prefetch - len(self.manager.deliveries)
+                records = await asyncio.to_thread(
+                    self.store.claim, capacity, self.visibility_timeout
+                )
+                for record in records:
+                    delivery = WebhookDelivery.from_record(record, self._payloads)
+                    self.manager.deliveries[delivery.id] = delivery
+                    self.manager.queue.put_nowait(delivery)
+                while len(self._payloads) > self.payload_cache_size:
+                    self._payloads.popitem(last=False)
+
+                now = time.monotonic()
+                if now - last_renew >= self.visibility_timeout / 3:
+                    await asyncio.to_thread(
+                        self.store.extend_leases,
+                        list(self.manager.deliveries),
+                        self.visibility_timeout,
+                    )
+                    last_renew = now
+                if now - last_purge >= 300:
+                    await asyncio.to_thread(self.store.purge, self.retention_seconds)
+                    last_purge = now
+
+                # Acordado por dispatch, ack ou retry vencido (TimerWheel);
+                # o poll cobre leases expirados e retries de outros processos
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error claiming webhook deliveries: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run_timers(self):
+        """Único task de timers: avança o TimerWheel e dispara os vencidos"""
+        while self.running:
+            try:
+                self._timers_changed.clear()
+                deadline = self.timers.next_deadline()
+                timeout = None if deadline is None else max(0.0, deadline - time.time())
+                try:
+                    await asyncio.wait_for(self._timers_changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                for kind, key in self.timers.advance():
+                    if kind == "batch":
+                        self._flush_batch(key)
+                    else:  # retry: a entrega já está no store com available_at
+                        self._wake.set()
 
-                # Processar
-                await self._send_webhook(delivery)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error running webhook timers: {e}")
+
+    def _schedule_timer(self, key: Tuple[str, str], deadline: float):
+        self.timers.schedule(key, deadline)
+        self._timers_changed.set()
 
+    async def _ack(
+        self, deliveries: List[WebhookDelivery], webhook: Optional[WebhookConfig]
+    ):
+        """Persiste o resultado da tentativa e libera as entregas deste processo"""
+        outcomes = []
+        for delivery in deliveries:
+            retry = delivery.status == DeliveryStatus.RETRY
+            outcomes.append(
+                {
+                    "id": delivery.id,
+                    "webhook_id": delivery.webhook_id,
+                    "status": delivery.status.value,
+                    "attempt": delivery.attempt,
+                    "available_at": delivery.next_retry_at.timestamp() if retry else None,
+                    "sent_at": delivery.sent_at.timestamp() if delivery.sent_at else None,
+                    "status_code": delivery.status_code,
+                    "response_body": delivery.response_body,
+                    "error": delivery.error,
+                }
+            )
+        await asyncio.to_thread(self.store.record_outcomes, outcomes)
+        if webhook is not None:
+            await asyncio.to_thread(self.manager.persist, webhook)
+
+        for delivery in deliveries:
+            self.manager.deliveries.pop(delivery.id, None)
+            if delivery.status == DeliveryStatus.RETRY:
+                self._schedule_timer(
+                    ("retry", delivery.id), delivery.next_retry_at.timestamp()
+                )
+        self._wake.set()
+
+    def _add_to_batch(self, webhook: WebhookConfig, delivery: WebhookDelivery):
+        """Acumula a entrega no lote do webhook; fecha por tamanho ou latência"""
+        batch = self.batches.get(webhook.id)
+        if batch is None:
+            batch = WebhookBatch(id=str(uuid4()), webhook_id=webhook.id, url=webhook.url)
+            self.batches[webhook.id] = batch
+
+            # Latência máxima contada desde que o primeiro evento ficou pronto
+            ready_since = delivery.enqueued_at or time.time()
+            self._schedule_timer(
+                ("batch", webhook.id), ready_since + webhook.batch_max_latency
+            )
+
+        batch.deliveries.append(delivery)
+        if len(batch.deliveries) >= webhook.batch_max_size:
+            self._flush_batch(webhook.id)
+
+    def _flush_batch(self, webhook_id: str):
+        """Fecha o lote e o coloca na queue como uma única entrega"""
+        self.timers.cancel(("batch", webhook_id))
+        batch = self.batches.pop(webhook_id, None)
+        if batch and batch.deliveries:
+            self.manager.queue.put_nowait(batch)
+
+    async def _route_queue(self):
+        """Router: move a queue para lotes ou para a lane do host"""
+        while self.running:
+            await self._evict_idle_lanes()
+            try:
+                # Pegar próximo delivery (ou lote fechado) da queue
+                delivery = await asyncio.wait_for(self.manager.queue.get(), timeout=1.0)
             except asyncio.TimeoutError:
                 continue
+
+            try:
+                if isinstance(delivery, WebhookDelivery):
+                    webhook = self.manager.get(delivery.webhook_id)
+                    if webhook and webhook.batching:
+                        self._add_to_batch(webhook, delivery)
+                        continue
+
+                lane = self._lane_for(delivery.url)
+                lane.pending.append(delivery)
+                self._mark_ready(lane)
+
             except Exception as e:
                 logger.error(f"Error processing webhook queue: {e}")
 
-    async def _send_webhook(self, delivery: WebhookDelivery):
-        """Envia webhook"""
-        webhook = self.manager.get(delivery.webhook_id)
-        if not webhook:
-            logger.warning(f"Webhook not found: {delivery.webhook_id}")
+    async def _evict_idle_lanes(self):
+        """Descarta lanes (e seus pools de conexão) sem uso recente"""
+        now = time.monotonic()
+        if now - self._last_lane_sweep < min(60.0, self.lane_idle_timeout):
             return
+        self._last_lane_sweep = now
+        idle = [
+            host
+            for host, lane in self.lanes.items()
+            if lane.idle_for(now) >= self.lane_idle_timeout
+        ]
+        for host in idle:
+            # Só o router cria lanes e põe entregas nelas: nada chega no meio
+            lane = self.lanes.pop(host)
+            self.lanes_evicted += 1
+            try:
+                await lane.client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing webhook client for {host}: {e}")
+
+    def _mark_ready(self, lane: HostLane):
+        """Põe a lane no fim da fila de lanes prontas (uma vez só)"""
+        if lane.pending and not lane.saturated and not lane.queued:
+            lane.queued = True
+            self._ready.put_nowait(lane)
+
+    async def _process_lanes(self):
+        """
+        Worker: dispara um item da próxima lane pronta
+
+        O envio roda como task própria (sob `max_in_flight`), então o
+        worker volta na hora para a fila de lanes prontas. Depois de tirar
+        um item a lane volta para o fim dessa fila, então os hosts com
+        backlog se alternam e um host novo não espera envio nenhum.
+        """
+        while self.running:
+            # Vaga global antes da lane: o item só sai da lane se puder ir
+            await self._send_slots.acquire()
+            try:
+                lane = await asyncio.wait_for(self._ready.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                self._send_slots.release()
+                continue
 
-        delivery.status = DeliveryStatus.SENDING
-        delivery.sent_at = datetime.now()
-
+            lane.queued = False
+            if not lane.pending or lane.saturated:
+                self._send_slots.release()
+                continue
+            self._start_send(lane, lane.pending.popleft())
+
+    def _start_send(self, lane: HostLane, delivery: Union[WebhookDelivery, WebhookBatch]):
+        """Conta o envio na lane (já, antes da task rodar) e dispara a task"""
+        lane.in_flight += 1
+        lane.max_in_flight = max(lane.max_in_flight, lane.in_flight)
+        self._mark_ready(lane)
+        task = asyncio.create_task(
+            self._run_lane(lane, delivery), name=f"webhook-send-{lane.host}"
+        )
+        self._sends.add(task)
+        task.add_done_callback(self._send_done)
+
+    def _send_done(self, task: asyncio.Task):
+        self._sends.discard(task)
+        self._send_slots.release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error delivering webhook: {task.exception()}")
+
+    async def _run_lane(self, lane: HostLane, delivery: Union[WebhookDelivery, WebhookBatch]):
+        """Entrega um item já contado em lane.in_flight"""
+        self._record_lag(delivery)
+        start = time.monotonic()
         try:
-            # Preparar payload
-            payload_dict = delivery.payload.to_dict()
-            payload_json = json.dumps(payload_dict)
+            await self._send_webhook(delivery, lane.client)
+        finally:
+            lane.in_flight -= 1
+            lane.last_used = time.monotonic()
+            lane.total_latency += time.monotonic() - start
+            if delivery.status == DeliveryStatus.SUCCESS:
+                lane.delivered += 1
+            else:
+                lane.failed += 1
+            self._mark_ready(lane)
+
+    def _record_lag(self, item: Union[WebhookDelivery, WebhookBatch]):
+        now = time.time()
+        for delivery in item.deliveries if isinstance(item, WebhookBatch) else [item]:
+            if delivery.enqueued_at is None:
+                continue
+            lag = max(0.0, now - delivery.enqueued_at)
+            self.lag_samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
 
-            # Gerar signature
-            signature = self._generate_signature(payload_json, webhook.secret)
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue lag, entregas em andamento e estado por host"""
+        samples = sorted(self.lag_samples)
+
+        def pct(p: float) -> float:
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p / 100 * len(samples)))]
+
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "per_host_limit": self.per_host_limit,
+            "max_in_flight": self.max_in_flight,
+            "sends": len(self._sends),
+            "lanes_evicted": self.lanes_evicted,
+            "queue_size": self.manager.queue.qsize(),
+            "claimed": len(self.manager.deliveries),
+            "scheduled_timers": len(self.timers),
+            "open_batches": {
+                webhook_id: len(batch.deliveries)
+                for webhook_id, batch in self.batches.items()
+            },
+            "in_flight": sum(lane.in_flight for lane in self.lanes.values()),
+            "pending_on_hosts": sum(len(lane.pending) for lane in self.lanes.values()),
+            "queue_lag_seconds": {
+                "last": self.lag_samples[-1] if self.lag_samples else 0.0,
+                "p50": pct(50),
+                "p95": pct(95),
+                "max": self.max_lag,
+            },
+            "hosts": {
+                host: lane.get_statistics() for host, lane in self.lanes.items()
+            },
+        }
+
+    async def _send_webhook(
+        self,
+        delivery: Union[WebhookDelivery, WebhookBatch],
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        """Envia webhook ou lote (span filho do trace que disparou o evento)"""
+        deliveries = delivery.deliveries if isinstance(delivery, WebhookBatch) else [delivery]
+        first = deliveries[0]
+
+        with tracer.span(
+            "webhook.deliver",
+            kind="client",
+            parent=parse_traceparent(first.traceparent),
+            attributes={
+                "webhook_id": delivery.webhook_id,
+                "delivery_id": delivery.id,
+                "event": first.event.value,
+                "attempt": first.attempt,
+                "batch_size": len(deliveries),
+            },
+        ) as span:
+            webhook = self.manager.get(delivery.webhook_id)
+            if webhook is None:
+                logger.warning(f"Webhook not found: {delivery.webhook_id}")
+                for d in deliveries:
+                    d.status = DeliveryStatus.CANCELLED
+                    d.error = "Webhook not found"
+            else:
+                await self._deliver(
+                    delivery, webhook, client or self._lane_for(delivery.url).client
+                )
+            await self._ack(deliveries, webhook)
+
+            if span:
+                span.set_attribute("status_code", first.status_code)
+                if first.status != DeliveryStatus.SUCCESS:
+                    span.status = "error"
+                    span.error = first.error
+
+    async def _deliver(
+        self,
+        delivery: Union[WebhookDelivery, WebhookBatch],
+        webhook: WebhookConfig,
+        client: httpx.AsyncClient,
+    ):
+        """Um POST assinado para a entrega (ou lote); resultado aplicado a cada evento"""
+        batch = isinstance(delivery, WebhookBatch)
+        deliveries = delivery.deliveries if batch else [delivery]
+
+        now = datetime.now()
+        for d in deliveries:
+            d.status = DeliveryStatus.SENDING
+            d.sent_at = now
+
+        status_code: Optional[int] = None
+        response_text: Optional[str] = None
+        error: Optional[str] = None
+
+        try:
+            # Corpo serializado (e prefixo assinado) uma vez por evento;
+            # só retry_count varia
+            if batch:
+                body = delivery.encode()
+                signature = self._generate_signature(body, webhook.secret)
+            else:
+                body, signature = delivery.payload.sign(
+                    webhook.secret, delivery.attempt - 1
+                )
 
             # Headers
             headers = {
                 "Content-Type": "application/json",
                 "X-Webhook-Signature": signature,
-                "X-Webhook-Event": delivery.event.value,
+                "X-Webhook-Event": "batch" if batch else delivery.event.value,
                 "X-Webhook-Delivery": delivery.id,
-                "X-Webhook-Attempt": str(delivery.attempt),
+                "X-Webhook-Attempt": str(max(d.attempt for d in deliveries)),
                 **webhook.headers,
             }
+            if batch:
+                headers["X-Webhook-Batch-Size"] = str(len(deliveries))
+            inject(headers)
 
             # Enviar request
-            response = await self.client.post(
+            response = await client.post(
                 webhook.url,
-                content=payload_json,
+                content=body,
                 headers=headers,
                 timeout=webhook.timeout,
             )
 
-            delivery.status_code = response.status_code
-            delivery.response_body = response.text[:1000]  # Limitar tamanho
+            status_code = response.status_code
+            response_text = response.text[:1000]  # Limitar tamanho
 
             # Verificar sucesso
-            if 200 <= response.status_code < 300:
-                delivery.status = DeliveryStatus.SUCCESS
-                delivery.completed_at = datetime.now()
+            if not 200 <= response.status_code < 300:
+                raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
 
-                webhook.success_count += 1
-                webhook.last_delivery = datetime.now()
-                self.manager.stats["total_success"] += 1
+            logger.info(
+                f"Webhook delivered successfully: {delivery.id} -> {webhook.url}"
+                + (f" ({len(deliveries)} events)" if batch else "")
+            )
 
-                logger.info(
-                    f"Webhook delivered successfully: {delivery.id} -> {webhook.url}"
-                )
+        except Exception as e:
+            error = str(e)
+            logger.warning(
+                f"Webhook delivery {delivery.id} failed"
+                + (f" ({len(deliveries)} events)" if batch else "")
+                + f": {e}"
+            )
 
-            else:
-                raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
+        for d in deliveries:
+            self._apply_result(d, webhook, status_code, response_text, error)
 
-        except Exception as e:
-            delivery.error = str(e)
-            delivery.completed_at = datetime.now()
+    def _apply_result(
+        self,
+        delivery: WebhookDelivery,
+        webhook: WebhookConfig,
+        status_code: Optional[int],
+        response_text: Optional[str],
+        error: Optional[str],
+    ):
+        """Atualiza entrega, contadores e agenda retry conforme o resultado"""
+        delivery.status_code = status_code
+        delivery.response_body = response_text
+        delivery.completed_at = datetime.now()
+
+        if error is None:
+            delivery.status = DeliveryStatus.SUCCESS
+            webhook.success_count += 1
+            webhook.last_delivery = datetime.now()
+
+        else:
+            delivery.error = error
 
             # Verificar se deve fazer retry
             if delivery.attempt < delivery.max_attempts:
                 delivery.status = DeliveryStatus.RETRY
-                delivery.attempt += 1
-                delivery.payload.retry_count += 1
+                delivery.attempt += 1  # retry_count no corpo = attempt - 1
 
                 # Calcular próximo retry (exponential backoff)
                 retry_delay = webhook.retry_delay * (2 ** (delivery.attempt - 1))
                 delivery.next_retry_at = datetime.now() + timedelta(seconds=retry_delay)
 
-                # Re-adicionar à queue após delay
-                asyncio.create_task(self._schedule_retry(delivery, retry_delay))
-
+                # Reentrega agendada pelo timestamp persistido (ver _ack)
                 webhook.failure_count += 1
-                self.manager.stats["total_retries"] += 1
 
-                logger.warning(
-                    f"Webhook delivery failed (retry {delivery.attempt}/{delivery.max_attempts}): {e}"
+                logger.debug(
+                    f"Webhook delivery {delivery.id} retry {delivery.attempt}/{delivery.max_attempts} in {retry_delay}s"
                 )
 
             else:
                 delivery.status = DeliveryStatus.FAILED
                 webhook.failure_count += 1
-                self.manager.stats["total_failed"] += 1
 
                 # Verificar se deve desabilitar webhook
                 if webhook.failure_count >= 10:
@@ -502,26 +1341,21 @@ class WebhookDispatcher:
                     )
 
                 logger.error(
-                    f"Webhook delivery failed permanently: {delivery.id} -> {e}"
+                    f"Webhook delivery failed permanently: {delivery.id} -> {error}"
                 )
 
-        self.manager.stats["total_sent"] += 1
-
-    async def _schedule_retry(self, delivery: WebhookDelivery, delay: int):
-        """Agenda retry de webhook"""
-        await asyncio.sleep(delay)
-        await self.manager.queue.put(delivery)
-
-    def _generate_signature(self, payload: str, secret: str) -> str:
-        """Gera HMAC signature para payload"""
-        return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    def _generate_signature(self, payload: Union[str, bytes], secret: str) -> str:
+        """Gera HMAC signature para payload (direto sobre os bytes já serializados)"""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        return hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
 
     @staticmethod
-    def verify_signature(payload: str, signature: str, secret: str) -> bool:
+    def verify_signature(payload: Union[str, bytes], signature: str, secret: str) -> bool:
         """Verifica signature de webhook"""
-        expected = hmac.new(
-            secret.encode(), payload.encode(), hashlib.sha256
-        ).hexdigest()
+        if isinstance(payload, str):
+            payload = payload.encode()
+        expected = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
         return hmac.compare_digest(expected, signature)
 
 
@@ -548,32 +1382,63 @@ class WebhookReceiver:
 
         return decorator
 
-    async def process(self, payload: Dict, signature: str) -> bool:
-        """Processa webhook recebido"""
+    async def process(
+        self,
+        payload: Union[bytes, str, Dict],
+        signature: str,
+        raw_body: Optional[bytes] = None,
+    ) -> bool:
+        """
+        Processa webhook recebido
+
+        A assinatura cobre os bytes exatos do corpo, então a verificação
+        precisa do corpo bruto: passe o próprio corpo (request.body()) como
+        `payload`, ou o dict já decodificado junto com `raw_body`. Um dict
+        sem `raw_body` não é aceito: reserializar o JSON não reproduz os
+        bytes assinados (ValueError).
+        """
+        if isinstance(payload, (bytes, str)):
+            raw_body = payload if raw_body is None else raw_body
+            payload = None
+        elif raw_body is None:
+            raise ValueError("raw_body é obrigatório para verificar a assinatura")
+
         # Verificar signature
-        payload_json = json.dumps(payload, sort_keys=True)
-        if not WebhookDispatcher.verify_signature(payload_json, signature, self.secret):
+        if not WebhookDispatcher.verify_signature(raw_body, signature, self.secret):
             logger.warning("Invalid webhook signature")
             return False
 
-        # Extrair evento
-        event_str = payload.get("event")
-        try:
-            event = WebhookEvent(event_str)
-        except ValueError:
-            logger.warning(f"Unknown event type: {event_str}")
-            return False
+        if payload is None:
+            try:
+                payload = json.loads(raw_body)
+            except ValueError:
+                logger.warning("Webhook body is not valid JSON")
+                return False
+
+        # Lote: cada evento vai para seus handlers
+        events = payload.get("events", []) if payload.get("event") == "batch" else [payload]
 
-        # Executar handlers
-        handlers = self.handlers.get(event, [])
-        for handler in handlers:
+        for item in events:
+            # Extrair evento
+            event_str = item.get("event")
             try:
-                if asyncio.iscoroutinefunction(handler):
-                    await handler(payload)
-                else:
-                    handler(payload)
-            except Exception as e:
-                logger.error(f"Error in webhook handler: {e}")
+                event = WebhookEvent(event_str)
+            except ValueError:
+                logger.warning(f"Unknown event type: {event_str}")
+                if len(events) == 1:
+                    return False
+                continue
+
+            # Executar handlers
+            handlers = self.handlers.get(event, [])
+            for handler in handlers:
+                try:
+                    if asyncio.iscoroutinefunction(handler):
+                        await handler(item)
+                    else:
+                        handler(item)
+                except Exception as e:
+                    logger.error(f"Error in webhook handler: {e}")
 
         return True
 
@@ -591,7 +1456,8 @@ def get_webhook_manager() -> WebhookManager:
     """Retorna instância singleton do manager"""
     global _webhook_manager
     if _webhook_manager is None:
-        _webhook_manager = WebhookManager()
+        store = DeliveryStore(os.getenv("WEBHOOK_STORE_PATH", "data/webhooks.db"))
+        _webhook_manager = WebhookManager(store)
     return _webhook_manager
 
 
@@ -600,7 +1466,15 @@ def get_webhook_dispatcher() -> WebhookDispatcher:
     global _webhook_dispatcher
     if _webhook_dispatcher is None:
         manager = get_webhook_manager()
-        _webhook_dispatcher = WebhookDispatcher(manager)
+        _webhook_dispatcher = WebhookDispatcher(
+            manager,
+            workers=int(os.getenv("WEBHOOK_WORKERS", "8")),
+            per_host_limit=int(os.getenv("WEBHOOK_HOST_CONCURRENCY", "4")),
+            max_in_flight=int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "256")),
+            lane_idle_timeout=float(os.getenv("WEBHOOK_LANE_IDLE_TIMEOUT", "300")),
+            visibility_timeout=float(os.getenv("WEBHOOK_VISIBILITY_TIMEOUT", "120")),
+            retention_seconds=float(os.getenv("WEBHOOK_RETENTION_HOURS", "72")) * 3600,
+        )
     return _webhook_dispatcher
 
 
@@ -632,7 +1506,13 @@ __all__ = [
     "WebhookConfig",
     "WebhookPayload",
     "WebhookDelivery",
+    "WebhookBatch",
     "WebhookManager",
+    "encode_delivery_cursor",
+    "decode_delivery_cursor",
+    "DeliveryStore",
+    "HostLane",
+    "TimerWheel",
     "WebhookDispatcher",
     "WebhookReceiver",
     "get_webhook_manager",
@@ -0,0 +1,412 @@
+"""
+============================================
+SYNCADS OMNIBRAIN - WEBHOOK DELIVERY STORE
+============================================
+Log persistente de entregas de webhook (SQLite)
+
+- Semântica at-least-once: uma entrega só sai do log quando recebe
+  ack (success/failed definitivo). Entregas em andamento ficam com
+  lease (visibility timeout); se o processo morrer, o lease expira e a
+  entrega volta a ser reivindicada.
+- Retries agendados por timestamp persistido (available_at), não por
+  asyncio.sleep, então sobrevivem a deploys.
+- Política de retenção: entregas finalizadas são removidas depois de
+  `retention_seconds`.
+- Configuração dos webhooks também é persistida, para que entregas
+  recuperadas após restart ainda tenham destino e secret.
+- Histórico por webhook em ordem de criação com paginação keyset
+  (created_at, id) e contadores por webhook mantidos incrementalmente
+  na mesma transação das escritas (delivery_stats), então estatísticas
+  não varrem o log.
+
+A API é síncrona e thread-safe; o dispatcher chama via asyncio.to_thread.
+Timestamps são epoch seconds (time.time()).
+============================================
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("omnibrain.webhooks.store")
+
+# Status que ainda aguardam entrega
+OPEN_STATUSES = ("pending", "retry")
+FINAL_STATUSES = ("success", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id TEXT PRIMARY KEY,
+    webhook_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    traceparent TEXT,
+    status TEXT NOT NULL,
+    attempt INTEGER NOT NULL DEFAULT 1,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    sent_at REAL,
+    completed_at REAL,
+    status_code INTEGER,
+    response_body TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries(status, available_at);
+CREATE INDEX IF NOT EXISTS idx_deliveries_lease ON deliveries(status, lease_until);
+CREATE INDEX IF NOT EXISTS idx_deliveries_completed ON deliveries(completed_at)
+    WHERE completed_at IS NOT NULL;
+DROP INDEX IF EXISTS idx_deliveries_webhook;
+CREATE INDEX IF NOT EXISTS idx_deliveries_webhook_time
+    ON deliveries(webhook_id, created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS delivery_stats (
+    webhook_id TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    stored INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    success INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    retries INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS webhooks (
+    id TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# total: entregas criadas; stored: ainda no log (total - removidas pela
+# retenção); attempts: POSTs feitos; retries: tentativas que falharam e
+# foram reagendadas
+STAT_FIELDS = ("total", "stored", "attempts", "success", "failed", "cancelled", "retries")
+
+_COLUMNS = (
+    "id",
+    "webhook_id",
+    "event",
+    "url",
+    "payload",
+    "traceparent",
+    "status",
+    "attempt",
+    "max_attempts",
+    "created_at",
+    "available_at",
+    "lease_until",
+    "sent_at",
+    "completed_at",
+    "status_code",
+    "response_body",
+    "error",
+)
+
+
+class DeliveryStore:
+    """Log de entregas em SQLite (WAL) com leases e retenção"""
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        has_stats = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'delivery_stats'"
+        ).fetchone()
+        self._conn.executescript(_SCHEMA)
+        if not has_stats:
+            self._backfill_stats()
+
+        logger.info(f"DeliveryStore opened: {path}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _backfill_stats(self):
+        """Contadores a partir do log existente (bancos anteriores a delivery_stats)"""
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO delivery_stats
+                    (webhook_id, total, stored, attempts, success, failed, cancelled, retries)
+                SELECT webhook_id, COUNT(*), COUNT(*),
+                       SUM(CASE WHEN sent_at IS NOT NULL THEN attempt ELSE 0 END),
+                       SUM(status = 'success'), SUM(status = 'failed'),
+                       SUM(status = 'cancelled'), SUM(attempt - 1)
+                FROM deliveries GROUP BY webhook_id
+                """
+            )
+
+    def _bump_stats(self, conn: sqlite3.Connection, deltas: Dict[str, Dict[str, int]]):
+        """Soma `deltas` (webhook_id -> campo -> delta) em delivery_stats"""
+        for webhook_id, fields in deltas.items():
+            names = [name for name in STAT_FIELDS if fields.get(name)]
+            if not names:
+                continue
+            conn.execute(
+                f"""
+                INSERT INTO delivery_stats (webhook_id, {', '.join(names)})
+                VALUES (?, {', '.join('?' for _ in names)})
+                ON CONFLICT(webhook_id) DO UPDATE SET
+                    {', '.join(f'{name} = {name} + excluded.{name}' for name in names)}
+                """,
+                [webhook_id, *(fields[name] for name in names)],
+            )
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT (rollback em erro), serializado pelo lock"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # ------------------------------------------
+    # DELIVERIES
+    # ------------------------------------------
+
+    def enqueue(self, records: Iterable[Dict[str, Any]]):
+        """Grava novas entregas (status pending) numa única transação"""
+        rows = []
+        for record in records:
+            row = {column: record.get(column) for column in _COLUMNS}
+            row["status"] = row["status"] or "pending"
+            row["available_at"] = row["available_at"] or row["created_at"]
+            rows.append(row)
+
+        insert = (
+            f"INSERT OR IGNORE INTO deliveries ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' for _ in _COLUMNS)})"
+        )
+        deltas: Dict[str, Dict[str, int]] = {}
+        with self._transaction() as conn:
+            for row in rows:
+                if conn.execute(insert, [row[column] for column in _COLUMNS]).rowcount:
+                    counters = deltas.setdefault(row["webhook_id"], {"total": 0, "stored": 0})
+                    counters["total"] += 1
+                    counters["stored"] += 1
+            self._bump_stats(conn, deltas)
+
+    def claim(
+        self, limit: int, visibility_timeout: float, now: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Reivindica até `limit` entregas prontas
+
+        Prontas = pending/retry com available_at vencido, ou 'sending'
+        com lease expirado (processo anterior morreu no meio da entrega).
+        """
+        if limit <= 0:
+            return []
+        now = now or time.time()
+
+        with self._transaction() as conn:
+            rows = conn.execute(
+                """
+                SELECT * FROM deliveries
+                WHERE (status IN ('pending', 'retry') AND available_at <= ?)
+                   OR (status = 'sending' AND lease_until <= ?)
+                ORDER BY available_at
+                LIMIT ?
+                """,
+                (now, now, limit),
+            ).fetchall()
+
+            if rows:
+                conn.executemany(
+                    "UPDATE deliveries SET status = 'sending', lease_until = ? WHERE id = ?",
+                    [(now + visibility_timeout, row["id"]) for row in rows],
+                )
+
+        claimed = [dict(row) for row in rows]
+        for record in claimed:
+            record["lease_until"] = now + visibility_timeout
+        return claimed
+
+    def extend_leases(self, ids: List[str], visibility_timeout: float):
+        """Renova o lease das entregas ainda em posse deste processo"""
+        if not ids:
+            return
+        until = time.time() + visibility_timeout
+        with self._transaction():
+            self._conn.executemany(
+                "UPDATE deliveries SET lease_until = ? WHERE id = ? AND status = 'sending'",
+                [(until, delivery_id) for delivery_id in ids],
+            )
+
+    def record_outcomes(self, outcomes: List[Dict[str, Any]]):
+        """
+        Ack de várias tentativas numa única transação
+
+        Cada item: id, webhook_id, status, attempt, sent_at, status_code,
+        response_body, error. status 'retry' volta para a fila a partir
+        de `available_at`; os demais são finais (success, failed,
+        cancelled). Os contadores de delivery_stats são atualizados na
+        mesma transação.
+        """
+        now = time.time()
+        retries = [o for o in outcomes if o["status"] == "retry"]
+        finals = [o for o in outcomes if o["status"] != "retry"]
+
+        deltas: Dict[str, Dict[str, int]] = {}
+        for o in outcomes:
+            counters = deltas.setdefault(o["webhook_id"], {})
+            name = "retries" if o["status"] == "retry" else o["status"]
+            counters[name] = counters.get(name, 0) + 1
+            if o.get("sent_at") is not None:
+                counters["attempts"] = counters.get("attempts", 0) + 1
+
+        with self._transaction() as conn:
+            self._bump_stats(conn, deltas)
+            if finals:
+                self._conn.executemany(
+                    """
+                    UPDATE deliveries
+                    SET status = ?, attempt = ?, sent_at = ?, completed_at = ?,
+                        status_code = ?, response_body = ?, error = ?, lease_until = NULL
+                    WHERE id = ?
+                    """,
+                    [
+                        (o["status"], o["attempt"], o.get("sent_at"), now, o.get("status_code"),
+                         o.get("response_body"), o.get("error"), o["id"])
+                        for o in finals
+                    ],
+                )
+            if retries:
+                self._conn.executemany(
+                    """
+                    UPDATE deliveries
+                    SET status = 'retry', attempt = ?, available_at = ?,
+                        sent_at = ?, status_code = ?, response_body = ?, error = ?,
+                        lease_until = NULL
+                    WHERE id = ?
+                    """,
+                    [
+                        (o["attempt"], o["available_at"], o.get("sent_at"),
+                         o.get("status_code"), o.get("response_body"), o.get("error"), o["id"])
+                        for o in retries
+                    ],
+                )
+
+    def purge(self, retention_seconds: float, now: Optional[float] = None) -> int:
+        """Remove entregas finalizadas há mais de `retention_seconds`"""
+        cutoff = (now or time.time()) - retention_seconds
+        with self._transaction() as conn:
+            removed = conn.execute(
+                """
+                SELECT webhook_id, COUNT(*) FROM deliveries
+                WHERE completed_at IS NOT NULL AND completed_at < ?
+                GROUP BY webhook_id
+                """,
+                (cutoff,),
+            ).fetchall()
+            cursor = conn.execute(
+                "DELETE FROM deliveries WHERE completed_at IS NOT NULL AND completed_at < ?",
+                (cutoff,),
+            )
+            self._bump_stats(conn, {row[0]: {"stored": -row[1]} for row in removed})
+        if cursor.rowcount:
+            logger.info(f"Purged {cursor.rowcount} webhook deliveries older than {retention_seconds:.0f}s")
+        return cursor.rowcount
+
+    def get(self, delivery_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM deliveries WHERE id = ?", (delivery_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list_for_webhook(
+        self,
+        webhook_id: str,
+        limit: int = 50,
+        before: Optional[Tuple[float, str]] = None,
+        offset: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Entregas de um webhook, mais recentes primeiro
+
+        Paginação keyset: `before` é o (created_at, id) da última entrega
+        da página anterior; a consulta segue o índice
+        (webhook_id, created_at, id) sem pular linhas. `offset` continua
+        aceito para clientes antigos.
+        """
+        query = "SELECT * FROM deliveries WHERE webhook_id = ?"
+        params: List[Any] = [webhook_id]
+        if before is not None:
+            query += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            params += [before[0], before[0], before[1]]
+        query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self, webhook_id: Optional[str] = None) -> Dict[str, int]:
+        """Contadores de um webhook (ou a soma de todos), sem varrer o log"""
+        with self._lock:
+            if webhook_id is None:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(f'SUM({name})' for name in STAT_FIELDS)} FROM delivery_stats"
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {', '.join(STAT_FIELDS)} FROM delivery_stats WHERE webhook_id = ?",
+                    (webhook_id,),
+                ).fetchone()
+        values = tuple(row) if row else (0,) * len(STAT_FIELDS)
+        return {name: value or 0 for name, value in zip(STAT_FIELDS, values)}
+
+    def counts(self) -> Dict[str, int]:
+        """Número de entregas por status (varre o log; use stats() em dashboards)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM deliveries GROUP BY status"
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    # ------------------------------------------
+    # WEBHOOK CONFIGS
+    # ------------------------------------------
+
+    def save_webhook(self, webhook_id: str, config: Dict[str, Any]):
+        with self._transaction():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO webhooks (id, config, updated_at) VALUES (?, ?, ?)",
+                (webhook_id, json.dumps(config), time.time()),
+            )
+
+    def delete_webhook(self, webhook_id: str):
+        with self._transaction():
+            self._conn.execute("DELETE FROM webhooks WHERE id = ?", (webhook_id,))
+
+    def load_webhooks(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT config FROM webhooks").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+__all__ = ["DeliveryStore", "OPEN_STATUSES", "FINAL_STATUSES", "STAT_FIELDS"]
@@ -0,0 +1,165 @@
+"""
+============================================
+SYNCADS OMNIBRAIN - HIERARCHICAL TIMER WHEEL
+============================================
+Timer wheel hierárquico para timers do dispatcher de webhooks
+
+Milhares de retries/lotes agendados não viram milhares de tasks
+dormindo: todos os timers ficam numa única estrutura e um único task
+avança a roda.
+
+- schedule/cancel em O(1) (slot calculado pelo deadline)
+- `levels` níveis de `slots` posições; o nível 0 tem resolução `tick`,
+  cada nível acima cobre `slots` vezes o anterior. Quando o nível 0 dá a
+  volta, o slot correspondente do nível de cima é redistribuído
+  (cascade) para os níveis de baixo.
+- Deadlines além do horizonte ficam no último nível e são recolocados
+  a cada volta até ficarem ao alcance.
+
+A estrutura é síncrona e não thread-safe (uso dentro do event loop).
+Deadlines são epoch seconds (time.time()), como `available_at` do store.
+============================================
+"""
+
+import math
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TimerWheel:
+    """Timer wheel hierárquico (hashed) com cancelamento por chave"""
+
+    def __init__(
+        self,
+        tick: float = 0.01,
+        slots: int = 64,
+        levels: int = 4,
+        now: Optional[float] = None,
+    ):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._current = int((now if now is not None else time.time()) / tick)
+        self._wheels: List[List[Dict[Hashable, int]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._where: Dict[Hashable, Tuple[int, int]] = {}
+        self._due: Dict[Hashable, int] = {}  # já vencidos, saem no próximo advance
+        self._horizon = slots**levels - 1
+
+    def __len__(self) -> int:
+        return len(self._where) + len(self._due)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where or key in self._due
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Agenda (ou reagenda) `key` para `deadline`"""
+        self.cancel(key)
+        self._place(key, math.ceil(deadline / self.tick))
+
+    def cancel(self, key: Hashable) -> bool:
+        if self._due.pop(key, None) is not None:
+            return True
+        position = self._where.pop(key, None)
+        if position is None:
+            return False
+        level, slot = position
+        del self._wheels[level][slot][key]
+        return True
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """Avança até `now` e retorna as chaves vencidas (em ordem de deadline)"""
+        target = int((now if now is not None else time.time()) / self.tick)
+        expired: List[Tuple[int, Hashable]] = [
+            (expiry, key) for key, expiry in self._due.items()
+        ]
+        self._due.clear()
+
+        while self._current < target:
+            # Pula direto para o próximo tick com trabalho (slot ou cascade)
+            upcoming = self._next_tick()
+            if upcoming is None or upcoming > target:
+                self._current = target
+                break
+            self._current = max(self._current + 1, upcoming)
+
+            # Fim de volta no nível L-1: redistribui o slot do nível L
+            span = 1
+            for level in range(1, self.levels):
+                span *= self.slots
+                if self._current % span:
+                    break
+                self._cascade(level, (self._current // span) % self.slots)
+
+            bucket = self._wheels[0][self._current % self.slots]
+            if bucket:
+                for key, expiry in bucket.items():
+                    del self._where[key]
+                    expired.append((expiry, key))
+                bucket.clear()
+
+        # Cascade pode ter movido chaves vencidas para _due
+        expired.extend((expiry, key) for key, expiry in self._due.items())
+        self._due.clear()
+        expired.sort(key=lambda item: item[0])
+        return [key for _, key in expired]
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        Próximo instante em que `advance` tem trabalho
+
+        Para níveis acima de 0 é o instante do cascade do slot (<= deadline
+        real das chaves); o chamador só precisa acordar e chamar advance.
+        """
+        if self._due:
+            return self._current * self.tick
+        upcoming = self._next_tick()
+        return upcoming * self.tick if upcoming is not None else None
+
+    def _next_tick(self) -> Optional[int]:
+        if not self._where:
+            return None
+
+        best: Optional[int] = None
+        span = 1
+        for level in range(self.levels):
+            base = self._current // span
+            for offset in range(1, self.slots + 1):
+                if self._wheels[level][(base + offset) % self.slots]:
+                    candidate = (base + offset) * span
+                    if best is None or candidate < best:
+                        best = candidate
+                    break
+            span *= self.slots
+        return best
+
+    def _place(self, key: Hashable, expiry: int):
+        delta = expiry - self._current
+        if delta <= 0:
+            self._due[key] = expiry
+            return
+
+        delta = min(delta, self._horizon)
+        position = self._current + delta
+        span = 1
+        for level in range(self.levels):
+            if delta < span * self.slots or level == self.levels - 1:
+                slot = (position // span) % self.slots
+                self._wheels[level][slot][key] = expiry
+                self._where[key] = (level, slot)
+                return
+            span *= self.slots
+
+    def _cascade(self, level: int, slot: int):
+        bucket = self._wheels[level][slot]
+        if not bucket:
+            return
+        entries = list(bucket.items())
+        bucket.clear()
+        for key, expiry in entries:
+            del self._where[key]
+            self._place(key, expiry)
+
+
+__all__ = ["TimerWheel"]
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+============================================
+SYNCADS - DOM EXTRACTION BENCHMARK
+============================================
+Extração por element handles x um único evaluate na página
+
+Uma página fixture local (gerada, carregada com `page.set_content`) tem
+`--products` cards de produto e um formulário de checkout. Cenários:
+
+- browser_service.scrape_products: seletores explícitos (container,
+  name, price, image, link)
+- scraping.scrape_products: detecção automática do container + campos
+  com seletores alternativos (routers/scraping.py)
+- browser_service.detect_checkout_form: padrões de campos de pagamento
+
+Variantes:
+- per_element: implementação antiga — query_selector / inner_text /
+  get_attribute por produto e por campo
+- single_evaluate: app/services/dom_extraction.py (um evaluate)
+
+Por cenário e variante: tempo mediano, chamadas Playwright (round trips
+CDP) e se o resultado é idêntico ao da implementação antiga.
+
+Requer Playwright + Chromium (`playwright install chromium`).
+Resultados são gravados em JSONL (benchmarks/results/dom_extraction.jsonl).
+
+Uso:
+    python benchmarks/dom_extraction_benchmark.py
+    python benchmarks/dom_extraction_benchmark.py --products 500 --runs 10
+============================================
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.routers.scraping import (  # noqa: E402
+    PRODUCT_CONTAINER_SELECTORS,
+    PRODUCT_NAME_SELECTORS,
+    PRODUCT_PRICE_SELECTORS,
+    product_card_spec,
+)
+from app.services.browser_service import CHECKOUT_FIELD_PATTERNS  # noqa: E402
+from app.services.dom_extraction import (  # noqa: E402
+    detect_form_fields,
+    extract_items,
+    product_spec,
+)
+
+DEFAULT_RESULTS = SERVICE_DIR / "benchmarks" / "results" / "dom_extraction.jsonl"
+
+PRODUCT_SELECTORS = {
+    "container": ".product-item",
+    "name": ".product-name",
+    "price": ".product-price",
+    "image": "img",
+    "link": "a",
+}
+
+
+# ============================================
+# FIXTURE
+# ============================================
+
+
+def fixture_html(products: int) -> str:
+    """Página de coleção com N produtos + formulário de checkout"""
+    cards = "\n".join(
+        f"""<div class="product-item">
+  <a href="/products/item-{i}"><img src="/img/{i}.jpg" alt="Produto {i}"></a>
+  <h3 class="product-name"> Produto {i} </h3>
+  <span class="product-price">R$ {i},90</span>
+</div>"""
+        for i in range(products)
+    )
+    return f"""<!doctype html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Coleção</title></head>
+<body>
+<main class="grid">{cards}</main>
+<form id="checkout">
+  <input type="email" name="email" placeholder="E-mail" required>
+  <input name="address" autocomplete="street-address">
+  <input name="city" autocomplete="address-level2">
+  <input name="zip" autocomplete="postal-code">
+  <input name="card_number" autocomplete="cc-number" placeholder="card number">
+  <input name="expiry" autocomplete="cc-exp" placeholder="MM/YY">
+  <input name="cvv" autocomplete="cc-csc">
+</form>
+</body></html>"""
+
+
+# ============================================
+# CALL COUNTING
+# ============================================
+
+
+class Counted:
+    """Proxy que conta cada chamada Playwright (um round trip CDP cada)"""
+
+    def __init__(self, target, stats: Dict[str, int]):
+        self._target = target
+        self._stats = stats
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            self._stats["calls"] += 1
+            result = await attr(*args, **kwargs)
+            if isinstance(result, list):
+                return [Counted(item, self._stats) for item in result]
+            if result is not None and hasattr(result, "query_selector"):
+                return Counted(result, self._stats)
+            return result
+
+        return call
+
+
+# ============================================
+# LEGACY (per element)
+# ============================================
+
+
+async def legacy_scrape_products(page, product_selectors: Dict[str, str]) -> List[Dict]:
+    """BrowserService.scrape_products antes do evaluate único"""
+    products = await page.query_selector_all(product_selectors.get("container", ".product"))
+    scraped = []
+    for product in products:
+        data = {}
+        for field, selector in product_selectors.items():
+            if field == "container":
+                continue
+            element = await product.query_selector(selector)
+            if field == "image":
+                if element:
+                    data["image"] = await element.get_attribute("src")
+            elif field == "link":
+                if element:
+                    data["url"] = await element.get_attribute("href")
+            elif element:
+                data[field] = (await element.inner_text()).strip()
+        if data:
+            scraped.append(data)
+    return scraped
+
+
+async def legacy_router_products(page, max_products: int) -> List[Dict]:
+    """routers/scraping.py scrape_products + extract_product_data antigos"""
+    elements = []
+    for selector in PRODUCT_CONTAINER_SELECTORS:
+        elements = await page.query_selector_all(selector)
+        if elements:
+            break
+
+    products = []
+    for element in elements[:max_products]:
+        product = {}
+        for selector in PRODUCT_NAME_SELECTORS:
+            name_el = await element.query_selector(selector)
+            if name_el:
+                product["name"] = await name_el.inner_text()
+                break
+        for selector in PRODUCT_PRICE_SELECTORS:
+            price_el = await element.query_selector(selector)
+            if price_el:
+                product["price"] = await price_el.inner_text()
+                break
+        img_el = await element.query_selector("img")
+        if img_el:
+            product["image"] = await img_el.get_attribute("src") or await img_el.get_attribute("data-src")
+        link_el = await element.query_selector("a")
+        if link_el:
+            href = await link_el.get_attribute("href")
+            if href:
+                product["link"] = href
+        if product.get("name"):
+            products.append(product)
+    return products
+
+
+async def legacy_detect_checkout(page) -> Dict[str, Any]:
+    """BrowserService.detect_checkout_form antes do evaluate único"""
+    detected = {}
+    for field_name, selectors in CHECKOUT_FIELD_PATTERNS.items():
+        for selector in selectors:
+            element = await page.query_selector(selector)
+            if element:
+                detected[field_name] = {
+                    "selector": selector,
+                    "type": await element.get_attribute("type"),
+                    "placeholder": await element.get_attribute("placeholder"),
+                    "required": await element.get_attribute("required") is not None,
+                }
+                break
+    return detected
+
+
+# ============================================
+# SCENARIOS
+# ============================================
+
+
+def scenarios(max_products: int):
+    return {
+        "browser_service.scrape_products": (
+            lambda page: legacy_scrape_products(page, PRODUCT_SELECTORS),
+            lambda page: _items(page, product_spec(PRODUCT_SELECTORS)),
+        ),
+        "scraping.scrape_products": (
+            lambda page: legacy_router_products(page, max_products),
+            lambda page: _items(page, product_card_spec(max_products)),
+        ),
+        "browser_service.detect_checkout_form": (
+            legacy_detect_checkout,
+            lambda page: detect_form_fields(page, CHECKOUT_FIELD_PATTERNS),
+        ),
+    }
+
+
+async def _items(page, spec: Dict[str, Any]) -> List[Dict]:
+    return (await extract_items(page, spec))["items"]
+
+
+async def measure(page, fn, runs: int) -> Dict[str, Any]:
+    stats = {"calls": 0}
+    counted = Counted(page, stats)
+    timings = []
+    result = None
+    for _ in range(runs):
+        stats["calls"] = 0
+        start = time.perf_counter()
+        result = await fn(counted)
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "min_ms": round(min(timings) * 1000, 2),
+        "calls": stats["calls"],
+        "result": result,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=SERVICE_DIR,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    from playwright.async_api import async_playwright
+
+    results = {}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(fixture_html(args.products))
+
+        for name, (legacy, single) in scenarios(args.products).items():
+            print(f"⏱️  {name} ({args.products} produtos, {args.runs} runs)...")
+            old = await measure(page, legacy, args.runs)
+            new = await measure(page, single, args.runs)
+            results[name] = {
+                "per_element_ms": old["median_ms"],
+                "per_element_calls": old["calls"],
+                "single_evaluate_ms": new["median_ms"],
+                "single_evaluate_calls": new["calls"],
+                "speedup": round(old["median_ms"] / max(new["median_ms"], 0.01), 1),
+                "same_result": old["result"] == new["result"],
+            }
+            print(
+                f"   per_element {old['median_ms']} ms / {old['calls']} chamadas, "
+                f"single_evaluate {new['median_ms']} ms / {new['calls']} chamadas, "
+                f"resultado igual: {results[name]['same_result']}"
+            )
+
+        await browser.close()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de extração de DOM")
+    parser.add_argument("--products", type=int, default=200, help="Produtos na página fixture")
+    parser.add_argument("--runs", type=int, default=5, help="Execuções por variante")
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    parser.add_argument("--no-store", action="store_true", help="Não grava resultados")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    results = asyncio.run(run(args))
+
+    if not args.no_store:
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "products": args.products,
+            "results": results,
+        }
+        args.results.parent.mkdir(parents=True, exist_ok=True)
+        with args.results.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    # Resultado diferente do antigo = regressão de comportamento
+    return 0 if all(r["same_result"] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+============================================
+SYNCADS - EXTENSION DAL BENCHMARK
+============================================
+Throughput dos endpoints da extensão com muitos dispositivos simultâneos
+
+Um PostgREST stub (processo próprio, latência configurável) faz o papel do
+Supabase. N dispositivos concorrentes repetem o ciclo da extensão:
+GET /commands/{device_id} (select + update para processing) e
+POST /result (update), por `--duration` segundos.
+
+Variantes:
+- sync_per_request: padrão antigo — cliente síncrono novo por request
+  (`create_client` constrói um httpx.Client) e `.execute()` bloqueando o
+  event loop
+- async_pool: handlers reais de app/routers/extension.py sobre o
+  SupabaseREST compartilhado (httpx.AsyncClient, pool keep-alive)
+
+Por variante: ciclos/s, latência p50/p95/p99 do ciclo, lag máximo do
+event loop e conexões TCP abertas no stub.
+
+Resultados são gravados em JSONL (benchmarks/results/extension_dal.jsonl).
+
+Uso:
+    python benchmarks/extension_dal_benchmark.py
+    python benchmarks/extension_dal_benchmark.py --devices 50,200,500 --latency 0.02
+============================================
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+DEFAULT_RESULTS = SERVICE_DIR / "benchmarks" / "results" / "extension_dal.jsonl"
+
+_ROW = json.dumps(
+    [{"id": "cmd-1", "type": "NAVIGATE", "status": "pending", "data": {"url": "x"}}]
+).encode()
+
+
+# ============================================
+# POSTGREST STUB
+# ============================================
+
+
+class PostgrestStub:
+    """PostgREST mínimo em processo próprio (não disputa a GIL com o loop medido)"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.url = ""
+        self._connections = multiprocessing.Value("i", 0)
+        self._port = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=self._run, daemon=True)
+
+    @property
+    def connections(self) -> int:
+        return self._connections.value
+
+    @connections.setter
+    def connections(self, value: int):
+        self._connections.value = value
+
+    def start(self) -> str:
+        self._process.start()
+        self.url = f"http://127.0.0.1:{self._port.get(timeout=10)}"
+        return self.url
+
+    def stop(self):
+        self._process.terminate()
+        self._process.join(timeout=5)
+
+    def _run(self):
+        async def serve():
+            server = await asyncio.start_server(
+                self._handle, "127.0.0.1", 0, backlog=4096
+            )
+            self._port.put(server.sockets[0].getsockname()[1])
+            await server.serve_forever()
+
+        asyncio.run(serve())
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        with self._connections.get_lock():
+            self._connections.value += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                if request_line.startswith(b"GET"):
+                    head = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    writer.write(head + b"Content-Length: %d\r\n\r\n" % len(_ROW) + _ROW)
+                else:
+                    writer.write(b"HTTP/1.1 204 No Content\r\n\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+# ============================================
+# VARIANTS
+# ============================================
+
+
+class LegacySyncAccess:
+    """Padrão antigo: cliente síncrono por request, chamadas bloqueantes"""
+
+    def __init__(self, url: str, key: str = "bench"):
+        self.base_url = f"{url}/rest/v1"
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+
+    def _client(self) -> httpx.Client:
+        return httpx.Client(base_url=self.base_url, headers=self.headers, timeout=30)
+
+    async def cycle(self, device_id: str):
+        with self._client() as client:
+            commands = client.get(
+                "/extension_commands",
+                params={"device_id": f"eq.{device_id}", "status": "eq.pending"},
+            ).json()
+            client.patch(
+                "/extension_commands",
+                params={"id": "in.(" + ",".join(c["id"] for c in commands) + ")"},
+                json={"status": "processing"},
+            )
+        with self._client() as client:
+            client.patch(
+                "/extension_commands",
+                params={"id": f"eq.{commands[0]['id']}"},
+                json={"status": "completed"},
+            )
+
+
+class AsyncPoolAccess:
+    """Handlers reais do router sobre o SupabaseREST compartilhado"""
+
+    def __init__(self):
+        from app.routers import extension
+
+        self.extension = extension
+
+    async def cycle(self, device_id: str):
+        response = await self.extension.get_commands(device_id)
+        command = response["commands"][0]
+        await self.extension.submit_result(
+            self.extension.CommandResult(
+                deviceId=device_id, commandId=command["id"], success=True
+            )
+        )
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+async def _loop_lag(stop: asyncio.Event, samples: List[float], interval: float = 0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run_variant(access, devices: int, duration: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    lags: List[float] = []
+    errors = 0
+    stop = asyncio.Event()
+    deadline = time.perf_counter() + duration
+
+    async def device(index: int):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await access.cycle(f"device-{index}")
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    monitor = asyncio.create_task(_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(device(i) for i in range(devices)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    return {
+        "devices": devices,
+        "cycles": len(latencies),
+        "cycles_per_s": round(len(latencies) / elapsed, 1),
+        "errors": errors,
+        "cycle_p50_ms": percentile(latencies, 50),
+        "cycle_p95_ms": percentile(latencies, 95),
+        "cycle_p99_ms": percentile(latencies, 99),
+        "loop_lag_max_ms": percentile(lags, 100),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=SERVICE_DIR,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from app.services.supabase_rest import get_supabase_rest
+
+    stub = PostgrestStub(args.latency)
+    url = stub.start()
+    os.environ["SUPABASE_URL"] = url
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "bench"
+    supabase = get_supabase_rest()
+
+    results = []
+    for devices in args.devices:
+        for name in ("sync_per_request", "async_pool"):
+            if name == "sync_per_request":
+                access = LegacySyncAccess(url)
+            else:
+                access = AsyncPoolAccess()
+
+            stub.connections = 0
+            print(f"⏱️  {name}: {devices} dispositivos x {args.duration}s...")
+            result = await run_variant(access, devices, args.duration)
+            await supabase.close()  # próximo estágio começa com pool vazio
+            result.update(
+                variant=name, tcp_connections=stub.connections, latency=args.latency
+            )
+            results.append(result)
+            print(
+                f"   {result['cycles_per_s']} ciclos/s, p95 {result['cycle_p95_ms']} ms, "
+                f"lag máx {result['loop_lag_max_ms']} ms, "
+                f"{result['tcp_connections']} conexões, erros {result['errors']}"
+            )
+
+    stub.stop()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do acesso Supabase da extensão")
+    parser.add_argument("--devices", default="10,50,200", help="Dispositivos concorrentes")
+    parser.add_argument("--duration", type=float, default=3.0, help="Segundos por variante")
+    parser.add_argument("--latency", type=float, default=0.01, help="Latência do stub (s)")
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    parser.add_argument("--no-store", action="store_true", help="Não grava resultados")
+    args = parser.parse_args(argv)
+    args.devices = [int(n) for n in args.devices.split(",") if n]
+
+    logging.disable(logging.WARNING)
+    results = asyncio.run(run(args))
+
+    if not args.no_store:
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "results": results,
+        }
+        args.results.parent.mkdir(parents=True, exist_ok=True)
+        with args.results.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
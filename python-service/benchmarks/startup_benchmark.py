@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+============================================
+SYNCADS - STARTUP / IMPORT-TIME BENCHMARK
+============================================
+Mede o cold start de cada entry point do python-service
+
+Para cada entry point:
+- cold import (subprocesso novo, sem cache de módulos em memória)
+- tempo até o primeiro /health 200 (uvicorn real) ou até o
+  engine ficar pronto (omnibrain: create_omnibrain_engine)
+- memória residente (RSS) depois do startup
+
+Resultados são gravados em JSONL (benchmarks/results/startup.jsonl) e
+comparados com os budgets de benchmarks/startup_budgets.json. O script
+sai com código 1 se algum budget for excedido. Cada registro guarda se
+passou nos budgets (budget_ok) e a regressão relativa é medida contra o
+último registro que passou, então uma rodada reprovada não vira baseline.
+
+Uso:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --entry app.main --runs 5
+    python benchmarks/startup_benchmark.py --no-store --budgets outro.json
+============================================
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BUDGETS = BENCH_DIR / "startup_budgets.json"
+DEFAULT_RESULTS = BENCH_DIR / "results" / "startup.jsonl"
+
+
+# ============================================
+# ENTRY POINTS
+# ============================================
+
+ENTRY_POINTS: Dict[str, Dict[str, Any]] = {
+    "app.main": {
+        "import": "app.main",
+        "server": "app.main:app",
+        "health": "/health",
+    },
+    "google_docs_api.main": {
+        "import": "google_docs_api.main",
+        "server": "google_docs_api.main:app",
+        "health": "/health",
+    },
+    "omnibrain": {
+        "import": "app.omnibrain",
+        # Sem servidor próprio: "pronto" = engine criado
+        "ready": "from app.omnibrain import create_omnibrain_engine\n"
+        "create_omnibrain_engine()",
+    },
+}
+
+# Executado no subprocesso: mede import (+ ready) e imprime JSON
+_CHILD_SCRIPT = r"""
+import json, sys, time
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+result = {"rss_before_mb": rss_mb()}
+start = time.perf_counter()
+__import__(sys.argv[1])
+result["import_seconds"] = time.perf_counter() - start
+ready = sys.argv[2] if len(sys.argv) > 2 else ""
+if ready:
+    start = time.perf_counter()
+    exec(ready, {})
+    result["ready_seconds"] = time.perf_counter() - start
+result["rss_mb"] = rss_mb()
+print("__BENCH__" + json.dumps(result))
+"""
+
+
+# ============================================
+# MEASUREMENTS
+# ============================================
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in [str(SERVICE_DIR), env.get("PYTHONPATH", "")] if p
+    )
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_import(module: str, ready: str = "", timeout: float = 300) -> Dict[str, Any]:
+    """Cold import (e opcionalmente 'ready') em subprocesso novo"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD_SCRIPT, module, ready],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        cwd=SERVICE_DIR,
+        env=_child_env(),
+    )
+    wall = time.perf_counter() - start
+
+    for line in proc.stdout.splitlines():
+        if line.startswith("__BENCH__"):
+            data = json.loads(line[len("__BENCH__") :])
+            data["process_seconds"] = wall
+            return data
+
+    error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+    raise RuntimeError(f"{module}: {error}")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _process_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def measure_health(server: str, health_path: str, timeout: float = 120) -> Dict[str, Any]:
+    """Sobe uvicorn e mede o tempo até o primeiro /health com status 200"""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{health_path}"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", server, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVICE_DIR,
+        env=_child_env(),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                error = proc.stderr.read().decode(errors="replace").strip().splitlines()
+                raise RuntimeError(f"{server} exited: {(error or ['?'])[-1]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        elapsed = time.perf_counter() - start
+                        return {
+                            "health_seconds": elapsed,
+                            "server_rss_mb": _process_rss_mb(proc.pid),
+                        }
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.02)
+        raise RuntimeError(f"{server}: /health not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def benchmark_entry(name: str, runs: int) -> Dict[str, Any]:
+    """Executa N rodadas e retorna medianas"""
+    spec = ENTRY_POINTS[name]
+    samples: Dict[str, List[float]] = {}
+
+    for _ in range(runs):
+        data = measure_import(spec["import"], spec.get("ready", ""))
+        if "server" in spec:
+            data.update(measure_health(spec["server"], spec["health"]))
+        for key, value in data.items():
+            if isinstance(value, (int, float)):
+                samples.setdefault(key, []).append(float(value))
+
+    metrics = {key: round(statistics.median(values), 4) for key, values in samples.items()}
+    # Métrica única de memória para o budget: servidor se houver, senão processo de import
+    metrics["rss_mb"] = metrics.get("server_rss_mb", metrics.get("rss_mb"))
+    return metrics
+
+
+# ============================================
+# BUDGETS / STORAGE
+# ============================================
+
+
+def check_budgets(
+    name: str,
+    metrics: Dict[str, Any],
+    budgets: Dict[str, Any],
+    previous: Optional[Dict[str, Any]],
+) -> List[str]:
+    """
+    Compara métricas com budgets absolutos e regressão relativa
+
+    budgets[name] = {"import_seconds": 2.0, ..., "max_regression_pct": 25}
+    """
+    violations = []
+    entry_budget = budgets.get(name, {})
+
+    for metric, limit in entry_budget.items():
+        if metric == "max_regression_pct":
+            continue
+        value = metrics.get(metric)
+        if value is not None and value > limit:
+            violations.append(f"{name}: {metric}={value:.3f} > budget {limit}")
+
+    max_regression = entry_budget.get("max_regression_pct", budgets.get("max_regression_pct"))
+    if previous and max_regression is not None:
+        for metric, value in metrics.items():
+            old = previous.get(metric)
+            if not old or value is None or metric.startswith("rss_before"):
+                continue
+            growth = (value - old) / old * 100
+            if growth > max_regression:
+                violations.append(
+                    f"{name}: {metric} regrediu {growth:.0f}% ({old:.3f} -> {value:.3f})"
+                )
+
+    return violations
+
+
+def load_previous(results_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Baseline por entry point: último resultado que passou nos budgets
+
+    Registros reprovados (e os antigos, gravados antes de budget_ok
+    existir) não contam: senão uma regressão vira o novo baseline e a
+    rodada seguinte passa.
+    """
+    previous: Dict[str, Dict[str, Any]] = {}
+    if not results_path.exists():
+        return previous
+
+    for line in results_path.read_text().splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("ok") and record.get("budget_ok"):
+            previous[record["entry"]] = record["metrics"]
+    return previous
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=SERVICE_DIR,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ============================================
+# MAIN
+# ============================================
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de startup/import")
+    parser.add_argument("--entry", action="append", choices=sorted(ENTRY_POINTS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budgets", type=Path, default=DEFAULT_BUDGETS)
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    parser.add_argument("--no-store", action="store_true", help="Não grava resultados")
+    args = parser.parse_args(argv)
+
+    budgets = json.loads(args.budgets.read_text()) if args.budgets.exists() else {}
+    previous = load_previous(args.results)
+    revision = _git_revision()
+    violations: List[str] = []
+    records = []
+
+    for name in args.entry or list(ENTRY_POINTS):
+        print(f"⏱️  {name} ({args.runs} runs)...")
+        record = {
+            "entry": name,
+            "timestamp": datetime.now().isoformat(),
+            "revision": revision,
+            "python": sys.version.split()[0],
+            "runs": args.runs,
+        }
+        try:
+            metrics = benchmark_entry(name, args.runs)
+            record.update({"ok": True, "metrics": metrics})
+            for key, value in sorted(metrics.items()):
+                print(f"   {key:<20} {value}")
+            entry_violations = check_budgets(name, metrics, budgets, previous.get(name))
+            record["budget_ok"] = not entry_violations
+            violations += entry_violations
+        except Exception as e:
+            record.update({"ok": False, "budget_ok": False, "error": str(e)})
+            violations.append(f"{name}: falhou ({e})")
+            print(f"   ❌ {e}")
+        records.append(record)
+
+    if not args.no_store:
+        args.results.parent.mkdir(parents=True, exist_ok=True)
+        with args.results.open("a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    if violations:
+        print("\n❌ Budget excedido:")
+        for violation in violations:
+            print(f"   - {violation}")
+        return 1
+
+    print("\n✅ Todos os budgets respeitados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
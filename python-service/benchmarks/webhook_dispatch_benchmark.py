@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+============================================
+SYNCADS - WEBHOOK DISPATCH BENCHMARK
+============================================
+Custo do dispatch e dos timers de retry com muitos webhooks registrados
+
+Cenários:
+- seleção de inscritos: varredura de todos os webhooks (should_trigger
+  em cada registro) x índice por tipo de evento (manager.subscribers)
+- dispatch completo (seleção + gravação no DeliveryStore em memória)
+- retries pendentes: uma task asyncio.sleep por retry x TimerWheel
+  (tempo para agendar e memória alocada)
+- fan-out de um evento com output grande: serializar + assinar por
+  inscrito/tentativa x corpo serializado uma vez (WebhookPayload.encode)
+
+Resultados são gravados em JSONL (benchmarks/results/webhook_dispatch.jsonl).
+
+Uso:
+    python benchmarks/webhook_dispatch_benchmark.py
+    python benchmarks/webhook_dispatch_benchmark.py --webhooks 50000 --events 5000
+    python benchmarks/webhook_dispatch_benchmark.py --fanout 1000 --payload-kb 512
+============================================
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.webhooks import (  # noqa: E402
+    ORJSON_AVAILABLE,
+    DeliveryStore,
+    TimerWheel,
+    WebhookDispatcher,
+    WebhookEvent,
+    WebhookManager,
+    WebhookPayload,
+)
+
+DEFAULT_RESULTS = SERVICE_DIR / "benchmarks" / "results" / "webhook_dispatch.jsonl"
+EVENTS = list(WebhookEvent)
+
+
+# ============================================
+# SETUP
+# ============================================
+
+
+def build_manager(webhooks: int, seed: int = 42) -> WebhookManager:
+    """Registra `webhooks` webhooks, cada um inscrito em 1-3 tipos de evento"""
+    rng = random.Random(seed)
+    manager = WebhookManager(DeliveryStore())
+    for i in range(webhooks):
+        filters = {"user_id": f"user-{i % 100}"} if i % 10 == 0 else {}
+        manager.register(
+            f"https://hooks-{i % 500}.example.com/{i}",
+            rng.sample(EVENTS, rng.randint(1, 3)),
+            filters=filters,
+        )
+    return manager
+
+
+def _event_stream(count: int, seed: int = 7) -> List[WebhookEvent]:
+    rng = random.Random(seed)
+    return [rng.choice(EVENTS) for _ in range(count)]
+
+
+# ============================================
+# SCENARIOS
+# ============================================
+
+
+def bench_selection(manager: WebhookManager, events: List[WebhookEvent]) -> Dict[str, Any]:
+    data = {"user_id": "user-1"}
+
+    start = time.perf_counter()
+    scanned = 0
+    for event in events:
+        scanned += len(
+            [w for w in manager.webhooks.values() if w.should_trigger(event, data)]
+        )
+    scan = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = 0
+    for event in events:
+        indexed += len(manager.subscribers(event, data))
+    index = time.perf_counter() - start
+
+    assert scanned == indexed, (scanned, indexed)
+    return {
+        "scan_us_per_event": round(scan / len(events) * 1e6, 2),
+        "indexed_us_per_event": round(index / len(events) * 1e6, 2),
+        "speedup": round(scan / index, 1) if index else None,
+        "avg_matches": round(indexed / len(events), 1),
+    }
+
+
+async def bench_dispatch(manager: WebhookManager, events: List[WebhookEvent]) -> Dict[str, Any]:
+    dispatcher = WebhookDispatcher(manager)  # sem start(): mede só o enqueue
+    start = time.perf_counter()
+    for event in events:
+        await dispatcher.dispatch(event, {"user_id": "user-1"})
+    elapsed = time.perf_counter() - start
+    return {
+        "dispatch_ms_per_event": round(elapsed / len(events) * 1000, 3),
+        "deliveries_enqueued": sum(manager.store.counts().values()),
+    }
+
+
+async def bench_retry_timers(retries: int) -> Dict[str, Any]:
+    rng = random.Random(1)
+    delays = [rng.uniform(5, 600) for _ in range(retries)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(asyncio.sleep(delay)) for delay in delays]
+    await asyncio.sleep(0)  # tasks iniciadas e dormindo
+    sleep_seconds = time.perf_counter() - start
+    sleep_bytes = tracemalloc.get_traced_memory()[0]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    del tasks
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    wheel = TimerWheel()
+    now = time.time()
+    for i, delay in enumerate(delays):
+        wheel.schedule(("retry", str(i)), now + delay)
+    wheel_seconds = time.perf_counter() - start
+    wheel_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        "sleep_tasks_ms": round(sleep_seconds * 1000, 1),
+        "sleep_tasks_kb": round(sleep_bytes / 1024),
+        "timer_wheel_ms": round(wheel_seconds * 1000, 1),
+        "timer_wheel_kb": round(wheel_bytes / 1024),
+        "live_tasks_wheel": 1,
+        "live_tasks_sleep": retries,
+    }
+
+
+def bench_fanout(subscribers: int, payload_kb: int, attempts: int = 2) -> Dict[str, Any]:
+    """Corpo + assinatura para `subscribers` inscritos, `attempts` tentativas cada"""
+    rows = max(1, payload_kb * 1024 // 100)
+    output = [
+        {"row": i, "sku": f"SKU-{i:06d}", "title": "Produto " * 8} for i in range(rows)
+    ]
+    secrets = [f"secret-{i}" for i in range(subscribers)]
+
+    def payload() -> WebhookPayload:
+        return WebhookPayload(
+            event=WebhookEvent.TASK_COMPLETED,
+            event_id="evt-1",
+            timestamp=datetime.now(),
+            data={"output": output},
+        )
+
+    # Antes: to_dict + json.dumps + encode por entrega e por tentativa
+    legacy = payload()
+    start = time.perf_counter()
+    for secret in secrets:
+        for attempt in range(attempts):
+            legacy.retry_count = attempt
+            body = json.dumps(legacy.to_dict()).encode()
+            hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    legacy_seconds = time.perf_counter() - start
+
+    # Agora: serializado uma vez; só retry_count anexado por tentativa
+    shared = payload()
+    start = time.perf_counter()
+    for secret in secrets:
+        for attempt in range(attempts):
+            body = shared.encode(attempt)
+            hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    shared_seconds = time.perf_counter() - start
+
+    return {
+        "subscribers": subscribers,
+        "attempts": attempts,
+        "body_kb": round(len(shared.encode()) / 1024),
+        "orjson": ORJSON_AVAILABLE,
+        "per_attempt_ms": round(legacy_seconds * 1000, 1),
+        "shared_body_ms": round(shared_seconds * 1000, 1),
+        "speedup": round(legacy_seconds / shared_seconds, 1) if shared_seconds else None,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=SERVICE_DIR,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ============================================
+# MAIN
+# ============================================
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    print(f"⏱️  Registrando {args.webhooks} webhooks...")
+    manager = build_manager(args.webhooks)
+    events = _event_stream(args.events)
+
+    results: Dict[str, Any] = {}
+    print("⏱️  Seleção de inscritos...")
+    results["selection"] = bench_selection(manager, events)
+    print("⏱️  Dispatch completo...")
+    results["dispatch"] = await bench_dispatch(manager, events[: args.dispatches])
+    print(f"⏱️  {args.retries} retries pendentes...")
+    results["retry_timers"] = await bench_retry_timers(args.retries)
+    print(f"⏱️  Fan-out para {args.fanout} inscritos ({args.payload_kb} KB)...")
+    results["fanout"] = bench_fanout(args.fanout, args.payload_kb)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de dispatch de webhooks")
+    parser.add_argument("--webhooks", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=2_000, help="Eventos na seleção")
+    parser.add_argument("--dispatches", type=int, default=200, help="Eventos no dispatch completo")
+    parser.add_argument("--retries", type=int, default=10_000)
+    parser.add_argument("--fanout", type=int, default=500, help="Inscritos do evento grande")
+    parser.add_argument("--payload-kb", type=int, default=256)
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    parser.add_argument("--no-store", action="store_true", help="Não grava resultados")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    results = asyncio.run(run(args))
+
+    for scenario, metrics in results.items():
+        print(f"\n{scenario}")
+        for key, value in metrics.items():
+            print(f"   {key:<24} {value}")
+
+    if not args.no_store:
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "webhooks": args.webhooks,
+            "results": results,
+        }
+        args.results.parent.mkdir(parents=True, exist_ok=True)
+        with args.results.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
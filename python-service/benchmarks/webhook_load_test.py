@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+============================================
+SYNCADS - WEBHOOK LOAD TEST
+============================================
+Carga no WebhookDispatcher contra receptores HTTP stub em processo
+
+- Sobe K receptores HTTP/1.1 (asyncio, keep-alive) em portas locais,
+  cada um com latência, jitter e taxa de erro (HTTP 500) configuráveis;
+  cada porta é um host distinto para as HostLanes do dispatcher.
+- Registra webhooks apontando para os receptores e chama
+  `dispatch_event` em taxas crescentes (eventos/s), um estágio por taxa.
+- Depois de cada estágio espera o log esvaziar (drain) e reporta:
+  eventos entregues/s, lag fim-a-fim (dispatch -> recebido com 2xx)
+  p50/p95/p99/max, erros HTTP injetados, retries e RSS.
+
+O dispatcher é o singleton real (get_webhook_dispatcher), configurado
+pelas mesmas variáveis de ambiente do serviço; o log vai para um
+arquivo temporário.
+
+Resultados são gravados em JSONL (benchmarks/results/webhook_load.jsonl).
+
+Uso:
+    python benchmarks/webhook_load_test.py
+    python benchmarks/webhook_load_test.py --rates 200,500,1000,2000 --duration 5
+    python benchmarks/webhook_load_test.py --latency 0.2 --error-rate 0.05 --workers 32
+============================================
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+DEFAULT_RESULTS = SERVICE_DIR / "benchmarks" / "results" / "webhook_load.jsonl"
+
+_RESPONSES = {
+    200: b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\n\r\n{}",
+    500: b"HTTP/1.1 500 Internal Server Error\r\nContent-Length: 0\r\n\r\n",
+}
+
+
+# ============================================
+# STUB RECEIVER
+# ============================================
+
+
+class StubReceiver:
+    """Receptor HTTP mínimo com latência e taxa de erro configuráveis"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.server: Optional[asyncio.base_events.Server] = None
+        self.url = ""
+
+        self.requests = 0
+        self.errors = 0
+        self.delivered: Set[str] = set()  # delivery_ids recebidos com 2xx
+        self.lags: List[float] = []
+        self.since = 0.0  # ignora sobras de estágios anteriores
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/hook"
+        return self.url
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                delay = self.latency
+                if self.jitter:
+                    delay += self.rng.uniform(-self.jitter, self.jitter)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                self.requests += 1
+                status = 500 if self.rng.random() < self.error_rate else 200
+                if status == 200:
+                    self._record(headers, body)
+                else:
+                    self.errors += 1
+
+                writer.write(_RESPONSES[status])
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _record(self, headers: Dict[str, str], body: bytes):
+        now = time.time()
+        payload = json.loads(body)
+        if payload.get("event") == "batch":
+            events = [(event["delivery_id"], event) for event in payload["events"]]
+        else:
+            events = [(headers.get("x-webhook-delivery"), payload)]
+        for delivery_id, event in events:
+            if event["data"]["t"] < self.since or delivery_id in self.delivered:
+                continue  # at-least-once: reentrega não conta de novo
+            self.delivered.add(delivery_id)
+            self.lags.append(now - event["data"]["t"])
+
+    def reset(self, since: float):
+        self.since = since
+        self.requests = self.errors = 0
+        self.delivered.clear()
+        self.lags.clear()
+
+
+# ============================================
+# HELPERS
+# ============================================
+
+
+def rss_mb() -> float:
+    """RSS atual (Linux /proc) ou pico (outros sistemas)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=SERVICE_DIR,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ============================================
+# LOAD STAGES
+# ============================================
+
+
+async def run_stage(
+    rate: int,
+    duration: float,
+    subscribers: int,
+    receivers: List[StubReceiver],
+    drain_timeout: float,
+) -> Dict[str, Any]:
+    from app.webhooks import WebhookEvent, dispatch_event, get_webhook_manager
+
+    manager = get_webhook_manager()
+    wall_start = time.time()
+    for receiver in receivers:
+        receiver.reset(since=wall_start)
+    retries_before = manager.delivery_stats()["retries"]
+
+    total = int(rate * duration)
+    start = time.perf_counter()
+    for i in range(total):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await dispatch_event(WebhookEvent.TASK_COMPLETED, {"seq": i, "t": time.time()})
+    dispatch_seconds = time.perf_counter() - start
+
+    expected = total * subscribers
+    deadline = time.perf_counter() + drain_timeout
+    while time.perf_counter() < deadline:
+        if sum(len(r.delivered) for r in receivers) >= expected:
+            break
+        await asyncio.sleep(0.02)
+    elapsed = time.perf_counter() - start
+
+    delivered = sum(len(r.delivered) for r in receivers)
+    lags = [lag for r in receivers for lag in r.lags]
+    return {
+        "offered_eps": rate,
+        "dispatched_eps": round(total / dispatch_seconds, 1),
+        "expected": expected,
+        "delivered": delivered,
+        "delivered_eps": round(delivered / elapsed, 1),
+        "drain_seconds": round(elapsed - dispatch_seconds, 2),
+        "complete": delivered >= expected,
+        "lag_p50_ms": percentile(lags, 50),
+        "lag_p95_ms": percentile(lags, 95),
+        "lag_p99_ms": percentile(lags, 99),
+        "lag_max_ms": percentile(lags, 100),
+        "http_requests": sum(r.requests for r in receivers),
+        "http_errors": sum(r.errors for r in receivers),
+        "retries": manager.delivery_stats()["retries"] - retries_before,
+        "rss_mb": rss_mb(),
+        "started_at": wall_start,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.webhooks import WebhookEvent, get_webhook_dispatcher, get_webhook_manager
+
+    receivers = [
+        StubReceiver(args.latency, args.jitter, args.error_rate, seed=i)
+        for i in range(args.receivers)
+    ]
+    urls = [await receiver.start() for receiver in receivers]
+
+    manager = get_webhook_manager()
+    for i in range(args.webhooks):
+        manager.register(
+            urls[i % len(urls)],
+            [WebhookEvent.TASK_COMPLETED],
+            retry_delay=args.retry_delay,
+            max_retries=args.max_retries,
+            batch_max_size=args.batch_size,
+            batch_max_latency=args.batch_latency,
+            headers={"X-Load-Test": "1"},
+        )
+
+    dispatcher = get_webhook_dispatcher()
+    await dispatcher.start()
+    baseline_rss = rss_mb()
+
+    stages = []
+    for rate in args.rates:
+        print(f"⏱️  {rate} eventos/s x {args.duration}s ({args.webhooks} inscritos)...")
+        stage = await run_stage(rate, args.duration, args.webhooks, receivers, args.drain_timeout)
+        stage["rss_growth_mb"] = round(stage["rss_mb"] - baseline_rss, 1)
+        stage["max_queue_lag_s"] = dispatcher.get_metrics()["queue_lag_seconds"]["max"]
+        stages.append(stage)
+        print(
+            f"   entregues {stage['delivered']}/{stage['expected']} "
+            f"({stage['delivered_eps']}/s), lag p95 {stage['lag_p95_ms']} ms, "
+            f"erros {stage['http_errors']}, RSS +{stage['rss_growth_mb']} MB"
+        )
+        if not stage["complete"]:
+            print("   ⚠️  drain não terminou: dispatcher saturado nesta taxa")
+
+    await dispatcher.stop()
+    for receiver in receivers:
+        await receiver.stop()
+    return {"stages": stages, "baseline_rss_mb": baseline_rss}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test do dispatcher de webhooks")
+    parser.add_argument("--rates", default="100,250,500,1000", help="Eventos/s por estágio")
+    parser.add_argument("--duration", type=float, default=3.0, help="Segundos por estágio")
+    parser.add_argument("--webhooks", type=int, default=4, help="Inscritos por evento")
+    parser.add_argument("--receivers", type=int, default=2, help="Hosts receptores")
+    parser.add_argument("--latency", type=float, default=0.01, help="Latência do receptor (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de HTTP 500")
+    parser.add_argument("--retry-delay", type=int, default=1)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=1, help="batch_max_size dos webhooks")
+    parser.add_argument("--batch-latency", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, help="WEBHOOK_WORKERS")
+    parser.add_argument("--host-concurrency", type=int, help="WEBHOOK_HOST_CONCURRENCY")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS)
+    parser.add_argument("--no-store", action="store_true", help="Não grava resultados")
+    args = parser.parse_args(argv)
+    args.rates = [int(rate) for rate in args.rates.split(",") if rate]
+
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["WEBHOOK_STORE_PATH"] = os.path.join(tmp, "webhooks.db")
+        if args.workers:
+            os.environ["WEBHOOK_WORKERS"] = str(args.workers)
+        if args.host_concurrency:
+            os.environ["WEBHOOK_HOST_CONCURRENCY"] = str(args.host_concurrency)
+        results = asyncio.run(run(args))
+
+    if not args.no_store:
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "config": {
+                key: value
+                for key, value in vars(args).items()
+                if key not in ("results", "no_store")
+            },
+            **results,
+        }
+        args.results.parent.mkdir(parents=True, exist_ok=True)
+        with args.results.open("a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Teste do pool de contextos do navegador (eviction)
+
+Testa:
+- Sweeper de ociosidade não fecha sessão fixada (pinned) ou usada
+  enquanto fecha outras
+- LRU nunca escolhe sessão fixada
+
+Uso: python test_browser_pool.py (ou pytest test_browser_pool.py)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.services.browser_pool import ContextPool, PoolExhausted
+
+
+class FakePage:
+    def is_closed(self):
+        return False
+
+
+class FakeContext:
+    def __init__(self, close_delay: float = 0.0):
+        self.closed = False
+        self.close_delay = close_delay
+
+    async def new_page(self):
+        return FakePage()
+
+    async def close(self):
+        await asyncio.sleep(self.close_delay)
+        self.closed = True
+
+
+async def slow_factory(user_agent, storage_state):
+    return FakeContext(close_delay=0.1)
+
+
+async def check_idle_sweep_race():
+    print("\n1️⃣ Sweeper x sessão fixada...")
+    pool = ContextPool(slow_factory, prewarm=0, idle_timeout=0)
+    await pool.open("a")
+    await pool.open("b")
+    await pool.open("c")
+
+    sweep = asyncio.create_task(pool.evict_idle())
+    await asyncio.sleep(0.05)  # fechando "a"
+    async with pool.pinned("b") as session:
+        pool.get("c")  # "c" usada agora
+        pool.idle_timeout = 60
+        closed = await sweep
+        assert not session.context.closed, "sessão fixada foi fechada"
+        assert "b" in pool.sessions and "c" in pool.sessions
+    assert closed == 1 and "a" not in pool.sessions, closed
+    await pool.close()
+    print("   ✅ Só a sessão ainda ociosa foi fechada")
+
+
+async def check_lru_skips_pinned():
+    print("\n2️⃣ LRU x sessão fixada...")
+
+    async def factory(user_agent, storage_state):
+        return FakeContext()
+
+    pool = ContextPool(factory, prewarm=0, max_contexts=2)
+    async with pool.pinned("a"):
+        await pool.open("b")
+        await pool.open("c")
+        assert set(pool.sessions) == {"a", "c"}, list(pool.sessions)
+        async with pool.pinned("c"):
+            try:
+                await pool.open("d")
+            except PoolExhausted:
+                pass
+            else:
+                raise AssertionError("abriu sessão com todas fixadas")
+    await pool.close()
+    print("   ✅ Fixadas nunca são despejadas")
+
+
+async def main():
+    print("🧪 Teste do pool de contextos\n")
+    print("=" * 60)
+
+    await check_idle_sweep_race()
+    await check_lru_skips_pinned()
+
+    print("\n" + "=" * 60)
+    print("✅ Todos os testes passaram")
+
+
+# ============================================
+# PYTEST
+# ============================================
+
+
+def test_idle_sweep_race():
+    asyncio.run(check_idle_sweep_race())
+
+
+def test_lru_skips_pinned():
+    asyncio.run(check_lru_skips_pinned())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,192 @@
+"""
+Teste do canal push de comandos da extensão
+
+Testa:
+- Push para a conexão ativa e ack (comando vira processing via on_ack)
+- Sweeper: ack não chega -> comando re-oferecido uma vez, depois fica
+  para o polling
+- Ack atrasado (depois do sweeper desistir) ainda chega ao on_ack e
+  remove cópias re-oferecidas da outbox
+- Router: ack só move comandos pendentes do próprio dispositivo
+- Router: /result acha o traceparent do comando sem consultar o banco
+
+Uso: python test_extension_channel.py (ou pytest test_extension_channel.py)
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.services.extension_channel import CommandChannel
+
+
+def drain(conn) -> list:
+    messages = []
+    while not conn.outbox.empty():
+        messages.append(conn.outbox.get_nowait())
+    return [m["command"]["id"] for m in messages if m["type"] == "command"]
+
+
+def recorder(calls: list):
+    async def on_ack(device_id, command_ids):
+        calls.append((device_id, list(command_ids)))
+
+    return on_ack
+
+
+async def check_push_and_ack():
+    print("\n1️⃣ Push + ack...")
+    channel = CommandChannel(ack_timeout=60)
+    calls = []
+    channel.on_ack = recorder(calls)
+
+    assert not channel.push("dev-1", {"id": "c1"}), "sem conexão: fica para o polling"
+    conn = channel.connect("dev-1")
+    assert channel.push("dev-1", {"id": "c1"})
+    assert channel.push("dev-1", {"id": "c1"}), "já em voo: não duplica"
+    assert drain(conn) == ["c1"]
+
+    acked = await channel.ack("dev-1", ["c1", "c1"])
+    assert acked == ["c1"] and calls == [("dev-1", ["c1"])], (acked, calls)
+    assert not channel.awaiting_ack and channel.stats["acked"] == 1
+    print("   ✅ Comando entregue uma vez e confirmado")
+    await channel.close()
+
+
+async def check_sweeper_and_late_ack():
+    print("\n2️⃣ Timeout de ack + ack atrasado...")
+    channel = CommandChannel(ack_timeout=10)
+    calls = []
+    channel.on_ack = recorder(calls)
+    conn = channel.connect("dev-1")
+    channel.push("dev-1", {"id": "c1"})
+    now = time.monotonic()
+
+    assert channel.sweep(now + 11) == ["c1"]
+    assert channel.stats["redelivered"] == 1 and "c1" in channel.awaiting_ack
+    assert channel.sweep(now + 22) == ["c1"]
+    assert "c1" not in channel.awaiting_ack, "desiste após max_attempts"
+    assert conn.outbox.qsize() == 2, "original + cópia re-oferecida"
+    print("   ✅ Re-oferecido uma vez, depois deixado para o polling")
+
+    acked = await channel.ack("dev-1", ["c1"])
+    assert acked == ["c1"] and calls == [("dev-1", ["c1"])], (acked, calls)
+    assert channel.stats["late_acks"] == 1
+    assert drain(conn) == [], "cópias na outbox descartadas"
+    print("   ✅ Ack atrasado chega ao on_ack e limpa a outbox")
+    await channel.close()
+
+
+async def check_sweeper_loop():
+    print("\n3️⃣ Sweeper em background...")
+    channel = CommandChannel(ack_timeout=0.15)
+    conn = channel.connect("dev-1")
+    channel.push("dev-1", {"id": "c1"})
+
+    deadline = time.monotonic() + 5
+    while "c1" in channel.awaiting_ack and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    assert "c1" not in channel.awaiting_ack
+    assert channel.stats["ack_timeouts"] == 2 and channel.stats["redelivered"] == 1
+    assert drain(conn) == ["c1", "c1"]
+    print("   ✅ Sweeper re-oferece e desiste sozinho")
+    await channel.close()
+
+
+async def check_router_ack():
+    print("\n4️⃣ Ack no router (processing só se pendente e do dispositivo)...")
+    import app.routers.extension as extension
+
+    updates = []
+
+    class FakeSupabase:
+        async def update(self, table, values, filters):
+            updates.append((table, values["status"], filters))
+
+    original = extension.get_supabase
+    extension.get_supabase = lambda: FakeSupabase()
+    try:
+        await extension._on_push_ack("dev-1", ["c1", "c2"])
+    finally:
+        extension.get_supabase = original
+
+    (table, status, filters), = updates
+    assert table == "extension_commands" and status == "processing"
+    assert filters == {
+        "id": 'in.("c1","c2")',
+        "status": "eq.pending",
+        "device_id": "eq.dev-1",
+    }, filters
+    print("   ✅ UPDATE filtrado por status pending e device_id")
+
+
+def check_result_traceparent():
+    print("\n5️⃣ traceparent do /result sem consulta...")
+    import app.routers.extension as extension
+
+    command_id = "0b6f3c1e-8d2a-4f5b-9c7d-1a2b3c4d5e6f"
+    traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+    def no_database():
+        raise AssertionError("consultou o banco")
+
+    original = extension.get_supabase
+    extension.get_supabase = no_database
+    try:
+        extension._remember_traceparents(
+            [{"id": command_id, "traceparent": traceparent}]
+        )
+        result = extension.CommandResult(
+            deviceId="dev-1", commandId=command_id, success=True
+        )
+        assert extension._command_traceparent(result) == traceparent
+    finally:
+        extension.get_supabase = original
+    print("   ✅ traceparent vem da memória do processo")
+
+
+async def main():
+    print("🧪 Teste do canal push da extensão\n")
+    print("=" * 60)
+
+    await check_push_and_ack()
+    await check_sweeper_and_late_ack()
+    await check_sweeper_loop()
+    await check_router_ack()
+    check_result_traceparent()
+
+    print("\n" + "=" * 60)
+    print("✅ Todos os testes passaram")
+
+
+# ============================================
+# PYTEST
+# ============================================
+
+
+def test_push_and_ack():
+    asyncio.run(check_push_and_ack())
+
+
+def test_sweeper_and_late_ack():
+    asyncio.run(check_sweeper_and_late_ack())
+
+
+def test_sweeper_loop():
+    asyncio.run(check_sweeper_loop())
+
+
+def test_router_ack():
+    asyncio.run(check_router_ack())
+
+
+def test_result_traceparent():
+    check_result_traceparent()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
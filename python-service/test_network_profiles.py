@@ -0,0 +1,148 @@
+"""
+Teste do cache compartilhado de assets estáticos (network_profiles)
+
+Testa:
+- Só guarda respostas públicas (public / max-age) sem Set-Cookie nem Vary
+- Requisição com Cookie / Authorization não passa pelo cache
+- URL recusada pelo cache vai por route.continue_() (sem route.fetch)
+- Hit servido com route.fulfill, sem rede
+
+Uso: python test_network_profiles.py (ou pytest test_network_profiles.py)
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.services.network_profiles import NetworkPolicy, StaticAssetCache
+
+
+class FakeRequest:
+    def __init__(self, url, headers=None, resource_type="script"):
+        self.url = url
+        self.method = "GET"
+        self.resource_type = resource_type
+        self._headers = headers or {}
+
+    async def all_headers(self):
+        return self._headers
+
+
+class FakeResponse:
+    def __init__(self, headers, body=b"x" * 100):
+        self.status = 200
+        self.headers = headers
+        self._body = body
+
+    async def body(self):
+        return self._body
+
+
+class FakeRoute:
+    def __init__(self, response=None):
+        self.response = response
+        self.calls = []
+
+    async def continue_(self):
+        self.calls.append("continue")
+
+    async def fetch(self):
+        self.calls.append("fetch")
+        return self.response
+
+    async def fulfill(self, **kwargs):
+        self.calls.append("fulfill")
+
+    async def abort(self, code=None):
+        self.calls.append("abort")
+
+
+def check_store_policy():
+    print("\n1️⃣ Política de armazenamento...")
+    cache = StaticAssetCache()
+    cases = {
+        "max-age": ({"cache-control": "max-age=600"}, True),
+        "public": ({"cache-control": "public"}, True),
+        "sem cache-control": ({}, False),
+        "s-maxage só": ({"cache-control": "s-maxage=600"}, False),
+        "private": ({"cache-control": "private, max-age=600"}, False),
+        "no-cache": ({"cache-control": "no-cache, max-age=600"}, False),
+        "set-cookie": ({"cache-control": "max-age=600", "set-cookie": "a=b"}, False),
+        "vary cookie": ({"cache-control": "max-age=600", "vary": "Cookie"}, False),
+        "vary encoding": (
+            {"cache-control": "max-age=600", "vary": "Accept-Encoding"},
+            True,
+        ),
+    }
+    for name, (headers, expected) in cases.items():
+        stored = cache.put(f"https://cdn.test/{name}", 200, headers, b"x", 1.0)
+        assert stored is expected, (name, stored)
+
+    small = StaticAssetCache(max_entry_bytes=10)
+    assert not small.put(
+        "https://cdn.test/big", 200, {"cache-control": "public"}, b"x" * 11, 1.0
+    )
+    print(f"   ✅ {len(cases) + 1} casos")
+
+
+async def check_routing():
+    print("\n2️⃣ Roteamento...")
+    cache = StaticAssetCache()
+    policy = NetworkPolicy("full", cache)
+
+    # Cacheável: fetch + fulfill, depois hit sem rede
+    url = "https://cdn.test/app.js"
+    route = FakeRoute(FakeResponse({"cache-control": "max-age=600"}))
+    await policy._handle(route, FakeRequest(url))
+    assert route.calls == ["fetch", "fulfill"], route.calls
+    route = FakeRoute()
+    await policy._handle(route, FakeRequest(url))
+    assert route.calls == ["fulfill"], route.calls
+
+    # Com Cookie: nem lê nem grava o cache
+    route = FakeRoute()
+    await policy._handle(route, FakeRequest(url, {"cookie": "sid=1"}))
+    assert route.calls == ["continue"], route.calls
+
+    # Recusada uma vez: próximas vão direto por continue_
+    private = "https://cdn.test/me.js"
+    route = FakeRoute(FakeResponse({"cache-control": "private"}))
+    await policy._handle(route, FakeRequest(private))
+    assert route.calls == ["fetch", "fulfill"], route.calls
+    route = FakeRoute()
+    await policy._handle(route, FakeRequest(private))
+    assert route.calls == ["continue"], route.calls
+
+    assert cache.stats["bypassed"] == 2 and cache.stats["refused"] == 1
+    print("   ✅ Hit via fulfill; credenciais e recusadas via continue_")
+
+
+async def main():
+    print("🧪 Teste do cache de assets estáticos\n")
+    print("=" * 60)
+
+    check_store_policy()
+    await check_routing()
+
+    print("\n" + "=" * 60)
+    print("✅ Todos os testes passaram")
+
+
+# ============================================
+# PYTEST
+# ============================================
+
+
+def test_store_policy():
+    check_store_policy()
+
+
+def test_routing():
+    asyncio.run(check_routing())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""
+Teste do estado de sessões do navegador (cookies entre fechamentos)
+
+Testa:
+- Sessão fechada salva o storage state e volta com ele
+- Sessão descartável (persist=False) não grava nada
+- Sweeper remove estados expirados
+- Persistência é opt-in (BROWSER_PERSIST_STATE)
+
+Uso: python test_session_state.py (ou pytest test_session_state.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.services.browser_pool import ContextPool
+from app.services.session_state import (
+    SessionStateStore,
+    create_session_state_store_from_env,
+)
+
+STATE = {"cookies": [{"name": "sid", "value": "abc"}], "origins": []}
+
+
+class FakePage:
+    def is_closed(self):
+        return False
+
+
+class FakeContext:
+    def __init__(self, storage_state=None):
+        self.restored = storage_state
+
+    async def new_page(self):
+        return FakePage()
+
+    async def storage_state(self):
+        return STATE
+
+    async def close(self):
+        pass
+
+
+async def factory(user_agent, storage_state):
+    return FakeContext(storage_state)
+
+
+async def check_save_and_restore(directory: Path):
+    print("\n1️⃣ Salvar e restaurar...")
+    store = SessionStateStore(directory)
+    pool = ContextPool(factory, prewarm=0, state_store=store)
+
+    await pool.open("login")
+    await pool.close_session("login")
+    session = await pool.open("login")
+    assert session.context.restored == STATE
+    assert store.stats["saved"] == 1 and pool.stats["restored"] == 1
+
+    await pool.open("sess_tmp", persist=False)
+    await pool.close_session("sess_tmp")
+    assert store.stats["saved"] == 1, "sessão descartável não é salva"
+    assert len(list(directory.glob("*.json"))) == 1
+    await pool.close()
+    print("   ✅ Cookies voltam; ids gerados não vão para o disco")
+
+
+async def check_prune(directory: Path):
+    print("\n2️⃣ Limpeza de estados expirados...")
+    store = SessionStateStore(directory, ttl=60)
+    await store.save("old", STATE)
+    await store.save("new", STATE)
+    old = store._path("old")
+    os.utime(old, (time.time() - 120, time.time() - 120))
+
+    pool = ContextPool(factory, prewarm=0, state_store=store, prune_interval=3600)
+    assert await pool.prune_states() == 0, "respeita prune_interval"
+    assert await pool.prune_states(force=True) == 1
+    assert not old.exists() and store._path("new").exists()
+    print("   ✅ Estado expirado removido, o válido fica")
+
+
+def check_opt_in():
+    print("\n3️⃣ Opt-in...")
+    previous = os.environ.pop("BROWSER_PERSIST_STATE", None)
+    try:
+        assert create_session_state_store_from_env() is None
+        os.environ["BROWSER_PERSIST_STATE"] = "true"
+        assert create_session_state_store_from_env() is not None
+    finally:
+        os.environ.pop("BROWSER_PERSIST_STATE", None)
+        if previous is not None:
+            os.environ["BROWSER_PERSIST_STATE"] = previous
+    print("   ✅ Desligado por padrão")
+
+
+async def main():
+    print("🧪 Teste do estado de sessões do navegador\n")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await check_save_and_restore(Path(tmp) / "save")
+        await check_prune(Path(tmp) / "prune")
+    check_opt_in()
+
+    print("\n" + "=" * 60)
+    print("✅ Todos os testes passaram")
+
+
+# ============================================
+# PYTEST
+# ============================================
+
+
+def test_save_and_restore(tmp_path):
+    asyncio.run(check_save_and_restore(tmp_path))
+
+
+def test_prune(tmp_path):
+    asyncio.run(check_prune(tmp_path))
+
+
+def test_opt_in():
+    check_opt_in()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,373 @@
+"""
+Teste de recuperação do log de entregas de webhooks
+
+Testa:
+- Crash no meio da entrega (processo morto com os._exit) -> entrega
+  reaparece após o visibility timeout e é entregue (at-least-once)
+- Retry agendado sobrevive a restart do dispatcher (timestamp persistido)
+- Configuração do webhook recarregada do store
+- Retenção remove só entregas finalizadas
+- Batching: eventos do mesmo webhook coalescidos em POSTs assinados
+  (e aceitos pelo WebhookReceiver só sobre o corpo bruto)
+- Histórico paginado por cursor e contadores incrementais
+- Hosts lentos não prendem os workers; lanes ociosas são descartadas
+
+Uso: python test_webhook_queue.py (ou pytest test_webhook_queue.py)
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+SERVICE_DIR = Path(__file__).parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.webhooks import (
+    DeliveryStore,
+    WebhookDispatcher,
+    WebhookEvent,
+    WebhookManager,
+    WebhookReceiver,
+)
+
+# Processo que morre com uma entrega em andamento
+_CRASH_SCRIPT = r"""
+import asyncio, os, sys
+import httpx
+sys.path.insert(0, sys.argv[2])
+from app.webhooks import DeliveryStore, WebhookDispatcher, WebhookEvent, WebhookManager
+
+async def handler(request):
+    print("IN_FLIGHT", flush=True)
+    await asyncio.sleep(60)
+    return httpx.Response(200)
+
+async def main():
+    manager = WebhookManager(DeliveryStore(sys.argv[1]))
+    manager.register("http://receiver.test/hook", [WebhookEvent.TASK_COMPLETED])
+    dispatcher = WebhookDispatcher(
+        manager, visibility_timeout=1.0, poll_interval=0.1,
+        transport=httpx.MockTransport(handler),
+    )
+    await dispatcher.start()
+    await dispatcher.dispatch(WebhookEvent.TASK_COMPLETED, {"order": 42})
+    await asyncio.sleep(0.5)
+    os._exit(1)  # crash sem ack
+
+asyncio.run(main())
+"""
+
+
+async def wait_for(predicate, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+def statuses(store: DeliveryStore) -> dict:
+    return store.counts()
+
+
+async def check_crash_recovery(db_path: str):
+    print("\n1️⃣ Crash com entrega em andamento...")
+    proc = subprocess.run(
+        [sys.executable, "-c", _CRASH_SCRIPT, db_path, str(SERVICE_DIR)],
+        capture_output=True,
+        text=True,
+        timeout=30,
+    )
+    assert proc.returncode == 1, proc.stderr
+    assert "IN_FLIGHT" in proc.stdout, "entrega não chegou a ser enviada"
+
+    store = DeliveryStore(db_path)
+    assert statuses(store) == {"sending": 1}, statuses(store)
+    print("   ✅ Processo morreu com 1 entrega 'sending' no log")
+
+    manager = WebhookManager(store)
+    assert len(manager.webhooks) == 1
+    print("   ✅ Webhook recarregado do store")
+
+    received = []
+
+    def handler(request):
+        received.append(request.headers["X-Webhook-Delivery"])
+        return httpx.Response(200)
+
+    dispatcher = WebhookDispatcher(
+        manager,
+        visibility_timeout=1.0,
+        poll_interval=0.1,
+        transport=httpx.MockTransport(handler),
+    )
+    await dispatcher.start()
+    ok = await wait_for(lambda: statuses(store) == {"success": 1})
+    await dispatcher.stop()
+
+    assert ok, statuses(store)
+    assert len(received) == 1
+    print(f"   ✅ Reentregue após o lease expirar ({received[0][:8]})")
+    store.close()
+
+
+async def check_durable_retry(db_path: str):
+    print("\n2️⃣ Retry sobrevive a restart...")
+    store = DeliveryStore(db_path)
+    manager = WebhookManager(store)
+    manager.register(
+        "http://flaky.test/hook", [WebhookEvent.TASK_FAILED], retry_delay=1
+    )
+
+    dispatcher = WebhookDispatcher(
+        manager,
+        poll_interval=0.1,
+        transport=httpx.MockTransport(lambda request: httpx.Response(500)),
+    )
+    await dispatcher.start()
+    await dispatcher.dispatch(WebhookEvent.TASK_FAILED, {"task": "x"})
+    ok = await wait_for(lambda: statuses(store) == {"retry": 1})
+    await dispatcher.stop()
+    assert ok, statuses(store)
+    print("   ✅ Falha HTTP 500 -> retry persistido")
+
+    # "Deploy": novo manager/dispatcher sobre o mesmo arquivo
+    manager = WebhookManager(store)
+    attempts = []
+
+    def handler(request):
+        attempts.append(int(request.headers["X-Webhook-Attempt"]))
+        return httpx.Response(200)
+
+    dispatcher = WebhookDispatcher(
+        manager, poll_interval=0.1, transport=httpx.MockTransport(handler)
+    )
+    await dispatcher.start()
+    ok = await wait_for(lambda: statuses(store) == {"success": 1})
+    await dispatcher.stop()
+
+    assert ok, statuses(store)
+    assert attempts == [2], attempts
+    print("   ✅ Retry executado após restart (tentativa 2)")
+    store.close()
+
+
+async def check_retention(db_path: str):
+    print("\n3️⃣ Retenção...")
+    store = DeliveryStore(db_path)
+    manager = WebhookManager(store)
+    manager.register("http://down.test/hook", [WebhookEvent.TASK_STARTED])
+    dispatcher = WebhookDispatcher(
+        manager,
+        transport=httpx.MockTransport(lambda request: httpx.Response(200)),
+    )
+    await dispatcher.dispatch(WebhookEvent.TASK_STARTED, {})  # sem workers: pending
+
+    before = statuses(store)
+    removed = store.purge(retention_seconds=0, now=time.time() + 1)
+    after = statuses(store)
+
+    assert removed == before.get("success", 0), (removed, before)
+    assert after == {"pending": 1}, after
+    print(f"   ✅ {removed} finalizadas removidas, pendente preservada")
+    store.close()
+
+
+async def check_batching(db_path: str):
+    print("\n4️⃣ Batching...")
+    store = DeliveryStore(db_path)
+    manager = WebhookManager(store)
+    webhook = manager.register(
+        "http://bulk.test/hook",
+        [WebhookEvent.TASK_COMPLETED],
+        batch_max_size=50,
+        batch_max_latency=0.2,
+    )
+    posts, raw = [], []
+
+    def handler(request):
+        body = request.content.decode()
+        assert WebhookDispatcher.verify_signature(
+            body, request.headers["X-Webhook-Signature"], webhook.secret
+        )
+        posts.append(json.loads(body))
+        raw.append((request.content, request.headers["X-Webhook-Signature"]))
+        return httpx.Response(200)
+
+    dispatcher = WebhookDispatcher(
+        manager, poll_interval=0.05, transport=httpx.MockTransport(handler)
+    )
+    await dispatcher.start()
+    for i in range(120):
+        await dispatcher.dispatch(WebhookEvent.TASK_COMPLETED, {"n": i})
+    ok = await wait_for(lambda: statuses(store).get("success", 0) == 120)
+    await dispatcher.stop()
+
+    assert ok, statuses(store)
+    sizes = [post["count"] for post in posts]
+    assert sum(sizes) == 120 and max(sizes) <= 50, sizes
+    assert len({e["delivery_id"] for post in posts for e in post["events"]}) == 120
+    print(f"   ✅ 120 eventos em {len(posts)} POSTs assinados (tamanhos {sizes})")
+
+    receiver = WebhookReceiver(webhook.secret)
+    received = []
+    receiver.on(WebhookEvent.TASK_COMPLETED)(received.append)
+    body, signature = raw[0]
+    assert await receiver.process(body, signature)
+    assert await receiver.process(json.loads(body), signature, raw_body=body)
+    assert not await receiver.process(body + b" ", signature)
+    try:
+        await receiver.process(json.loads(body), signature)
+        raise AssertionError("dict sem raw_body aceito")
+    except ValueError:
+        pass
+    assert len(received) == 2 * posts[0]["count"], len(received)
+    print("   ✅ Receiver valida a assinatura sobre o corpo bruto")
+    store.close()
+
+
+async def check_history(db_path: str):
+    print("\n5️⃣ Histórico e estatísticas...")
+    store = DeliveryStore(db_path)
+    manager = WebhookManager(store)
+    webhook = manager.register("http://history.test/hook", [WebhookEvent.TASK_CREATED])
+    other = manager.register("http://other.test/hook", [WebhookEvent.TASK_CREATED])
+    dispatcher = WebhookDispatcher(
+        manager,
+        poll_interval=0.05,
+        transport=httpx.MockTransport(lambda request: httpx.Response(200)),
+    )
+    await dispatcher.start()
+    for i in range(25):
+        await dispatcher.dispatch(WebhookEvent.TASK_CREATED, {"n": i})
+    ok = await wait_for(lambda: statuses(store) == {"success": 50})
+    await dispatcher.stop()
+    assert ok, statuses(store)
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = manager.list_deliveries(webhook.id, limit=10, cursor=cursor)
+        pages.append(page)
+        if cursor is None:
+            break
+    ids = [d.id for page in pages for d in page]
+    created = [d.created_at for page in pages for d in page]
+    assert [len(page) for page in pages] == [10, 10, 5], [len(p) for p in pages]
+    assert len(set(ids)) == 25 and created == sorted(created, reverse=True)
+    assert all(d.webhook_id == webhook.id for page in pages for d in page)
+    print("   ✅ 25 entregas em 3 páginas (keyset), sem repetição, mais recentes primeiro")
+
+    stats = manager.delivery_stats(webhook.id)
+    assert stats["total"] == stats["stored"] == stats["success"] == 25, stats
+    assert stats["attempts"] == 25 and stats["retries"] == 0, stats
+    assert manager.get_statistics()["total_success"] == 50
+    store.purge(retention_seconds=0, now=time.time() + 1)
+    stats = manager.delivery_stats(other.id)
+    assert stats["stored"] == 0 and stats["total"] == 25, stats
+    print("   ✅ Contadores incrementais batem com o log (e com a retenção)")
+    store.close()
+
+
+async def check_slow_hosts(db_path: str):
+    print("\n6️⃣ Hosts lentos x workers...")
+    store = DeliveryStore(db_path)
+    manager = WebhookManager(store)
+    manager.register("http://slow1.test/hook", [WebhookEvent.TASK_COMPLETED])
+    manager.register("http://slow2.test/hook", [WebhookEvent.TASK_COMPLETED])
+    manager.register("http://fast.test/hook", [WebhookEvent.TASK_FAILED])
+    delivered = {}
+
+    async def handler(request):
+        if request.url.host.startswith("slow"):
+            await asyncio.sleep(1.0)
+        delivered.setdefault(request.url.host, time.monotonic())
+        return httpx.Response(200)
+
+    # Dois hosts lentos com 4 vagas cada ocupariam os 2 workers inteiros
+    dispatcher = WebhookDispatcher(
+        manager,
+        workers=2,
+        per_host_limit=4,
+        poll_interval=0.05,
+        lane_idle_timeout=0.2,
+        transport=httpx.MockTransport(handler),
+    )
+    await dispatcher.start()
+    for _ in range(8):
+        await dispatcher.dispatch(WebhookEvent.TASK_COMPLETED, {})
+    await asyncio.sleep(0.2)
+    start = time.monotonic()
+    await dispatcher.dispatch(WebhookEvent.TASK_FAILED, {})
+    ok = await wait_for(lambda: "fast.test" in delivered)
+    assert ok and delivered["fast.test"] - start < 0.5, delivered
+    print(f"   ✅ Host rápido entregue em {delivered['fast.test'] - start:.2f}s")
+
+    ok = await wait_for(lambda: statuses(store).get("success", 0) == 17)
+    assert ok, statuses(store)
+    # Sem entregas: as lanes (e os clientes HTTP) somem após o timeout
+    ok = await wait_for(lambda: not dispatcher.lanes)
+    await dispatcher.stop()
+    assert ok and dispatcher.lanes_evicted == 3, dispatcher.lanes_evicted
+    print("   ✅ Lanes ociosas descartadas")
+    store.close()
+
+
+async def main():
+    print("🧪 Teste do log persistente de webhooks\n")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "webhooks.db")
+        await check_crash_recovery(db_path)
+        os.remove(db_path)
+        await check_durable_retry(db_path)
+        await check_retention(db_path)
+        os.remove(db_path)
+        await check_batching(db_path)
+        os.remove(db_path)
+        await check_history(db_path)
+        os.remove(db_path)
+        await check_slow_hosts(db_path)
+
+    print("\n" + "=" * 60)
+    print("✅ Todos os testes passaram")
+
+
+# ============================================
+# PYTEST (um banco novo por teste, em tmp_path)
+# ============================================
+
+
+def test_crash_recovery(tmp_path):
+    asyncio.run(check_crash_recovery(str(tmp_path / "webhooks.db")))
+
+
+def test_durable_retry_and_retention(tmp_path):
+    # Retenção remove as entregas finalizadas pelo retry
+    db_path = str(tmp_path / "webhooks.db")
+    asyncio.run(check_durable_retry(db_path))
+    asyncio.run(check_retention(db_path))
+
+
+def test_batching(tmp_path):
+    asyncio.run(check_batching(str(tmp_path / "webhooks.db")))
+
+
+def test_history(tmp_path):
+    asyncio.run(check_history(str(tmp_path / "webhooks.db")))
+
+
+def test_slow_hosts(tmp_path):
+    asyncio.run(check_slow_hosts(str(tmp_path / "webhooks.db")))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+"""
+Teste do buffer de escrita em lote (logs e resultados da extensão)
+
+Testa:
+- Linhas agrupadas em lotes de max_batch
+- Erro transitório: lote inteiro repetido com backoff
+- Banco fora do ar além das tentativas: lote volta para a fila
+- Linha rejeitada pelo banco (4xx): lote dividido, só ela é perdida
+  (e entregue ao on_drop)
+- max_pending respeitado à risca (contando o lote em escrita)
+- CommandResult recusa commandId que não é uuid
+
+Uso: python test_write_buffer.py (ou pytest test_write_buffer.py)
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).parent
+sys.path.insert(0, str(SERVICE_DIR))
+
+from app.services.supabase_rest import SupabaseError
+from app.services.write_buffer import WriteBuffer
+
+
+def is_bad_row(error: Exception) -> bool:
+    return isinstance(error, SupabaseError) and error.status_code == 400
+
+
+async def check_batching():
+    print("\n1️⃣ Lotes...")
+    batches = []
+
+    async def flush(rows):
+        batches.append([row["n"] for row in rows])
+
+    buffer = WriteBuffer("test", flush, max_batch=4, max_delay=0.05)
+    for n in range(10):
+        await buffer.put({"n": n})
+    await buffer.close()
+
+    assert [len(b) for b in batches] == [4, 4, 2], batches
+    assert sum(batches, []) == list(range(10))
+    print(f"   ✅ 10 linhas em {len(batches)} escritas")
+
+
+async def check_transient_retry():
+    print("\n2️⃣ Erro transitório...")
+    calls = []
+
+    async def flush(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise SupabaseError(503, "unavailable")
+
+    buffer = WriteBuffer("test", flush, max_batch=8, is_bad_row=is_bad_row)
+    for n in range(5):
+        await buffer.put({"n": n})
+    await buffer.close()
+
+    assert calls == [5, 5], calls
+    assert buffer.stats["flushed_rows"] == 5 and buffer.stats["dropped_rows"] == 0
+    print("   ✅ Lote repetido inteiro e gravado")
+
+
+async def check_requeue():
+    print("\n3️⃣ Banco fora do ar...")
+    calls = []
+
+    async def flush(rows):
+        calls.append(len(rows))
+        if len(calls) <= 3:
+            raise SupabaseError(503, "unavailable")
+
+    buffer = WriteBuffer("test", flush, max_batch=8, max_delay=0.01, max_retries=1)
+    for n in range(5):
+        await buffer.put({"n": n})
+    deadline = time.monotonic() + 10
+    while buffer.stats["flushed_rows"] < 5 and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    await buffer.close()
+
+    assert calls == [5, 5, 5, 5], calls
+    assert buffer.stats["requeued_rows"] == 5
+    assert buffer.stats["flushed_rows"] == 5 and buffer.stats["dropped_rows"] == 0
+    print("   ✅ Nenhuma linha perdida; gravadas quando o banco voltou")
+
+
+async def check_bad_row_split():
+    print("\n4️⃣ Linha rejeitada...")
+    written = []
+    dropped = []
+
+    async def on_drop(rows, error):
+        dropped.extend(row["n"] for row in rows)
+
+    async def flush(rows):
+        if any(row["n"] == 5 for row in rows):
+            raise SupabaseError(400, "invalid input syntax for type uuid")
+        written.extend(row["n"] for row in rows)
+
+    buffer = WriteBuffer(
+        "test", flush, max_batch=16, is_bad_row=is_bad_row, on_drop=on_drop
+    )
+    for n in range(16):
+        await buffer.put({"n": n})
+    await buffer.close()
+
+    assert sorted(written) == [n for n in range(16) if n != 5], written
+    assert buffer.stats["bad_rows"] == 1 and buffer.stats["dropped_rows"] == 1
+    assert dropped == [5], dropped
+    print(f"   ✅ 15 de 16 gravadas ({buffer.stats['split_flushes']} divisões)")
+
+
+async def check_max_pending():
+    print("\n5️⃣ Limite de linhas pendentes...")
+    peak = 0
+
+    async def flush(rows):
+        await asyncio.sleep(0.05)
+
+    buffer = WriteBuffer(
+        "test", flush, max_batch=3, max_delay=0.01, max_pending=5, put_timeout=5
+    )
+
+    async def producer(n):
+        nonlocal peak
+        await buffer.put({"n": n})
+        peak = max(peak, buffer.pending)
+
+    await asyncio.gather(*(producer(n) for n in range(30)))
+    await buffer.close()
+
+    assert peak <= 5, peak
+    assert buffer.stats["flushed_rows"] == 30
+    print(f"   ✅ Pico de {peak} linhas (máximo 5)")
+
+
+def check_command_id_validation():
+    print("\n6️⃣ Validação do commandId...")
+    from pydantic import ValidationError
+
+    from app.routers.extension import CommandResult
+
+    CommandResult(
+        deviceId="dev-1",
+        commandId="0b6f3c1e-8d2a-4f5b-9c7d-1a2b3c4d5e6f",
+        success=True,
+    )
+    try:
+        CommandResult(deviceId="dev-1", commandId="not-a-uuid", success=True)
+    except ValidationError:
+        pass
+    else:
+        raise AssertionError("commandId inválido aceito")
+    print("   ✅ commandId não-uuid recusado na entrada")
+
+
+async def main():
+    print("🧪 Teste do buffer de escrita\n")
+    print("=" * 60)
+
+    await check_batching()
+    await check_transient_retry()
+    await check_requeue()
+    await check_bad_row_split()
+    await check_max_pending()
+    check_command_id_validation()
+
+    print("\n" + "=" * 60)
+    print("✅ Todos os testes passaram")
+
+
+# ============================================
+# PYTEST
+# ============================================
+
+
+def test_batching():
+    asyncio.run(check_batching())
+
+
+def test_transient_retry():
+    asyncio.run(check_transient_retry())
+
+
+def test_requeue():
+    asyncio.run(check_requeue())
+
+
+def test_bad_row_split():
+    asyncio.run(check_bad_row_split())
+
+
+def test_max_pending():
+    asyncio.run(check_max_pending())
+
+
+def test_command_id_validation():
+    check_command_id_validation()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,9 @@
+-- =====================================================
+-- MIGRATION: Trace context on extension commands
+-- Created: 2026-10-19
+-- Purpose: Store the W3C traceparent of the request that created the
+-- command so the result reported to /result joins the originating trace
+-- =====================================================
+ALTER TABLE extension_commands
+ADD COLUMN IF NOT EXISTS traceparent TEXT;
+COMMENT ON COLUMN extension_commands.traceparent IS 'W3C traceparent (00-<trace_id>-<span_id>-<flags>) of the originating request';
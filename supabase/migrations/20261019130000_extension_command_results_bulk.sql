@@ -0,0 +1,33 @@
+-- =====================================================
+-- MIGRATION: Bulk apply of extension command results
+-- Created: 2026-10-19
+-- Purpose: Let the python-service write a batch of command results
+-- (buffered from /api/extension/result) in one round trip instead of
+-- one UPDATE per command
+-- =====================================================
+CREATE OR REPLACE FUNCTION apply_extension_command_results(p_results JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+  updated INTEGER;
+BEGIN
+  UPDATE extension_commands c
+  SET
+    status = r.status,
+    result = r.result,
+    error = r.error,
+    completed_at = r.completed_at
+  FROM jsonb_to_recordset(p_results) AS r(
+    id UUID,
+    status TEXT,
+    result JSONB,
+    error TEXT,
+    completed_at TIMESTAMPTZ
+  )
+  WHERE c.id = r.id;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION apply_extension_command_results(JSONB) IS 'Batch UPDATE of extension_commands results: [{id, status, result, error, completed_at}]';
@@ -0,0 +1,148 @@
+-- =====================================================
+-- MIGRATION: Incremental per-device command statistics
+-- Created: 2026-10-19
+-- Purpose: /api/extension/stats/{device_id} used to read every command
+-- the device ever ran and count statuses in Python. Counters are now
+-- kept per device by a trigger on extension_commands (covers the API,
+-- the bulk result RPC and the extension writing through REST), so the
+-- endpoint reads a single row.
+-- =====================================================
+CREATE TABLE IF NOT EXISTS extension_device_stats (
+  device_id TEXT PRIMARY KEY,
+  total BIGINT NOT NULL DEFAULT 0,
+  pending BIGINT NOT NULL DEFAULT 0,
+  processing BIGINT NOT NULL DEFAULT 0,
+  completed BIGINT NOT NULL DEFAULT 0,
+  failed BIGINT NOT NULL DEFAULT 0,
+  -- Soma das durações (completed_at - started_at/created_at) e quantas entraram
+  duration_ms_sum BIGINT NOT NULL DEFAULT 0,
+  duration_count BIGINT NOT NULL DEFAULT 0,
+  last_activity TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE extension_device_stats ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service role full access on device stats" ON extension_device_stats;
+-- Só o backend lê/escreve direto; os contadores mudam pelo trigger
+CREATE POLICY "Service role full access on device stats"
+  ON extension_device_stats FOR ALL TO service_role
+  USING (true)
+  WITH CHECK (true);
+
+-- Aplica um delta nos contadores do dispositivo (cria a linha se preciso).
+-- SECURITY DEFINER (aqui e no trigger): o trigger também dispara em escritas
+-- da extensão (role authenticated), que não passam pela policy acima
+CREATE OR REPLACE FUNCTION bump_extension_device_stats(
+  p_device_id TEXT,
+  p_status TEXT,
+  p_delta INTEGER,
+  p_total INTEGER,
+  p_duration_ms BIGINT,
+  p_activity TIMESTAMPTZ
+)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO extension_device_stats AS s (
+    device_id, total, pending, processing, completed, failed,
+    duration_ms_sum, duration_count, last_activity
+  )
+  VALUES (
+    p_device_id,
+    p_total,
+    CASE WHEN p_status = 'pending' THEN p_delta ELSE 0 END,
+    CASE WHEN p_status = 'processing' THEN p_delta ELSE 0 END,
+    CASE WHEN p_status = 'completed' THEN p_delta ELSE 0 END,
+    CASE WHEN p_status = 'failed' THEN p_delta ELSE 0 END,
+    COALESCE(p_duration_ms, 0),
+    CASE WHEN p_duration_ms IS NULL THEN 0 ELSE 1 END,
+    p_activity
+  )
+  ON CONFLICT (device_id) DO UPDATE SET
+    total = s.total + EXCLUDED.total,
+    pending = s.pending + EXCLUDED.pending,
+    processing = s.processing + EXCLUDED.processing,
+    completed = s.completed + EXCLUDED.completed,
+    failed = s.failed + EXCLUDED.failed,
+    duration_ms_sum = s.duration_ms_sum + EXCLUDED.duration_ms_sum,
+    duration_count = s.duration_count + EXCLUDED.duration_count,
+    last_activity = GREATEST(s.last_activity, EXCLUDED.last_activity),
+    updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION bump_extension_device_stats(
+  TEXT, TEXT, INTEGER, INTEGER, BIGINT, TIMESTAMPTZ
+) FROM PUBLIC, anon, authenticated;
+
+CREATE OR REPLACE FUNCTION track_extension_command_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_duration BIGINT;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM bump_extension_device_stats(
+      NEW.device_id, NEW.status, 1, 1, NULL, NEW.created_at
+    );
+    RETURN NEW;
+  END IF;
+
+  IF TG_OP = 'DELETE' THEN
+    PERFORM bump_extension_device_stats(OLD.device_id, OLD.status, -1, -1, NULL, NULL);
+    RETURN OLD;
+  END IF;
+
+  -- UPDATE: só transições de status mexem nos contadores
+  IF NEW.status IS DISTINCT FROM OLD.status THEN
+    IF NEW.status IN ('completed', 'failed')
+       AND OLD.status NOT IN ('completed', 'failed')
+       AND NEW.completed_at IS NOT NULL THEN
+      v_duration := GREATEST(
+        0,
+        (EXTRACT(EPOCH FROM (
+          NEW.completed_at - COALESCE(NEW.started_at, NEW.created_at)
+        )) * 1000)::BIGINT
+      );
+    END IF;
+
+    PERFORM bump_extension_device_stats(OLD.device_id, OLD.status, -1, 0, NULL, NULL);
+    PERFORM bump_extension_device_stats(
+      NEW.device_id, NEW.status, 1, 0, v_duration,
+      COALESCE(NEW.completed_at, NEW.started_at, NOW())
+    );
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Backfill a partir do histórico existente (uma vez), com a tabela travada
+-- para escrita até o trigger existir: nenhum comando fica de fora ou em dobro
+LOCK TABLE extension_commands IN SHARE ROW EXCLUSIVE MODE;
+
+INSERT INTO extension_device_stats (
+  device_id, total, pending, processing, completed, failed,
+  duration_ms_sum, duration_count, last_activity
+)
+SELECT
+  device_id,
+  COUNT(*),
+  COUNT(*) FILTER (WHERE status = 'pending'),
+  COUNT(*) FILTER (WHERE status = 'processing'),
+  COUNT(*) FILTER (WHERE status = 'completed'),
+  COUNT(*) FILTER (WHERE status = 'failed'),
+  COALESCE(SUM(
+    GREATEST(0, EXTRACT(EPOCH FROM (
+      completed_at - COALESCE(started_at, created_at)
+    )) * 1000)::BIGINT
+  ) FILTER (WHERE status IN ('completed', 'failed') AND completed_at IS NOT NULL), 0),
+  COUNT(*) FILTER (WHERE status IN ('completed', 'failed') AND completed_at IS NOT NULL),
+  MAX(GREATEST(created_at, completed_at))
+FROM extension_commands
+GROUP BY device_id
+ON CONFLICT (device_id) DO NOTHING;
+
+DROP TRIGGER IF EXISTS trigger_track_extension_command_stats ON extension_commands;
+CREATE TRIGGER trigger_track_extension_command_stats
+  AFTER INSERT OR UPDATE OF status OR DELETE ON extension_commands
+  FOR EACH ROW
+  EXECUTE FUNCTION track_extension_command_stats();
@@ -0,0 +1,47 @@
+-- =====================================================
+-- MIGRATION: Notify finished ExtensionCommand rows
+-- Created: 2026-10-19
+-- Purpose: The extension writes results of agent commands straight to
+-- "ExtensionCommand" (not through /api/extension/result), so the
+-- python-service had to poll the row to see them. This trigger
+-- publishes the outcome with pg_notify on the channel the result
+-- registry listens on (EXTENSION_PUBSUB_CHANNEL, default
+-- extension_command_results), so the waiting agent wakes up at once.
+-- =====================================================
+CREATE OR REPLACE FUNCTION notify_extension_command_result()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_payload TEXT;
+BEGIN
+  IF upper(NEW.status) NOT IN ('COMPLETED', 'FAILED')
+     OR upper(COALESCE(OLD.status, '')) IN ('COMPLETED', 'FAILED') THEN
+    RETURN NEW;
+  END IF;
+
+  v_payload := jsonb_build_object(
+    'commandId', NEW.id,
+    'success', upper(NEW.status) = 'COMPLETED',
+    'result', NEW.result,
+    'error', NEW.error
+  )::TEXT;
+
+  -- pg_notify aceita até 8000 bytes: acima disso só o status, e quem
+  -- espera busca o resultado completo na linha
+  IF octet_length(v_payload) > 7900 THEN
+    v_payload := jsonb_build_object(
+      'commandId', NEW.id,
+      'success', upper(NEW.status) = 'COMPLETED',
+      'truncated', true
+    )::TEXT;
+  END IF;
+
+  PERFORM pg_notify('extension_command_results', v_payload);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_extension_command_result ON "ExtensionCommand";
+CREATE TRIGGER trigger_notify_extension_command_result
+  AFTER UPDATE OF status ON "ExtensionCommand"
+  FOR EACH ROW
+  EXECUTE FUNCTION notify_extension_command_result();